@@ -0,0 +1,5 @@
+from benchmarks.runner import main
+
+# the fake services run in a spawned process, which imports this module again
+if __name__ == "__main__":
+    main()
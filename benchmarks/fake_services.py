@@ -0,0 +1,409 @@
+import json
+import random
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.connection import Connection
+from typing import Any
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+"""
+Fake GitHub (REST and GraphQL) and Slack APIs serving a synthetic organization, for the benchmarks.
+The payloads mimic what GitHub returns closely enough for PyGithub, including what the list payloads leave out,
+so that the benchmarks see the same requests as a real run. Every request is counted per endpoint.
+"""
+
+USERS = [f"dev-{index}" for index in range(20)]
+PER_PAGE = 30  # GitHub's default page size for REST lists
+
+
+def _format_datetime(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@dataclass(frozen=True, slots=True)
+class OrgSpec:
+    repositories: int
+    open_pull_requests: int  # per repository
+    merged_pull_requests: int = 0  # per repository, merged within the last 30 days
+    seed: int = 1
+
+    @property
+    def repository_names(self) -> list[str]:
+        return [f"bench-org/repo-{index}" for index in range(self.repositories)]
+
+    def has_repository(self, repository_name: str) -> bool:
+        owner, _, name = repository_name.partition("/")
+        index = name.removeprefix("repo-")
+        return owner == "bench-org" and index.isdigit() and int(index) < self.repositories
+
+
+@dataclass(frozen=True, slots=True)
+class _PullRequest:
+    number: int
+    title: str
+    author: str
+    draft: bool
+    created_at: datetime
+    updated_at: datetime
+    merged_at: datetime | None
+    additions: int
+    deletions: int
+    changed_files: int
+    requested_reviewers: list[str]
+    reviews: list[tuple[int, str, str, datetime]]  # (id, reviewer, state, submitted at)
+
+
+class SyntheticOrg:
+    def __init__(self, spec: OrgSpec, now: datetime):
+        self.spec = spec
+        self.now = now
+        self.__lock = threading.Lock()
+        self.__repositories: dict[str, list[_PullRequest]] = {}
+
+    def pull_requests(self, repository_name: str) -> list[_PullRequest] | None:
+        """Open pull requests first (newest first), then the merged ones, generated on first use"""
+        if not self.spec.has_repository(repository_name):
+            return None
+        with self.__lock:
+            if repository_name not in self.__repositories:
+                self.__repositories[repository_name] = self.__generate(repository_name)
+            return self.__repositories[repository_name]
+
+    def __generate(self, repository_name: str) -> list[_PullRequest]:
+        rng = random.Random(f"{self.spec.seed}-{repository_name}")
+        pull_requests = []
+        for number in range(self.spec.open_pull_requests + self.spec.merged_pull_requests, 0, -1):
+            merged = number <= self.spec.merged_pull_requests
+            created_at = self.now - timedelta(hours=rng.randint(1, 30 * 24) + (0 if merged else number))
+            merged_at = min(self.now, created_at + timedelta(hours=rng.randint(1, 72))) if merged else None
+            updated_at = merged_at or created_at + timedelta(minutes=rng.randint(0, 60))
+            reviewers = rng.sample(USERS, rng.randint(0, 3))
+            reviews = [
+                (number * 100 + index, reviewer, rng.choice(["APPROVED", "APPROVED", "COMMENTED", "CHANGES_REQUESTED"]), updated_at)
+                for index, reviewer in enumerate(reviewers)
+            ]
+            pull_requests.append(
+                _PullRequest(
+                    number=number,
+                    title=f"Synthetic change #{number} " + "x" * rng.randint(0, 60),
+                    author=rng.choice(USERS),
+                    draft=not merged and rng.random() < 0.1,
+                    created_at=created_at,
+                    updated_at=updated_at,
+                    merged_at=merged_at,
+                    additions=rng.randint(1, 2000),
+                    deletions=rng.randint(0, 500),
+                    changed_files=rng.randint(1, 40),
+                    requested_reviewers=[] if merged else rng.sample(USERS, rng.randint(0, 2)),
+                    reviews=reviews,
+                )
+            )
+        open_pull_requests = sorted((pr for pr in pull_requests if pr.merged_at is None), key=lambda pr: pr.created_at, reverse=True)
+        return open_pull_requests + [pr for pr in pull_requests if pr.merged_at is not None]
+
+
+class FakeGitHub:
+    """REST endpoints used by PullRequestFetcher and the two GraphQL queries of GraphQLPullRequestSource"""
+
+    def __init__(self, org: SyntheticOrg, base_url: str):
+        self.org = org
+        self.base_url = base_url
+        self.routes = [
+            (re.compile(r"/repos/(?P<repo>[^/]+/[^/]+)"), "repository", self.__repository),
+            (re.compile(r"/repos/(?P<repo>[^/]+/[^/]+)/pulls"), "pulls", self.__pulls),
+            (re.compile(r"/repos/(?P<repo>[^/]+/[^/]+)/pulls/(?P<number>\d+)"), "pull", self.__pull),
+            (re.compile(r"/repos/(?P<repo>[^/]+/[^/]+)/pulls/(?P<number>\d+)/reviews"), "reviews", self.__reviews),
+            (
+                re.compile(r"/repos/(?P<repo>[^/]+/[^/]+)/pulls/(?P<number>\d+)/requested_reviewers"),
+                "requested_reviewers",
+                self.__requested_reviewers,
+            ),
+            (re.compile(r"/search/issues"), "search", self.__search_issues),
+        ]
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple[str, int, Any, dict[str, str]]:
+        """Returns (endpoint, status, body, headers)"""
+        url = urlsplit(path)
+        if method == "POST" and url.path in ("/graphql", "/api/graphql"):
+            return self.__graphql(json.loads(body))
+        for pattern, endpoint, handler in self.routes:
+            if method == "GET" and (match := pattern.fullmatch(url.path)):
+                status, payload, headers = handler(match, parse_qs(url.query))
+                return f"GET {endpoint}", status, payload, headers
+        return f"{method} unknown", 404, {"message": "Not Found"}, {}
+
+    def __user(self, login: str) -> dict[str, Any]:
+        return {"login": login, "id": abs(hash(login)) % 10_000, "type": "User"}
+
+    def __list_payload(self, repository_name: str, pr: _PullRequest) -> dict[str, Any]:
+        # like GitHub's list of pull requests: no line counts, those need the pull request itself
+        return {
+            "url": f"{self.base_url}/repos/{repository_name}/pulls/{pr.number}",
+            "html_url": f"https://github.com/{repository_name}/pull/{pr.number}",
+            "number": pr.number,
+            "state": "open" if pr.merged_at is None else "closed",
+            "title": pr.title,
+            "user": self.__user(pr.author),
+            "draft": pr.draft,
+            "created_at": _format_datetime(pr.created_at),
+            "updated_at": _format_datetime(pr.updated_at),
+            "closed_at": _format_datetime(pr.merged_at) if pr.merged_at else None,
+            "merged_at": _format_datetime(pr.merged_at) if pr.merged_at else None,
+            "requested_reviewers": [self.__user(login) for login in pr.requested_reviewers],
+        }
+
+    def __find(self, match: re.Match[str]) -> tuple[str, _PullRequest | None]:
+        repository_name = match["repo"]
+        pull_requests = self.org.pull_requests(repository_name) or []
+        number = int(match["number"])
+        return repository_name, next((pr for pr in pull_requests if pr.number == number), None)
+
+    def __repository(self, match: re.Match[str], _query: dict[str, list[str]]) -> tuple[int, Any, dict[str, str]]:
+        repository_name = match["repo"]
+        if self.org.pull_requests(repository_name) is None:
+            return 404, {"message": "Not Found"}, {}
+        owner, _, name = repository_name.partition("/")
+        payload = {
+            "id": 1,
+            "name": name,
+            "full_name": repository_name,
+            "owner": self.__user(owner),
+            "url": f"{self.base_url}/repos/{repository_name}",
+        }
+        return 200, payload, {}
+
+    def __pulls(self, match: re.Match[str], query: dict[str, list[str]]) -> tuple[int, Any, dict[str, str]]:
+        repository_name = match["repo"]
+        pull_requests = self.org.pull_requests(repository_name)
+        if pull_requests is None:
+            return 404, {"message": "Not Found"}, {}
+        state = query.get("state", ["open"])[0]
+        if state == "closed":
+            selected = sorted((pr for pr in pull_requests if pr.merged_at is not None), key=lambda pr: pr.updated_at, reverse=True)
+        else:
+            selected = [pr for pr in pull_requests if pr.merged_at is None]
+        page = int(query.get("page", ["1"])[0])
+        per_page = int(query.get("per_page", [str(PER_PAGE)])[0])
+        headers: dict[str, str] = {}
+        if page * per_page < len(selected):
+            next_query = {key: values[0] for key, values in query.items()} | {"page": str(page + 1)}
+            next_url = f"{self.base_url}/repos/{repository_name}/pulls?" + "&".join(f"{key}={value}" for key, value in next_query.items())
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return 200, [self.__list_payload(repository_name, pr) for pr in selected[(page - 1) * per_page : page * per_page]], headers
+
+    def __merged_since(self, search_query: str) -> tuple[str, list[_PullRequest]]:
+        repository_name, merged_since, updated_since = self.__parse_search(search_query)
+        selected = [
+            pr
+            for pr in self.org.pull_requests(repository_name) or []
+            if pr.merged_at is not None and pr.merged_at >= merged_since and (updated_since is None or pr.updated_at >= updated_since)
+        ]
+        return repository_name, selected
+
+    def __search_issues(self, _match: re.Match[str], query: dict[str, list[str]]) -> tuple[int, Any, dict[str, str]]:
+        repository_name, selected = self.__merged_since(query["q"][0])
+        page = int(query.get("page", ["1"])[0])
+        per_page = int(query.get("per_page", [str(PER_PAGE)])[0])
+        headers: dict[str, str] = {}
+        if page * per_page < len(selected):
+            next_query = {key: values[0] for key, values in query.items()} | {"page": str(page + 1)}
+            headers["Link"] = f'<{self.base_url}/search/issues?{urlencode(next_query)}>; rel="next"'
+        # like GitHub's search: issues, a pull request's one links to the pull request and tells when it was merged
+        items = [
+            self.__list_payload(repository_name, pr)
+            | {
+                "url": f"{self.base_url}/repos/{repository_name}/issues/{pr.number}",
+                "pull_request": {"url": f"{self.base_url}/repos/{repository_name}/pulls/{pr.number}", "merged_at": _format_datetime(pr.merged_at)},
+            }
+            for pr in selected[(page - 1) * per_page : page * per_page]
+            if pr.merged_at is not None
+        ]
+        return 200, {"total_count": len(selected), "incomplete_results": False, "items": items}, headers
+
+    def __pull(self, match: re.Match[str], _query: dict[str, list[str]]) -> tuple[int, Any, dict[str, str]]:
+        repository_name, pr = self.__find(match)
+        if pr is None:
+            return 404, {"message": "Not Found"}, {}
+        payload = self.__list_payload(repository_name, pr) | {
+            "merged": pr.merged_at is not None,
+            "additions": pr.additions,
+            "deletions": pr.deletions,
+            "changed_files": pr.changed_files,
+        }
+        return 200, payload, {}
+
+    def __reviews(self, match: re.Match[str], _query: dict[str, list[str]]) -> tuple[int, Any, dict[str, str]]:
+        _, pr = self.__find(match)
+        if pr is None:
+            return 404, {"message": "Not Found"}, {}
+        payload = [
+            {"id": review_id, "user": self.__user(reviewer), "state": state, "submitted_at": _format_datetime(submitted_at)}
+            for review_id, reviewer, state, submitted_at in pr.reviews
+        ]
+        return 200, payload, {}
+
+    def __requested_reviewers(self, match: re.Match[str], _query: dict[str, list[str]]) -> tuple[int, Any, dict[str, str]]:
+        _, pr = self.__find(match)
+        if pr is None:
+            return 404, {"message": "Not Found"}, {}
+        return 200, {"users": [self.__user(login) for login in pr.requested_reviewers], "teams": []}, {}
+
+    def __graphql(self, request: dict[str, Any]) -> tuple[str, int, Any, dict[str, str]]:
+        variables = request["variables"]
+        offset = int(variables["cursor"] or 0)
+        page_size = variables["pageSize"]
+        if "search(" in request["query"]:
+            _, selected = self.__merged_since(variables["searchQuery"])
+            page = selected[offset : offset + page_size]
+            nodes = [self.__merged_node(pr) for pr in page]
+            has_next = offset + page_size < len(selected)
+            connection = {"issueCount": len(selected), "pageInfo": {"hasNextPage": has_next, "endCursor": str(offset + page_size)}, "nodes": nodes}
+            return "POST graphql search", 200, {"data": {"search": connection}}, {}
+
+        pull_requests = self.org.pull_requests(f"{variables['owner']}/{variables['name']}")
+        if pull_requests is None:
+            return "POST graphql pullRequests", 200, {"data": {"repository": None}}, {}
+        selected = [pr for pr in pull_requests if pr.merged_at is None]
+        page = selected[offset : offset + page_size]
+        has_next = offset + page_size < len(selected)
+        nodes = [self.__open_node(f"{variables['owner']}/{variables['name']}", pr) for pr in page]
+        connection = {"pageInfo": {"hasNextPage": has_next, "endCursor": str(offset + page_size)}, "nodes": nodes}
+        return "POST graphql pullRequests", 200, {"data": {"repository": {"pullRequests": connection}}}, {}
+
+    @staticmethod
+    def __parse_search(search_query: str) -> tuple[str, datetime, datetime | None]:
+        terms = dict(term.split(":", 1) for term in search_query.split() if ":" in term)
+        updated = terms.get("updated")
+        return (
+            terms["repo"],
+            datetime.fromisoformat(terms["merged"].removeprefix(">=").replace("Z", "+00:00")),
+            datetime.fromisoformat(updated.removeprefix(">=").replace("Z", "+00:00")) if updated else None,
+        )
+
+    @staticmethod
+    def __open_node(repository_name: str, pr: _PullRequest) -> dict[str, Any]:
+        # latestReviews has one review per reviewer, like the synthetic data
+        return {
+            "number": pr.number,
+            "title": pr.title,
+            "isDraft": pr.draft,
+            "createdAt": _format_datetime(pr.created_at),
+            "updatedAt": _format_datetime(pr.updated_at),
+            "url": f"https://github.com/{repository_name}/pull/{pr.number}",
+            "additions": pr.additions,
+            "deletions": pr.deletions,
+            "changedFiles": pr.changed_files,
+            "author": {"login": pr.author},
+            "reviewRequests": {"nodes": [{"requestedReviewer": {"login": login}} for login in pr.requested_reviewers]},
+            "latestReviews": {
+                "nodes": [
+                    {"state": state, "submittedAt": _format_datetime(submitted_at), "author": {"login": reviewer}}
+                    for _, reviewer, state, submitted_at in pr.reviews
+                ]
+            },
+        }
+
+    @staticmethod
+    def __merged_node(pr: _PullRequest) -> dict[str, Any]:
+        assert pr.merged_at is not None
+        approvals = [(reviewer, submitted_at) for _, reviewer, state, submitted_at in pr.reviews if state == "APPROVED"]
+        return {
+            "number": pr.number,
+            "mergedAt": _format_datetime(pr.merged_at),
+            "additions": pr.additions,
+            "deletions": pr.deletions,
+            "author": {"login": pr.author},
+            "reviews": {
+                "nodes": [{"submittedAt": _format_datetime(submitted_at), "author": {"login": reviewer}} for reviewer, submitted_at in approvals]
+            },
+        }
+
+
+class FakeSlack:
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__next_ts = 0
+
+    def handle(self, method: str, path: str, _body: bytes) -> tuple[str, int, Any, dict[str, str]]:
+        api_method = urlsplit(path).path.removeprefix("/api/")
+        if api_method not in ("chat.postMessage", "chat.update", "chat.delete"):
+            return f"{method} unknown", 404, {"ok": False, "error": "unknown_method"}, {}
+        with self.__lock:
+            self.__next_ts += 1
+            ts = f"{self.__next_ts}.000100"
+        return api_method, 200, {"ok": True, "channel": "C0BENCH", "ts": ts}, {}
+
+
+class _CountingServer:
+    """Serves a fake service on localhost in a background thread, counting the requests per endpoint"""
+
+    def __init__(self) -> None:
+        self.service: FakeGitHub | FakeSlack | None = None
+        self.counts: Counter[str] = Counter()
+        counts_lock = threading.Lock()
+        server = self
+
+        class _RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                headers: dict[str, str] = {}
+                if self.path == "/_counts":
+                    with counts_lock:
+                        status, payload = 200, dict(server.counts)
+                else:
+                    assert server.service is not None
+                    endpoint, status, payload, headers = server.service.handle(self.command, self.path, body)
+                    with counts_lock:
+                        server.counts[endpoint] += 1
+                encoded = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+                pass
+
+        self.http_server = ThreadingHTTPServer(("127.0.0.1", 0), _RequestHandler)
+        self.http_server.daemon_threads = True
+        self.thread = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+
+    @cached_property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.http_server.server_address[1]}"
+
+
+def serve(spec: OrgSpec, connection: Connection) -> None:
+    """
+    Runs the fake GitHub and Slack until the connection is closed. Meant to run in its own process,
+    so that serving the requests does not take the CPU or memory measured for the notifier.
+    Sends (github_url, slack_url) once the servers listen.
+    """
+    github = _CountingServer()
+    # the payloads link to further pages and pull requests, so the GitHub service needs the server's URL
+    github.service = FakeGitHub(SyntheticOrg(spec, datetime.now(timezone.utc)), github.url)
+    slack = _CountingServer()
+    slack.service = FakeSlack()
+    for server in (github, slack):
+        server.thread.start()
+    connection.send((github.url, slack.url))
+    try:
+        connection.recv()
+    except EOFError:
+        pass
+    for server in (github, slack):
+        server.http_server.shutdown()
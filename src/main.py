@@ -1,20 +1,51 @@
+from __future__ import annotations
+
 import argparse
 import logging
+import signal
+import sys
 import time
+from contextlib import aclosing
+from datetime import timedelta
+from functools import partial
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
 from notifier import properties
-from notifier.productivity_formatter import ProductivityMessageFormatter
-from notifier.productivity_notifier import ProductivityNotifier
+from notifier.execution_plan import (
+    notification_key,
+    notification_name,
+    plan_notifications,
+    productivity_scans,
+)
 from notifier.properties import (
     Notification,
     ProductivityNotification,
     PullRequestNotification,
 )
-from notifier.pull_request_fetcher import PullRequestFetcher
-from notifier.slack_client import SlackClient
-from notifier.slack_notifier import SlackBlockNotifier
-from notifier.summary_formatter import SummaryMessageFormatter
+from notifier.tracing import (
+    OtlpJsonFileExporter,
+    configure_tracing,
+    flush_tracing,
+    shutdown_tracing,
+    span,
+)
+
+if TYPE_CHECKING:
+    from notifier.async_fetcher import AsyncPullRequestFetcher
+    from notifier.copilot_requester_cache import CopilotRequesterCache
+    from notifier.http_cache import HttpResponseCache
+    from notifier.productivity_notifier import ProductivityNotifier
+    from notifier.pull_request_cache import PullRequestInfoCache
+    from notifier.pull_request_index import PullRequestIndex
+    from notifier.repository import ListedRepository, RepositoryDataSource
+    from notifier.run_report import RunReport
+    from notifier.slack_notifier import SlackBlockNotifier
+
+"""
+The modules talking to GitHub and Slack (PyGithub, slack_sdk, requests) take a while to import, they are imported where
+something is fetched or sent, so that `--check-config` and `--help` start fast.
+"""
 
 LOG = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s (%(filename)s:%(lineno)d) %(message)s", datefmt="%d-%m-%y %H:%M:%S")
@@ -31,6 +62,10 @@ Examples:
   python main.py                           # Run pull request notifications (default)
   python main.py --type pull_requests     # Run only pull request notifications
   python main.py --type team_productivity # Run only team productivity notifications
+  python main.py --daemon                 # Keep running, each notification on its schedule
+  python main.py --check-config           # Validate resources/config.json and exit
+  python main.py --explain                # Print what a run would fetch and send, without running it
+  python main.py --workers 4              # Fetch in 4 processes, for configurations with thousands of repositories
         """,
     )
 
@@ -40,8 +75,39 @@ Examples:
         default="pull_requests",
         help="Type of notifications to run (default: pull_requests)",
     )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=root_dir / "resources" / "config.json",
+        help="Path of the config file (default: resources/config.json)",
+    )
+    parser.add_argument(
+        "--check-config",
+        action="store_true",
+        help="Only parse and validate the config file (incl. the title regexes), without any network access, and exit",
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print the execution plan (the fetches shared by the notifications, the channels and the estimated GitHub requests) and exit",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Fetch in this many processes, each with a shard of the repositories (default: 1, fetching in this process). "
+        "Takes precedence over max_concurrent_fetches",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and run each notification on its cron-style 'schedule' from the config, until stopped by SIGTERM",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
 
 
 def filter_notifications_by_type(notifications: list[Notification], notification_type_filter: str) -> list[Notification]:
@@ -60,8 +126,12 @@ def main() -> None:
     start_time = time.time()
     args = parse_args()
 
-    config_path = root_dir / "resources" / "config.json"
+    config_path: Path = args.config
+    if args.check_config:
+        sys.exit(check_config(config_path))
     notifications = properties.read_config(config_path)
+    settings = properties.read_settings(config_path)
+    properties.load_environment()
 
     # Filter notifications by type
     filtered = filter_notifications_by_type(notifications, args.type)
@@ -70,49 +140,392 @@ def main() -> None:
         LOG.warning("No notifications found for type '%s'. Check your configuration.", args.type)
         return
 
-    LOG.info("Running %s notifications for %d channel(s)", args.type, len(filtered))
+    if args.explain:
+        print(plan_notifications(expand_from_cached_listings(filtered, settings)).explain(settings.fetch_backend))
+        return
+    # repositories watched by several notifications are fetched once, the notifications of a channel run one after another
+    plan = plan_notifications(filtered)
+    filtered = plan.notifications
+
+    LOG.info("Running %s notifications for %d channel(s)", args.type, len(plan.channels))
+
+    # only now that something is going to be fetched and sent
+    import asyncio
 
-    fetcher = PullRequestFetcher(properties.get_github_api_url(), properties.get_github_token())
-    slack_client = SlackClient(properties.get_slack_oauth_token())
+    from notifier.async_fetcher import AsyncPullRequestFetcher
+    from notifier.copilot_requester_cache import CopilotRequesterCache
+    from notifier.http_cache import HttpResponseCache
+    from notifier.message_updater import MessageUpdater, PostedMessageStore
+    from notifier.productivity_formatter import ProductivityMessageFormatter
+    from notifier.productivity_notifier import ProductivityNotifier
+    from notifier.productivity_store import ProductivityStore
+    from notifier.pull_request_cache import PullRequestInfoCache
+    from notifier.pull_request_fetcher import PullRequestFetcher
+    from notifier.pull_request_index import PullRequestIndex
+    from notifier.repository_discovery import (
+        RepositoryDiscovery,
+        has_repository_patterns,
+    )
+    from notifier.run_report import RunReport
+    from notifier.sharding import ShardedFetcher, WorkerConfig
+    from notifier.slack_client import SlackClient, SlackDispatcher
+    from notifier.slack_notifier import SlackBlockNotifier
+    from notifier.summary_formatter import SummaryMessageFormatter
+    from notifier.webhook_receiver import WebhookReceiver
+
+    http_cache = None
+    pull_request_cache = None
+    copilot_requester_cache = None
+    productivity_store = None
+    if settings.cache_dir is not None:
+        http_cache = HttpResponseCache(settings.cache_dir / "http", settings.http_cache_max_size_mb * 1024 * 1024)
+        pull_request_cache = PullRequestInfoCache(
+            settings.cache_dir / "pull_requests.json",
+            settings.pull_request_cache_max_entries,
+            timedelta(hours=settings.pull_request_cache_ttl_hours),
+        )
+        copilot_requester_cache = CopilotRequesterCache(settings.cache_dir / "copilot_requesters.json", settings.pull_request_cache_max_entries)
+        productivity_store = ProductivityStore(settings.cache_dir / "productivity.sqlite3")
+
+    pull_request_index = None
+    webhook_receiver = None
+    if settings.webhook_port is not None:
+        if args.daemon:
+            # the index is only worth it in a process that lives long enough to receive the events
+            pull_request_index = PullRequestIndex()
+            webhook_receiver = WebhookReceiver(pull_request_index, properties.get_github_webhook_secret(), port=settings.webhook_port)
+            webhook_receiver.start()
+        else:
+            LOG.warning("webhook_port is only used with --daemon, fetching the pull requests from the API")
+
+    if settings.trace_file is not None:
+        configure_tracing(OtlpJsonFileExporter(settings.trace_file))
+    # counts the GitHub and Slack calls, cumulative over the runs of a daemon
+    run_report = RunReport()
+    fetcher = PullRequestFetcher(
+        properties.get_github_api_url(),
+        properties.get_github_token(),
+        fetch_backend=settings.fetch_backend,
+        http_cache=http_cache,
+        pull_request_cache=pull_request_cache,
+        copilot_requester_cache=copilot_requester_cache,
+        productivity_store=productivity_store,
+        pull_request_index=pull_request_index,
+        run_report=run_report,
+    )
+    repository_discovery = None
+    if has_repository_patterns(filtered):
+        repository_discovery = RepositoryDiscovery(
+            fetcher.list_repositories,
+            timedelta(hours=settings.repository_listing_ttl_hours),
+            settings.cache_dir / "repository_listings.json" if settings.cache_dir is not None else None,
+        )
+    sharded_fetcher = None
+    if args.workers > 1:
+        worker_config = WorkerConfig(
+            properties.get_github_api_url(),
+            properties.get_github_token(),
+            fetch_backend=settings.fetch_backend,
+            cache_dir=settings.cache_dir,
+            http_cache_max_size_mb=settings.http_cache_max_size_mb,
+            pull_request_cache_max_entries=settings.pull_request_cache_max_entries,
+            pull_request_cache_ttl_hours=settings.pull_request_cache_ttl_hours,
+        )
+        sharded_fetcher = ShardedFetcher(worker_config, args.workers)
+        if pull_request_index is not None:
+            LOG.warning("The worker processes fetch the open pull requests from the API, the webhook index is not used with --workers")
+    # messages are posted in the background, one queue per channel, while the next notifications are being fetched
+    slack_dispatcher = SlackDispatcher(SlackClient(properties.get_slack_oauth_token()), run_report=run_report)
+    posted_message_store = None
+    message_updater = None
+    if settings.update_messages and settings.cache_dir is not None:
+        posted_message_store = PostedMessageStore(settings.cache_dir / "slack_messages.json")
+        message_updater = MessageUpdater(slack_dispatcher, posted_message_store)
 
     # Create both types of notifiers
-    pr_notifier = SlackBlockNotifier(slack_client, SummaryMessageFormatter())
-    productivity_notifier = ProductivityNotifier(slack_client, ProductivityMessageFormatter())
+    pr_notifier = SlackBlockNotifier(slack_dispatcher, SummaryMessageFormatter(pack_messages=settings.pack_messages), message_updater)
+    productivity_notifier = ProductivityNotifier(slack_dispatcher, ProductivityMessageFormatter())
+
+    def run(notifications_to_run: list[Notification]) -> list[tuple[str, Exception]]:
+        """Runs the notifications once and waits until their messages are sent, returns the messages that failed to send"""
+        fetcher.reset_run_state()
+        failed_expansions: list[tuple[Notification, Exception]] = []
+        try:
+            if repository_discovery is not None:
+                # after the reset, the repositories of the listings are kept for the run
+                notifications_to_run, failed_expansions = repository_discovery.expand(notifications_to_run)
+                for notification, error in failed_expansions:
+                    LOG.error("Failed to send notification to channel '%s' with message: %s", notification.slack_channel, str(error))
+            # the teams watching a repository share one scan of its merged pull requests
+            fetcher.share_productivity_scans(productivity_scans(notifications_to_run))
+            if sharded_fetcher is not None:
+                # the fetching is spread over the processes, the formatting and sending happens here
+                sharded_fetcher.fetch(notifications_to_run, run_report)
+                run_notifications(notifications_to_run, sharded_fetcher, pr_notifier, productivity_notifier)
+            elif settings.max_concurrent_fetches is not None:
+                async_fetcher = AsyncPullRequestFetcher(fetcher, settings.max_concurrent_fetches)
+                try:
+                    asyncio.run(run_notifications_async(notifications_to_run, async_fetcher, pr_notifier, productivity_notifier))
+                finally:
+                    async_fetcher.close()
+            else:
+                run_notifications(notifications_to_run, fetcher, pr_notifier, productivity_notifier)
+            if failed_expansions:
+                # only the notifications whose repository patterns failed to expand fail, the others were sent
+                raise ValueError("Failed to send some of the messages. See Errors in the logs above for more details.")
+        finally:
+            send_failures = slack_dispatcher.close()
+            flush_tracing()
+            if posted_message_store is not None:
+                posted_message_store.save()
+            for channel_name, channel_stats in slack_dispatcher.stats().items():
+                LOG.info(
+                    "Slack channel '%s': %d calls, %.2fs average latency (max %.2fs), %.2fs throttled in %d retries",
+                    channel_name,
+                    channel_stats.calls,
+                    channel_stats.latency_seconds / channel_stats.calls,
+                    channel_stats.max_latency_seconds,
+                    channel_stats.throttled_seconds,
+                    channel_stats.retries,
+                )
+            if pull_request_cache is not None:
+                pull_request_cache.save()
+                LOG.info("Pull Request cache: %d hits, %d misses", pull_request_cache.hits, pull_request_cache.misses)
+            if copilot_requester_cache is not None:
+                copilot_requester_cache.save()
+            write_run_report(run_report, settings, http_cache, pull_request_cache, pull_request_index, copilot_requester_cache)
+
+        for channel_name, error in send_failures:
+            LOG.error("Failed to send notification to channel '%s' with message: %s", channel_name, str(error))
+        return send_failures
 
-    run_notifications(filtered, fetcher, pr_notifier, productivity_notifier)
+    try:
+        if args.daemon:
+            run_daemon(filtered, run)
+            send_failures = []
+        else:
+            send_failures = run(filtered)
+    finally:
+        if webhook_receiver is not None:
+            webhook_receiver.close()
+        fetcher.close()
+        for task_kind, timings in fetcher.worker_pool.timings().items():
+            LOG.info(
+                "Worker pool '%s' tasks: %d, %.2fs running (max %.2fs), %.2fs queued",
+                task_kind,
+                timings.count,
+                timings.run_seconds,
+                timings.max_run_seconds,
+                timings.queued_seconds,
+            )
+        if pull_request_index is not None:
+            LOG.info("Pull Request index: %d hits, %d loads", pull_request_index.hits, pull_request_index.loads)
+        if http_cache is not None:
+            LOG.info("GitHub HTTP cache: %d hits, %d misses", http_cache.hits, http_cache.misses)
+        if productivity_store is not None:
+            productivity_store.close()
+        shutdown_tracing()
+
+    if send_failures:
+        raise ValueError("Failed to send some of the messages. See Errors in the logs above for more details.")
 
     end_time = time.time() - start_time
     LOG.info("Script execution time: %d seconds", int(end_time))
 
 
+def expand_from_cached_listings(notifications: list[Notification], settings: properties.Settings) -> list[Notification]:
+    """
+    The notifications with their repository patterns expanded from the owner listings kept in `cache_dir`, without listing any owner.
+    A notification with a pattern of an owner that was not listed lately keeps its patterns, the plan shows them unexpanded.
+    """
+    from notifier.repository_discovery import (
+        RepositoryDiscovery,
+        has_repository_patterns,
+    )
+
+    if settings.cache_dir is None or not has_repository_patterns(notifications):
+        return notifications
+
+    def not_listed(owner: str) -> list[ListedRepository]:
+        raise ValueError(f"The repositories of '{owner}' were not listed lately")
+
+    discovery = RepositoryDiscovery(
+        not_listed, timedelta(hours=settings.repository_listing_ttl_hours), settings.cache_dir / "repository_listings.json"
+    )
+    result = []
+    for notification in notifications:
+        expanded, _ = discovery.expand([notification])
+        result.append(expanded[0] if expanded else notification)
+    return result
+
+
+def check_config(config_path: Path) -> int:
+    """Parses and validates the config without touching the network, returns the exit code"""
+    try:
+        notifications = properties.read_config(config_path)
+        properties.read_settings(config_path)
+    except (ValueError, OSError, KeyError, TypeError) as e:
+        LOG.error("Config %s is invalid: %s", config_path, str(e) or repr(e))
+        return 1
+    LOG.info("Config %s is valid: %d notification(s)", config_path, len(notifications))
+    return 0
+
+
+def write_run_report(
+    run_report: RunReport,
+    settings: properties.Settings,
+    http_cache: HttpResponseCache | None,
+    pull_request_cache: PullRequestInfoCache | None,
+    pull_request_index: PullRequestIndex | None,
+    copilot_requester_cache: CopilotRequesterCache | None,
+) -> None:
+    if http_cache is not None:
+        run_report.record_cache("http", http_cache.hits, http_cache.misses)
+    if pull_request_cache is not None:
+        run_report.record_cache("pull_requests", pull_request_cache.hits, pull_request_cache.misses)
+    if copilot_requester_cache is not None:
+        run_report.record_cache("copilot_requesters", copilot_requester_cache.hits, copilot_requester_cache.misses)
+    if pull_request_index is not None:
+        run_report.record_cache("pull_request_index", pull_request_index.hits, pull_request_index.loads)
+    run_report.log_summary()
+    try:
+        if settings.run_report_file is not None:
+            run_report.write_json(settings.run_report_file)
+        if settings.prometheus_metrics_file is not None:
+            run_report.write_prometheus(settings.prometheus_metrics_file)
+    except OSError as e:
+        # the report must not fail the notifications that were sent
+        LOG.warning("Failed to write the run report: %s", e)
+
+
+def run_daemon(notifications: list[Notification], run: Callable[[list[Notification]], list[tuple[str, Exception]]]) -> None:
+    """Runs the notifications on their schedules until the process gets SIGTERM or SIGINT, the run in progress is finished first"""
+
+    def run_scheduled(due: list[Notification]) -> None:
+        if run(due):
+            raise ValueError("Failed to send some of the messages. See Errors in the logs above for more details.")
+
+    from notifier.daemon import NotificationDaemon
+
+    daemon = NotificationDaemon(notifications, run_scheduled)
+    for stop_signal in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(stop_signal, lambda signal_number, _: daemon.stop())
+    LOG.info("Running as a daemon, stop with SIGTERM")
+    daemon.run_forever()
+
+
 def run_notifications(
     notifications: list[Notification],
-    fetcher: PullRequestFetcher,
+    fetcher: RepositoryDataSource,
     pr_notifier: SlackBlockNotifier,
     productivity_notifier: ProductivityNotifier,
 ) -> None:
+    from notifier.request_scheduler import request_priority
+    from notifier.run_report import reported_notification
 
     something_failed = False
     for notification in notifications:
         try:
-            if isinstance(notification, PullRequestNotification):
-                pr_notifier.send_report_for_repos(
-                    notification.slack_channel,
+            name = notification_name(notification)
+            with request_priority(notification.priority), reported_notification(name), span("notification", notification=name):
+                if isinstance(notification, PullRequestNotification):
+                    pr_notifier.send_report_for_repos(
+                        notification.slack_channel,
+                        notification.config["repositories"],
+                        lambda repo_name: fetcher.get_repository_info(repo_name, notification.config["filters"]),
+                        notification_key=notification_key(notification),
+                    )
+                elif isinstance(notification, ProductivityNotification):
+                    productivity_notifier.send_productivity_report(
+                        notification.slack_channel,
+                        notification.config["repositories"],
+                        notification.config["team_members"],
+                        notification.config["time_window_days"],
+                        partial(
+                            fetcher.get_team_productivity_metrics,
+                            other_windows_days=notification.config.get("other_time_windows_days"),
+                            compare_to_previous_period=notification.config.get("compare_to_previous_period", False),
+                        ),
+                    )
+        except (ValueError, RuntimeError, ConnectionError) as e:
+            LOG.error("Failed to send notification to channel '%s' with message: %s", notification.slack_channel, str(e))
+            something_failed = True
+
+    if something_failed:
+        raise ValueError("Failed to send some of the messages. See Errors in the logs above for more details.")
+
+
+async def run_notifications_async(
+    notifications: list[Notification],
+    fetcher: AsyncPullRequestFetcher,
+    pr_notifier: SlackBlockNotifier,
+    productivity_notifier: ProductivityNotifier,
+) -> None:
+    """
+    Same as `run_notifications`, but the data of all notifications is fetched concurrently.
+    Messages for one channel are still sent in the order of the notifications in the config.
+    """
+    import asyncio
+
+    from notifier.request_scheduler import request_priority
+    from notifier.run_report import reported_notification
+
+    async def run_notification(notification: Notification, previous_in_channel: asyncio.Event | None, sent: asyncio.Event) -> None:
+        try:
+            # the task runs in its own context, so the priority applies only to this notification's requests
+            name = notification_name(notification)
+            with request_priority(notification.priority), reported_notification(name), span("notification", notification=name):
+                if isinstance(notification, PullRequestNotification):
+                    # the fetches start right away, each repository is sent as soon as it and the ones before it are there
+                    repositories = fetcher.stream_repositories_info(notification.config["repositories"], notification.config["filters"])
+                    async with aclosing(repositories):
+                        if previous_in_channel is not None:
+                            await previous_in_channel.wait()
+                        async for repository in repositories:
+                            await asyncio.to_thread(
+                                pr_notifier.send_report_for_repo,
+                                notification.slack_channel,
+                                repository,
+                                notification_key=notification_key(notification),
+                            )
+                    return
+
+                metrics = await fetcher.get_team_productivity_metrics(
                     notification.config["repositories"],
-                    lambda repo_name: fetcher.get_repository_info(repo_name, notification.config["filters"]),
+                    notification.config["team_members"],
+                    notification.config["time_window_days"],
+                    other_windows_days=notification.config.get("other_time_windows_days"),
+                    compare_to_previous_period=notification.config.get("compare_to_previous_period", False),
                 )
-            elif isinstance(notification, ProductivityNotification):
-                productivity_notifier.send_productivity_report(
+                if previous_in_channel is not None:
+                    await previous_in_channel.wait()
+                await asyncio.to_thread(
+                    productivity_notifier.send_productivity_report,
                     notification.slack_channel,
                     notification.config["repositories"],
                     notification.config["team_members"],
                     notification.config["time_window_days"],
-                    fetcher.get_team_productivity_metrics,
+                    lambda *_: metrics,
                 )
+        finally:
+            sent.set()
 
-        except (ValueError, RuntimeError, ConnectionError) as e:
-            LOG.error("Failed to send notification to channel '%s' with message: %s", notification.slack_channel, str(e))
+    last_sent_in_channel: dict[str, asyncio.Event] = {}
+    tasks = []
+    for notification in notifications:
+        sent = asyncio.Event()
+        tasks.append(run_notification(notification, last_sent_in_channel.get(notification.slack_channel), sent))
+        last_sent_in_channel[notification.slack_channel] = sent
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    something_failed = False
+    for notification, result in zip(notifications, results):
+        if isinstance(result, (ValueError, RuntimeError, ConnectionError)):
+            LOG.error("Failed to send notification to channel '%s' with message: %s", notification.slack_channel, str(result))
             something_failed = True
+        elif isinstance(result, BaseException):
+            raise result
 
     if something_failed:
         raise ValueError("Failed to send some of the messages. See Errors in the logs above for more details.")
@@ -0,0 +1,101 @@
+import asyncio
+import contextvars
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import AsyncGenerator, Callable, TypeVar
+
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.repository import (
+    ProductivityWindows,
+    PullRequestFilter,
+    RepositoryInfo,
+    TeamProductivityMetrics,
+)
+
+"""
+Asyncio facade over PullRequestFetcher, so that the repositories of all notifications can be fetched concurrently.
+PyGithub is a blocking library, the actual fetching happens on a thread pool sized to the global concurrency limit.
+"""
+
+LOG = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# how many repositories of a stream are fetched (or wait for their turn) ahead of the one to send next, per allowed concurrent fetch
+STREAM_WINDOW_PER_FETCH = 2
+
+
+class AsyncPullRequestFetcher:
+    def __init__(self, fetcher: PullRequestFetcher, max_concurrency: int):
+        self.__fetcher = fetcher
+        # one limit shared by every notification, so a config with many channels cannot open an unbounded number of fetches
+        self.__semaphore = asyncio.Semaphore(max_concurrency)
+        self.__executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="repository-fetch")
+        self.__stream_window = STREAM_WINDOW_PER_FETCH * max_concurrency
+
+    async def get_repository_info(self, repository_name: str, pull_request_filters: list[PullRequestFilter]) -> RepositoryInfo:
+        return await self.__run(self.__fetcher.get_repository_info, repository_name, pull_request_filters)
+
+    def stream_repositories_info(
+        self, repository_names: list[str], pull_request_filters: list[PullRequestFilter]
+    ) -> AsyncGenerator[RepositoryInfo, None]:
+        """
+        Starts fetching the first repositories right away and yields them in the order of `repository_names`, each as soon as it and
+        the ones before it are fetched, so the caller can send the first repository's messages while the next ones are being fetched.
+        At most a window of twice the concurrency limit is fetched ahead of the repository to send next, a repository fetched before
+        its predecessors waits in its task, so only the window is ever held in memory. Each yielded repository starts the next fetch.
+        Close the iterator (e.g. `contextlib.aclosing`) to cancel the rest.
+        """
+        remaining = iter(repository_names)
+
+        def start_next() -> "asyncio.Future[RepositoryInfo] | None":
+            repo_name = next(remaining, None)
+            return None if repo_name is None else asyncio.ensure_future(self.get_repository_info(repo_name, pull_request_filters))
+
+        # started here rather than on the first iteration, the caller may wait for the previous notification of the channel first
+        pending = deque(task for task in (start_next() for _ in range(self.__stream_window)) if task is not None)
+        return _in_order(pending, start_next)
+
+    async def get_team_productivity_metrics(
+        self,
+        repository_names: list[str],
+        team_members: list[str],
+        time_window_days: int,
+        other_windows_days: list[int] | None = None,
+        compare_to_previous_period: bool = False,
+    ) -> TeamProductivityMetrics:
+        windows = ProductivityWindows(time_window_days, tuple(other_windows_days or ()), compare_to_previous_period)
+        LOG.info("Fetching team productivity metrics for %d repositories, %d days window", len(repository_names), windows.scanned_days)
+
+        now = datetime.now(timezone.utc)
+        since_date = now - timedelta(days=windows.scanned_days)
+        repository_facts = await asyncio.gather(
+            *(self.__run(self.__fetcher.get_repository_productivity_facts, repo_name, team_members, since_date) for repo_name in repository_names)
+        )
+        return windows.summarize(list(repository_facts), team_members, now)
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __run(self, function: Callable[..., T], *args: object) -> T:
+        async with self.__semaphore:
+            # like asyncio.to_thread, the call sees the caller's context variables (e.g. the request priority)
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self.__executor, partial(context.run, function, *args))
+
+
+async def _in_order(pending: "deque[asyncio.Future[T]]", start_next: Callable[[], "asyncio.Future[T] | None"]) -> AsyncGenerator[T, None]:
+    try:
+        while pending:
+            result = await pending.popleft()
+            # the next fetch runs while the caller handles this result
+            if (task := start_next()) is not None:
+                pending.append(task)
+            yield result
+    finally:
+        # a failed repository ends the stream, the fetches of the rest are not waited for
+        for task in pending:
+            task.cancel()
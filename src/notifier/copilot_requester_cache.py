@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+"""
+Cache of the humans who asked Copilot for a pull request, kept between runs.
+Finding the requester of a Copilot-authored PR takes its review requests and possibly all its reviews,
+and the author filter needs it for every such PR, also for those it drops (which the Pull Request cache never sees).
+The requester of a PR does not change, once found it is kept; a PR without one yet is only looked at again once it is updated.
+"""
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedRequester:
+    login: str | None  # None when no requester was found for the pull request as of its `updated_at`
+
+
+class CopilotRequesterCache:
+    """
+    Maps (repository, pull request number) to the requester resolved for the pull request.
+    A found requester is returned whatever the `updated_at`, a missing one only for the same `updated_at`.
+    Holds at most `max_entries` (least recently used are evicted first).
+    """
+
+    def __init__(self, path: Path, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self.__load()
+
+    @staticmethod
+    def __key(repository_name: str, number: int) -> str:
+        return f"{repository_name}#{number}"
+
+    def get(self, repository_name: str, number: int, updated_at: datetime) -> CachedRequester | None:
+        key = self.__key(repository_name, number)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or (entry["login"] is None and entry["updated_at"] != updated_at.isoformat()):
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+        return CachedRequester(entry["login"])
+
+    def put(self, repository_name: str, number: int, updated_at: datetime, login: str | None) -> None:
+        with self.__lock:
+            key = self.__key(repository_name, number)
+            self.__entries[key] = {"updated_at": updated_at.isoformat(), "login": login}
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def save(self) -> None:
+        with self.__lock:
+            entries = list(self.__entries.items())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(temporary_path, "w") as cache_file:
+            # a list keeps the LRU order explicit in the file
+            json.dump([[key, entry] for key, entry in entries], cache_file)
+        os.replace(temporary_path, self.path)
+        LOG.debug("Saved %d Copilot requester cache entries to %s", len(entries), self.path)
+
+    def __load(self) -> None:
+        try:
+            with open(self.path) as cache_file:
+                entries = json.load(cache_file)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError) as e:
+            LOG.warning("Ignoring unreadable Copilot requester cache %s: %s", self.path, e)
+            return
+        for key, entry in entries[-self.max_entries :]:
+            self.__entries[key] = entry
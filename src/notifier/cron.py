@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+"""
+Cron-style schedules of notifications run by the daemon, e.g. "0 9 * * 1-5" for 9:00 on workdays.
+The five fields are minute, hour, day of month, month and day of week (0-7, both 0 and 7 are Sunday),
+each being `*` or a list of values and ranges, optionally with a `/step`.
+"""
+
+# never more than this far ahead, a schedule like "0 0 30 2 *" (February 30th) never fires
+MAX_LOOKAHEAD_DAYS = 366 * 5
+
+
+def _parse_field(field: str, minimum: int, maximum: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in field.split(","):
+        range_part, _, step_part = part.partition("/")
+        step = int(step_part) if step_part else 1
+        if range_part == "*":
+            start, end = minimum, maximum
+        elif "-" in range_part:
+            start_part, _, end_part = range_part.partition("-")
+            start, end = int(start_part), int(end_part)
+        else:
+            # "5/15" means from 5 to the end of the range
+            start = int(range_part)
+            end = maximum if step_part else start
+        if step <= 0 or start < minimum or end > maximum or start > end:
+            raise ValueError(f"'{part}' is out of range {minimum}-{maximum}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True, slots=True)
+class CronSchedule:
+    expression: str
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days_of_month: frozenset[int]
+    months: frozenset[int]
+    days_of_week: frozenset[int]  # 0 is Monday, like datetime.weekday()
+    # like in cron, when both days are restricted a day matching either of them fires
+    any_day_of_month: bool
+    any_day_of_week: bool
+
+    @staticmethod
+    def parse(expression: str) -> "CronSchedule":
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Schedule '{expression}' must have 5 fields: minute hour day-of-month month day-of-week")
+        try:
+            days_of_week = _parse_field(fields[4], 0, 7)
+            return CronSchedule(
+                expression=expression,
+                minutes=_parse_field(fields[0], 0, 59),
+                hours=_parse_field(fields[1], 0, 23),
+                days_of_month=_parse_field(fields[2], 1, 31),
+                months=_parse_field(fields[3], 1, 12),
+                days_of_week=frozenset((day - 1) % 7 for day in days_of_week),
+                any_day_of_month=fields[2].startswith("*"),
+                any_day_of_week=fields[4].startswith("*"),
+            )
+        except ValueError as e:
+            raise ValueError(f"Invalid schedule '{expression}': {e}") from e
+
+    def next_after(self, moment: datetime) -> datetime:
+        """The first minute matching the schedule that is strictly after `moment`"""
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if self.__matches_day(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Schedule '{self.expression}' never fires")
+
+    def __matches_day(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        day_of_month = day.day in self.days_of_month
+        day_of_week = day.weekday() in self.days_of_week
+        if self.any_day_of_month or self.any_day_of_week:
+            return day_of_month and day_of_week
+        return day_of_month or day_of_week
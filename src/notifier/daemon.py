@@ -0,0 +1,67 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Callable
+
+from notifier.properties import Notification
+
+"""
+Long-running mode: one process runs every notification on its own schedule, keeping the GitHub and Slack connection pools
+and the in-memory caches warm between runs instead of paying the start-up of a new process for every run.
+"""
+
+LOG = logging.getLogger(__name__)
+
+# the wait for the next run is cut into steps of at most this long, so that changes of the wall clock (e.g. DST) are noticed
+MAX_WAIT_SECONDS = 60.0
+
+
+class NotificationDaemon:
+    def __init__(self, notifications: list[Notification], run: Callable[[list[Notification]], None], now: Callable[[], datetime] = datetime.now):
+        """
+        `run` runs the notifications that are due at the same time, one run at a time.
+        Notifications without a schedule are skipped.
+        """
+        self.__notifications = [notification for notification in notifications if notification.schedule is not None]
+        if len(self.__notifications) < len(notifications):
+            LOG.warning("%d notification(s) without a schedule will not be run by the daemon", len(notifications) - len(self.__notifications))
+        if not self.__notifications:
+            raise ValueError("None of the notifications has a schedule. Add a 'schedule' to the notifications the daemon should run.")
+        self.__run = run
+        self.__now = now
+        self.__stopped = threading.Event()
+
+    def run_forever(self) -> None:
+        """Runs the notifications when they are due until `stop` is called, a run in progress is finished first"""
+        now = self.__now()
+        next_runs = [self.__next_run(notification, now) for notification in self.__notifications]
+        while not self.__stopped.is_set():
+            now = self.__now()
+            due = [index for index, next_run in enumerate(next_runs) if next_run <= now]
+            if not due:
+                if self.__stopped.wait(min(MAX_WAIT_SECONDS, (min(next_runs) - now).total_seconds())):
+                    break
+                continue
+
+            LOG.info("Running %d due notification(s)", len(due))
+            try:
+                self.__run([self.__notifications[index] for index in due])
+            except Exception:  # pylint: disable=broad-exception-caught
+                # e.g. a connection error or a GitHub error the run did not expect, the next runs go on
+                LOG.exception("Scheduled run failed")
+            # runs missed while this one was running are skipped, not caught up on
+            now = self.__now()
+            for index in due:
+                next_runs[index] = self.__next_run(self.__notifications[index], now)
+        LOG.info("Daemon stopped")
+
+    def stop(self) -> None:
+        """Can be called from a signal handler or another thread"""
+        self.__stopped.set()
+
+    @staticmethod
+    def __next_run(notification: Notification, now: datetime) -> datetime:
+        assert notification.schedule is not None
+        next_run = notification.schedule.next_after(now)
+        LOG.info("Next run for channel '%s' at %s", notification.slack_channel, next_run.strftime("%Y-%m-%d %H:%M"))
+        return next_run
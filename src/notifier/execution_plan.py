@@ -0,0 +1,153 @@
+from dataclasses import dataclass
+
+from notifier.properties import (
+    Notification,
+    ProductivityNotification,
+    PullRequestNotification,
+    productivity_windows,
+)
+from notifier.repository import ProductivityScan, RepositoryPattern
+
+"""
+The planning stage between `read_config` and running the notifications: which (repository, data kind) fetches the notifications need,
+shared by all the notifications watching the repository, and which notifications send to which channel.
+The plan estimates the GitHub requests of a run, which `--explain` prints before anything runs.
+"""
+
+OPEN_PULL_REQUESTS = "open_pull_requests"
+MERGED_PULL_REQUESTS = "merged_pull_requests"
+
+
+@dataclass(frozen=True, slots=True)
+class CallEstimate:
+    fixed: int
+    per_pull_request: int  # per open PR for the open pull requests, per merged PR of the team for the merged ones
+
+    def __str__(self) -> str:
+        return f"{self.fixed} + {self.per_pull_request} per PR" if self.per_pull_request else str(self.fixed)
+
+
+# GitHub requests of a fetch, the repository itself is fetched once per run and counted separately (REST only).
+# REST lists the open PRs (one page per 30), then loads each one's line counts, reviews and review requests,
+# and searches for the merged PRs (one page per 30), then loads each one's line counts and reviews.
+# GraphQL gets everything in one query per 50 PRs.
+CALL_ESTIMATES = {
+    ("rest", OPEN_PULL_REQUESTS): CallEstimate(fixed=1, per_pull_request=3),
+    ("rest", MERGED_PULL_REQUESTS): CallEstimate(fixed=1, per_pull_request=2),
+    ("graphql", OPEN_PULL_REQUESTS): CallEstimate(fixed=1, per_pull_request=0),
+    ("graphql", MERGED_PULL_REQUESTS): CallEstimate(fixed=1, per_pull_request=0),
+}
+# the PR counts are not known before fetching, the total assumes these per repository
+ASSUMED_PULL_REQUESTS = {OPEN_PULL_REQUESTS: 10, MERGED_PULL_REQUESTS: 10}
+REPOSITORY_CALL = {"rest": 1, "graphql": 0}
+
+
+def notification_name(notification: Notification) -> str:
+    """Name of the notification in logs, run reports and the plan, e.g. `pull_requests:team-channel`"""
+    notification_type = "team_productivity" if isinstance(notification, ProductivityNotification) else "pull_requests"
+    return f"{notification_type}:{notification.slack_channel}"
+
+
+def notification_key(notification: Notification) -> str:
+    """
+    Tells apart the notifications of a channel by their `id`, the notifications without one by their name.
+    Unlike the filters, the id stays the same when the notification is edited, so its messages are still edited instead of posted again.
+    """
+    if notification.id is None:
+        return notification_name(notification)
+    return f"{notification_name(notification)}:{notification.id}"
+
+
+@dataclass(frozen=True, slots=True)
+class FetchStep:
+    repository_name: str
+    kind: str
+    # the notifications share the open pull requests (and each PR's reviews) of a repository,
+    # and one scan of its merged pull requests, for all the teams and back to the longest window (see `productivity_scans`)
+    notification_names: tuple[str, ...]
+
+    @property
+    def unexpanded(self) -> bool:
+        """A repository pattern the plan was built with, its repositories (and so its cost) are not known before its owner is listed"""
+        return RepositoryPattern.parse(self.repository_name) is not None
+
+
+@dataclass(frozen=True, slots=True)
+class ExecutionPlan:
+    fetches: list[FetchStep]
+    # notifications of each channel in the order of the config, channels in the order they first appear
+    channels: dict[str, list[Notification]]
+
+    @property
+    def notifications(self) -> list[Notification]:
+        """The notifications grouped by channel, so that a channel's messages are sent one after another"""
+        return [notification for channel_notifications in self.channels.values() for notification in channel_notifications]
+
+    @property
+    def repository_names(self) -> list[str]:
+        return list(dict.fromkeys(step.repository_name for step in self.fetches))
+
+    def estimate_api_calls(self, fetch_backend: str) -> int:
+        """The requests of the fetches, but those of the unexpanded repository patterns"""
+        fetches = [step for step in self.fetches if not step.unexpanded]
+        repository_names = dict.fromkeys(step.repository_name for step in fetches)
+        return len(repository_names) * REPOSITORY_CALL[fetch_backend] + sum(_estimate(fetch_backend, step) for step in fetches)
+
+    def estimate_api_calls_without_sharing(self, fetch_backend: str) -> int:
+        """What the run would cost if every notification fetched its repositories on its own"""
+        return sum(
+            (REPOSITORY_CALL[fetch_backend] + _estimate(fetch_backend, step)) * len(step.notification_names)
+            for step in self.fetches
+            if not step.unexpanded
+        )
+
+    def explain(self, fetch_backend: str) -> str:
+        lines = [f"Execution plan ({fetch_backend}): {len(self.fetches)} fetches of {len(self.repository_names)} repositories"]
+        for step in self.fetches:
+            step_estimate = "unexpanded pattern, not estimated" if step.unexpanded else f"{CALL_ESTIMATES[(fetch_backend, step.kind)]} requests"
+            lines.append(f"  fetch {step.kind} of {step.repository_name}: {step_estimate}, for {', '.join(step.notification_names)}")
+        lines.append(f"Sends to {len(self.channels)} channels")
+        for channel_name, channel_notifications in self.channels.items():
+            lines.append(f"  {channel_name}: {', '.join(notification_name(notification) for notification in channel_notifications)}")
+        lines.append(
+            f"Estimated GitHub requests: {self.estimate_api_calls(fetch_backend)}, {self.estimate_api_calls_without_sharing(fetch_backend)} without sharing"
+            f" (assuming {ASSUMED_PULL_REQUESTS[OPEN_PULL_REQUESTS]} open and {ASSUMED_PULL_REQUESTS[MERGED_PULL_REQUESTS]} merged PRs per repository)"
+        )
+        if unexpanded := [step.repository_name for step in self.fetches if step.unexpanded]:
+            lines.append(
+                f"Not estimated: {', '.join(dict.fromkeys(unexpanded))}, their owners were not listed lately (see repository_listing_ttl_hours)"
+            )
+        return "\n".join(lines)
+
+
+def _estimate(fetch_backend: str, step: FetchStep) -> int:
+    estimate = CALL_ESTIMATES[(fetch_backend, step.kind)]
+    return estimate.fixed + estimate.per_pull_request * ASSUMED_PULL_REQUESTS[step.kind]
+
+
+def plan_notifications(notifications: list[Notification]) -> ExecutionPlan:
+    fetches: dict[tuple[str, str], list[str]] = {}
+    channels: dict[str, list[Notification]] = {}
+    for notification in notifications:
+        kind = OPEN_PULL_REQUESTS if isinstance(notification, PullRequestNotification) else MERGED_PULL_REQUESTS
+        for repository_name in notification.config["repositories"]:
+            fetches.setdefault((repository_name, kind), []).append(notification_name(notification))
+        channels.setdefault(notification.slack_channel, []).append(notification)
+
+    return ExecutionPlan(
+        fetches=[FetchStep(repository_name, kind, tuple(names)) for (repository_name, kind), names in fetches.items()],
+        channels=channels,
+    )
+
+
+def productivity_scans(notifications: list[Notification]) -> dict[str, ProductivityScan]:
+    """The scan of each repository's merged pull requests shared by the productivity notifications watching it"""
+    scans: dict[str, ProductivityScan] = {}
+    for notification in notifications:
+        if not isinstance(notification, ProductivityNotification):
+            continue
+        scanned_days = productivity_windows(notification.config).scanned_days
+        for repository_name in notification.config["repositories"]:
+            scan = scans.get(repository_name, ProductivityScan(frozenset(), 0))
+            scans[repository_name] = ProductivityScan(scan.authors | set(notification.config["team_members"]), max(scan.scanned_days, scanned_days))
+    return scans
@@ -0,0 +1,73 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, TypeAlias
+
+from github import Auth, Github
+from github.Requester import (
+    HTTPRequestsConnectionClass,
+    HTTPSRequestsConnectionClass,
+    Requester,
+)
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+
+"""
+The HTTP layer underneath PyGithub. Every request PyGithub makes (REST and GraphQL) passes through a chain of middlewares,
+which lets us add caching and similar cross-cutting behavior without touching the code that uses PyGithub's objects.
+"""
+
+SendFunction: TypeAlias = Callable[[PreparedRequest], Response]
+
+# PyGithub only allows swapping its connection classes globally, so the swap and the Github construction must not interleave
+_INJECTION_LOCK = threading.Lock()
+
+
+class TransportMiddleware(ABC):
+    @abstractmethod
+    def handle(self, request: PreparedRequest, send: SendFunction) -> Response:
+        """Handle the request, calling `send` to pass it further down the chain (and eventually to the network)"""
+
+
+class GitHubTransportAdapter(HTTPAdapter):
+    def __init__(self, middlewares: list[TransportMiddleware], **kwargs: Any):
+        super().__init__(**kwargs)
+        self.middlewares = middlewares
+
+    def send(self, request: PreparedRequest, *args: Any, **kwargs: Any) -> Response:
+        def send_to_network(prepared_request: PreparedRequest) -> Response:
+            return super(GitHubTransportAdapter, self).send(prepared_request, *args, **kwargs)
+
+        send: SendFunction = send_to_network
+        for middleware in reversed(self.middlewares):
+            send = self.__bind(middleware, send)
+        return send(request)
+
+    @staticmethod
+    def __bind(middleware: TransportMiddleware, send: SendFunction) -> SendFunction:
+        return lambda prepared_request: middleware.handle(prepared_request, send)
+
+
+def create_github(github_url: str, token: str, middlewares: list[TransportMiddleware], **kwargs: Any) -> Github:
+    """Creates a PyGithub client whose HTTP connections send every request through the given middlewares"""
+    if not middlewares:
+        return Github(base_url=github_url, auth=Auth.Token(token), **kwargs)
+
+    class _HTTPConnection(HTTPRequestsConnectionClass):
+        def __init__(self, *args: Any, **connection_kwargs: Any):
+            super().__init__(*args, **connection_kwargs)
+            self.adapter = GitHubTransportAdapter(middlewares, max_retries=self.retry, pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            self.session.mount("http://", self.adapter)
+
+    class _HTTPSConnection(HTTPSRequestsConnectionClass):
+        def __init__(self, *args: Any, **connection_kwargs: Any):
+            super().__init__(*args, **connection_kwargs)
+            self.adapter = GitHubTransportAdapter(middlewares, max_retries=self.retry, pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            self.session.mount("https://", self.adapter)
+
+    # the Requester picks its connection class when it is created, so resetting right after the construction is safe
+    with _INJECTION_LOCK:
+        Requester.injectConnectionClasses(_HTTPConnection, _HTTPSConnection)
+        try:
+            return Github(base_url=github_url, auth=Auth.Token(token), **kwargs)
+        finally:
+            Requester.resetConnectionClasses()
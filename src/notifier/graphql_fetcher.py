@@ -0,0 +1,232 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any
+
+from github import UnknownObjectException
+from github.GithubException import GithubException
+from github.Requester import Requester
+
+from notifier.repository import (
+    ApprovalFact,
+    GitHubUser,
+    MergedPullRequestFact,
+    PullRequestSnapshot,
+    RepositoryProductivityFacts,
+    ReviewSnapshot,
+)
+
+"""
+Fetching pull requests together with their reviews and review requests using GitHub's GraphQL API.
+A whole repository is fetched with one query per page of pull requests instead of several REST calls per pull request.
+"""
+
+LOG = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+MAX_REVIEW_REQUESTS = 25
+MAX_LATEST_REVIEWS = 50
+MAX_APPROVALS = 50
+# the search API never returns more results than this for a single query
+MAX_SEARCH_RESULTS = 1000
+# GitHub shows pull requests and issues authored by deleted accounts as authored by "ghost"
+GHOST_LOGIN = "ghost"
+
+OPEN_PULL_REQUESTS_QUERY = """
+query($owner: String!, $name: String!, $pageSize: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: OPEN, first: $pageSize, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        title
+        isDraft
+        createdAt
+        updatedAt
+        url
+        additions
+        deletions
+        changedFiles
+        author { login }
+        reviewRequests(first: %d) { nodes { requestedReviewer { ... on User { login } } } }
+        latestReviews(first: %d) { nodes { databaseId state submittedAt author { login } } }
+      }
+    }
+  }
+}
+""" % (
+    MAX_REVIEW_REQUESTS,
+    MAX_LATEST_REVIEWS,
+)
+
+MERGED_PULL_REQUESTS_QUERY = """
+query($searchQuery: String!, $pageSize: Int!, $cursor: String) {
+  search(type: ISSUE, query: $searchQuery, first: $pageSize, after: $cursor) {
+    issueCount
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      ... on PullRequest {
+        number
+        mergedAt
+        additions
+        deletions
+        author { login }
+        reviews(states: APPROVED, first: %d) { nodes { submittedAt author { login } } }
+      }
+    }
+  }
+}
+""" % (MAX_APPROVALS,)
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _format_search_datetime(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def merged_pull_requests_query(repository_name: str, since_date: datetime, updated_since: datetime | None = None) -> str:
+    """The search (GraphQL and REST alike) for the pull requests merged since `since_date`, and updated since `updated_since` if given"""
+    search_query = f"repo:{repository_name} is:pr is:merged merged:>={_format_search_datetime(since_date)}"
+    if updated_since is not None and updated_since > since_date:
+        search_query += f" updated:>={_format_search_datetime(updated_since)}"
+    return search_query
+
+
+def _login(actor: dict[str, Any] | None) -> str:
+    return actor["login"] if actor else GHOST_LOGIN
+
+
+def _to_snapshot(node: dict[str, Any]) -> PullRequestSnapshot:
+    requested_reviewers = [
+        GitHubUser(login=request["requestedReviewer"]["login"])
+        for request in node["reviewRequests"]["nodes"]
+        # team review requests have no login, they are skipped just like in the REST implementation
+        if request.get("requestedReviewer") and "login" in request["requestedReviewer"]
+    ]
+    reviews = [
+        ReviewSnapshot(
+            user=GitHubUser(login=_login(review["author"])),
+            state=review["state"],
+            submitted_at=_parse_datetime(review["submittedAt"]) if review.get("submittedAt") else None,
+            # the REST id of the review, which the webhook events refer to
+            id=review.get("databaseId"),
+        )
+        for review in node["latestReviews"]["nodes"]
+    ]
+    return PullRequestSnapshot(
+        number=node["number"],
+        title=node["title"],
+        user=GitHubUser(login=_login(node["author"])),
+        draft=node["isDraft"],
+        created_at=_parse_datetime(node["createdAt"]),
+        updated_at=_parse_datetime(node["updatedAt"]),
+        html_url=node["url"],
+        additions=node["additions"],
+        deletions=node["deletions"],
+        changed_files=node["changedFiles"],
+        requested_reviewers=requested_reviewers,
+        reviews=reviews,
+    )
+
+
+def _to_productivity_facts(repository_name: str, nodes: list[dict[str, Any]]) -> tuple[list[MergedPullRequestFact], list[ApprovalFact]]:
+    merged_pull_requests: list[MergedPullRequestFact] = []
+    approvals: list[ApprovalFact] = []
+    for node in nodes:
+        if not node or not node.get("mergedAt"):
+            continue
+        merged_pull_requests.append(
+            MergedPullRequestFact(
+                repository_name=repository_name,
+                number=node["number"],
+                author=_login(node["author"]),
+                merged_at=_parse_datetime(node["mergedAt"]),
+                additions=node["additions"],
+                deletions=node["deletions"],
+            )
+        )
+        approvals.extend(
+            ApprovalFact(
+                repository_name=repository_name,
+                number=node["number"],
+                reviewer=_login(review["author"]),
+                submitted_at=_parse_datetime(review["submittedAt"]),
+            )
+            for review in node["reviews"]["nodes"]
+            if review.get("submittedAt")
+        )
+    return merged_pull_requests, approvals
+
+
+class GraphQLPullRequestSource:
+    def __init__(self, requester: Requester, github_url: str):
+        self.__requester = requester
+        self.__github_url = github_url
+
+    def get_open_pull_requests(self, repository_name: str) -> list[PullRequestSnapshot]:
+        owner, _, name = repository_name.partition("/")
+        if not owner or not name:
+            raise ValueError(f"Invalid repository name '{repository_name}', expected 'owner/name'")
+
+        pull_requests: list[PullRequestSnapshot] = []
+        cursor: str | None = None
+        while True:
+            variables = {"owner": owner, "name": name, "pageSize": PAGE_SIZE, "cursor": cursor}
+            try:
+                _, response = self.__requester.graphql_query(OPEN_PULL_REQUESTS_QUERY, variables)
+            except UnknownObjectException as e:
+                raise ValueError(f"Failed to find repository '{repository_name}' in {self.__github_url}", e) from e
+            except GithubException as e:
+                raise ValueError(f"Failed to retrieve data from {self.__github_url}", e) from e
+
+            repository = response["data"]["repository"]
+            if repository is None:
+                raise ValueError(f"Failed to find repository '{repository_name}' in {self.__github_url}")
+
+            page = repository["pullRequests"]
+            pull_requests.extend(_to_snapshot(node) for node in page["nodes"])
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            cursor = page["pageInfo"]["endCursor"]
+
+        LOG.debug("|-> Fetched %d open Pull Requests of %s via GraphQL", len(pull_requests), repository_name)
+        return pull_requests
+
+    def get_merged_pull_requests(
+        self, repository_name: str, since_date: datetime, updated_since: datetime | None = None
+    ) -> RepositoryProductivityFacts:
+        """
+        Asks the search API only for the pull requests merged since `since_date`, with their line counts and approvals in the same response.
+        Unlike scanning the closed pull requests, PRs closed without merging and PRs merged before the window are never downloaded.
+        With `updated_since`, only pull requests updated since then are returned (e.g. new approvals of an already merged PR).
+        """
+        search_query = merged_pull_requests_query(repository_name, since_date, updated_since)
+
+        merged_pull_requests: list[MergedPullRequestFact] = []
+        approvals: list[ApprovalFact] = []
+        cursor: str | None = None
+        while True:
+            variables = {"searchQuery": search_query, "pageSize": PAGE_SIZE, "cursor": cursor}
+            try:
+                _, response = self.__requester.graphql_query(MERGED_PULL_REQUESTS_QUERY, variables)
+            except GithubException as e:
+                raise ValueError(f"Failed to retrieve data from {self.__github_url}", e) from e
+
+            search = response["data"]["search"]
+            if cursor is None and search["issueCount"] > MAX_SEARCH_RESULTS:
+                LOG.warning(
+                    "|-> %s has %d PRs merged in the time window, only the first %d are counted",
+                    repository_name,
+                    search["issueCount"],
+                    MAX_SEARCH_RESULTS,
+                )
+            page_merged_pull_requests, page_approvals = _to_productivity_facts(repository_name, search["nodes"])
+            merged_pull_requests.extend(page_merged_pull_requests)
+            approvals.extend(page_approvals)
+            if not search["pageInfo"]["hasNextPage"]:
+                break
+            cursor = search["pageInfo"]["endCursor"]
+
+        return RepositoryProductivityFacts(repository_name=repository_name, merged_pull_requests=merged_pull_requests, approvals=approvals)
@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from requests import PreparedRequest, Response
+from requests.structures import CaseInsensitiveDict
+
+from notifier.github_transport import SendFunction, TransportMiddleware
+
+"""
+On-disk cache of GitHub responses revalidated with conditional requests (ETag / Last-Modified).
+GitHub does not count `304 Not Modified` responses against the primary rate limit, so a run that finds nothing changed
+costs almost none of the rate limit, even though it still asks GitHub about every resource.
+"""
+
+LOG = logging.getLogger(__name__)
+
+CACHE_FILE_SUFFIX = ".json"
+# rate limit headers of the 304 response are fresher than the cached ones, so they replace them on a cache hit
+_REFRESHED_HEADER_PREFIXES = ("x-ratelimit-", "date")
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    url: str
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    @property
+    def etag(self) -> str | None:
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self) -> str | None:
+        return self.headers.get("last-modified")
+
+
+class HttpResponseCache:
+    """
+    Stores responses as one file per request key in `directory`.
+    The total size is bounded by `max_size_bytes`, the least recently used entries are evicted first.
+    The sizes and the use order of the entries are indexed in memory, read from the directory once (the modification time of
+    a file is its last use), so evicting costs no file system calls besides the unlinks.
+    """
+
+    def __init__(self, directory: Path, max_size_bytes: int):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # file name -> size, the least recently used first
+        self.__index: OrderedDict[str, int] = OrderedDict()
+        self.__total_size = 0
+        entries = []
+        for path in self.directory.glob(f"*{CACHE_FILE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path.name, stat.st_size))
+        for _, file_name, size in sorted(entries):
+            self.__index[file_name] = size
+            self.__total_size += size
+
+    @staticmethod
+    def key_for(request: PreparedRequest) -> str:
+        # GitHub varies its responses on these headers, the token is hashed so that it never ends up on disk
+        authorization = hashlib.sha256(str(request.headers.get("Authorization", "")).encode()).hexdigest()
+        parts = [str(request.method), str(request.url), str(request.headers.get("Accept", "")), authorization]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> CachedResponse | None:
+        file_name = f"{key}{CACHE_FILE_SUFFIX}"
+        path = self.directory / file_name
+        try:
+            with open(path) as cache_file:
+                data = json.load(cache_file)
+            os.utime(path)  # mark as recently used for the eviction by the next runs
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            return None
+        with self.__lock:
+            if file_name in self.__index:
+                self.__index.move_to_end(file_name)
+        return CachedResponse(url=data["url"], status=data["status"], headers=data["headers"], body=base64.b64decode(data["body"]))
+
+    def put(self, key: str, response: CachedResponse) -> None:
+        file_name = f"{key}{CACHE_FILE_SUFFIX}"
+        payload = json.dumps(
+            {"url": response.url, "status": response.status, "headers": response.headers, "body": base64.b64encode(response.body).decode()}
+        )
+        if len(payload) > self.max_size_bytes:
+            return
+        temporary_path = self.directory / f"{file_name}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w") as cache_file:
+            cache_file.write(payload)
+        os.replace(temporary_path, self.directory / file_name)
+        with self.__lock:
+            self.__total_size += len(payload) - self.__index.pop(file_name, 0)
+            self.__index[file_name] = len(payload)
+            self.__evict()
+
+    def record_hit(self) -> None:
+        with self.__lock:
+            self.hits += 1
+
+    def record_miss(self) -> None:
+        with self.__lock:
+            self.misses += 1
+
+    def __evict(self) -> None:
+        if self.__total_size <= self.max_size_bytes:
+            return
+        while self.__total_size > self.max_size_bytes:
+            file_name, size = self.__index.popitem(last=False)
+            self.__total_size -= size
+            (self.directory / file_name).unlink(missing_ok=True)
+        LOG.debug("Evicted HTTP cache entries down to %d bytes", self.__total_size)
+
+
+class ConditionalRequestMiddleware(TransportMiddleware):
+    """Revalidates cached GET responses with If-None-Match / If-Modified-Since and replays the cached body on `304 Not Modified`"""
+
+    def __init__(self, cache: HttpResponseCache):
+        self.cache = cache
+
+    def handle(self, request: PreparedRequest, send: SendFunction) -> Response:
+        if request.method != "GET":
+            return send(request)
+
+        key = HttpResponseCache.key_for(request)
+        cached = self.cache.get(key)
+        if cached is not None:
+            if cached.etag:
+                request.headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                request.headers["If-Modified-Since"] = cached.last_modified
+
+        response = send(request)
+
+        if response.status_code == 304 and cached is not None:
+            self.cache.record_hit()
+            fresh_headers = {name.lower(): value for name, value in response.headers.items() if name.lower().startswith(_REFRESHED_HEADER_PREFIXES)}
+            response.close()
+            return _replay(request, cached, fresh_headers)
+
+        self.cache.record_miss()
+        if response.status_code == 200 and ("etag" in response.headers or "last-modified" in response.headers):
+            headers = {name.lower(): value for name, value in response.headers.items()}
+            # the stored body is already decoded, replaying it with the original encoding headers would break the decoding
+            headers.pop("content-encoding", None)
+            headers.pop("transfer-encoding", None)
+            headers.pop("content-length", None)
+            self.cache.put(key, CachedResponse(url=str(request.url), status=response.status_code, headers=headers, body=response.content))
+        return response
+
+
+def _replay(request: PreparedRequest, cached: CachedResponse, fresh_headers: dict[str, Any]) -> Response:
+    response = Response()
+    response.status_code = cached.status
+    response.reason = "OK"
+    response.headers = CaseInsensitiveDict({**cached.headers, **fresh_headers})
+    response._content = cached.body
+    response.encoding = "utf-8"
+    response.url = cached.url
+    response.request = request
+    return response
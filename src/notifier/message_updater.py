@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+
+from notifier.slack_client import SlackDispatcher, SlackMessageNotFoundError
+from notifier.summary_formatter import KeyedMessage
+
+"""
+Keeping a repository's digest in a channel up to date by editing the messages posted by the previous run instead of posting new ones.
+Each posted message is remembered with the key of what it shows (the repository header or a pull request) and a hash of its state,
+so unchanged messages cost no Slack call at all, and a closed or new pull request costs the call for its own message only.
+The state leaves out the ages of the pull requests: the age shown in a message is the one of its last edit, only the urgency emoji
+(which changes after a few days) makes an otherwise unchanged message be edited.
+"""
+
+LOG = logging.getLogger(__name__)
+
+
+def _content_hash(message: KeyedMessage) -> str:
+    return hashlib.sha256(message.state.encode()).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class PostedMessage:
+    key: str  # the key of the KeyedMessage it was posted for
+    channel_id: str
+    ts: str
+    content_hash: str
+
+
+class PostedMessageStore:
+    """
+    The messages last posted for each (channel, notification, repository), in the order of the last run's messages.
+    Notifications posting the same repository to a channel (e.g. with different filters) each keep their own messages.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__messages: dict[str, list[PostedMessage]] = {}
+        self.__load()
+
+    @staticmethod
+    def __key(channel_name: str, notification_key: str, repository_name: str) -> str:
+        return f"{channel_name} {notification_key} {repository_name}"
+
+    def get(self, channel_name: str, notification_key: str, repository_name: str) -> list[PostedMessage]:
+        with self.__lock:
+            return list(self.__messages.get(self.__key(channel_name, notification_key, repository_name), []))
+
+    def put(self, channel_name: str, notification_key: str, repository_name: str, messages: list[PostedMessage]) -> None:
+        key = self.__key(channel_name, notification_key, repository_name)
+        with self.__lock:
+            if messages:
+                self.__messages[key] = messages
+            else:
+                self.__messages.pop(key, None)
+
+    def save(self) -> None:
+        with self.__lock:
+            serialized = {key: [asdict(message) for message in messages] for key, messages in self.__messages.items()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(temporary_path, "w") as store_file:
+            json.dump(serialized, store_file)
+        os.replace(temporary_path, self.path)
+
+    def __load(self) -> None:
+        try:
+            with open(self.path) as store_file:
+                serialized = json.load(store_file)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError) as e:
+            LOG.warning("Ignoring unreadable Slack message store %s: %s", self.path, e)
+            return
+        try:
+            self.__messages = {key: [PostedMessage(**message) for message in messages] for key, messages in serialized.items()}
+        except TypeError as e:
+            LOG.warning("Ignoring the Slack message store %s of an older version: %s", self.path, e)
+
+
+class MessageUpdater:
+    def __init__(self, dispatcher: SlackDispatcher, store: PostedMessageStore):
+        self.__dispatcher = dispatcher
+        self.__client = dispatcher.client
+        self.__store = store
+
+    def sync_messages(self, channel_name: str, notification_key: str, repository_name: str, messages: list[KeyedMessage]) -> None:
+        """
+        Makes the messages the notification (see `execution_plan.notification_key`) posted for the repository in the channel
+        match `messages`, matched to the posted ones by their key:
+        unchanged ones are left alone, changed ones are edited, new ones posted (below the others, Slack has no way to insert a message)
+        and the ones no longer needed (e.g. for pull requests that were closed) deleted.
+        """
+        previous = {posted.key: posted for posted in self.__store.get(channel_name, notification_key, repository_name)}
+        results: list[PostedMessage | Future[PostedMessage]] = []
+        for message in messages:
+            content_hash = _content_hash(message)
+            posted = previous.get(message.key)
+            if posted is None:
+                results.append(self.__dispatcher.submit(channel_name, "chat.postMessage", partial(self.__post, channel_name, message, content_hash)))
+            elif posted.content_hash != content_hash:
+                results.append(
+                    self.__dispatcher.submit(channel_name, "chat.update", partial(self.__update, channel_name, posted, message, content_hash))
+                )
+            else:
+                results.append(posted)
+
+        keys = {message.key for message in messages}
+        stale_messages = [posted for key, posted in previous.items() if key not in keys]
+        deletions = [
+            (
+                stale_message,
+                self.__dispatcher.submit(
+                    channel_name, "chat.delete", partial(self.__client.delete_message, stale_message.channel_id, stale_message.ts)
+                ),
+            )
+            for stale_message in stale_messages
+        ]
+
+        unchanged = sum(isinstance(result, PostedMessage) for result in results)
+        LOG.info("|-> %s: %d of %d messages unchanged, %d to delete", repository_name, unchanged, len(messages), len(stale_messages))
+        # the channel's calls are made in order, so this runs once all of the calls above are done
+        self.__dispatcher.submit(
+            channel_name, "store", partial(self.__record, channel_name, notification_key, repository_name, previous, messages, results, deletions)
+        )
+
+    def __post(self, channel_name: str, message: KeyedMessage, content_hash: str) -> PostedMessage:
+        channel_id, ts = self.__client.post_message(channel_name, message.blocks)
+        return PostedMessage(message.key, channel_id, ts, content_hash)
+
+    def __update(self, channel_name: str, posted: PostedMessage, message: KeyedMessage, content_hash: str) -> PostedMessage:
+        try:
+            self.__client.update_message(posted.channel_id, posted.ts, message.blocks)
+            return PostedMessage(message.key, posted.channel_id, posted.ts, content_hash)
+        except SlackMessageNotFoundError:
+            # deleted by someone in the channel, it is posted again
+            return self.__post(channel_name, message, content_hash)
+
+    def __record(
+        self,
+        channel_name: str,
+        notification_key: str,
+        repository_name: str,
+        previous: dict[str, PostedMessage],
+        messages: list[KeyedMessage],
+        results: list[PostedMessage | Future[PostedMessage]],
+        deletions: list[tuple[PostedMessage, Future[None]]],
+    ) -> None:
+        posted_messages = []
+        for message, result in zip(messages, results):
+            if isinstance(result, PostedMessage):
+                posted_messages.append(result)
+            elif result.exception() is None:
+                posted_messages.append(result.result())
+            elif message.key in previous:
+                # the edit failed, the old message stays in the channel and is edited again by the next run
+                posted_messages.append(previous[message.key])
+        # a message that failed to be deleted (one already deleted counts as deleted) is kept, the next run deletes it again
+        posted_messages.extend(stale_message for stale_message, deletion in deletions if deletion.exception() is not None)
+        self.__store.put(channel_name, notification_key, repository_name, posted_messages)
@@ -1,10 +1,15 @@
 from notifier.repository import TeamProductivityMetrics
 from notifier.slack_client import SlackBlock, SlackBlockKitMessage
+from notifier.tracing import span
 
 
 class ProductivityMessageFormatter:
 
     def get_messages_for_team_metrics(self, metrics: TeamProductivityMetrics) -> list[SlackBlockKitMessage]:
+        with span("format_team_metrics", repositories=len(metrics.repository_breakdown)):
+            return [self.__format_blocks(metrics)]
+
+    def __format_blocks(self, metrics: TeamProductivityMetrics) -> SlackBlockKitMessage:
         blocks = []
 
         # Header
@@ -14,6 +19,11 @@ class ProductivityMessageFormatter:
         blocks.append({"type": "divider"})
         blocks.append(self.__format_team_totals(metrics))
 
+        # The other windows of the report, each with its totals
+        if metrics.other_windows:
+            blocks.append({"type": "divider"})
+            blocks.append(self.__format_other_windows(metrics))
+
         # Repository breakdown
         if metrics.repository_breakdown:
             blocks.append({"type": "divider"})
@@ -24,7 +34,7 @@ class ProductivityMessageFormatter:
             blocks.append({"type": "divider"})
             blocks.append(self.__format_top_reviewers(metrics))
 
-        return [blocks]
+        return blocks
 
     def __format_header(self, metrics: TeamProductivityMetrics) -> SlackBlock:
         return {
@@ -42,12 +52,23 @@ class ProductivityMessageFormatter:
             "text": {
                 "type": "mrkdwn",
                 "text": ":dart: *Team Totals*\n"
-                + f":white_check_mark: *{metrics.total_merged_prs}* merged PRs\n"
-                + f":heavy_plus_sign: *+{metrics.total_lines_added:,}* lines added\n"
-                + f":heavy_minus_sign: *-{metrics.total_lines_deleted:,}* lines deleted\n",
+                + f":white_check_mark: *{metrics.total_merged_prs}* merged PRs{_change(metrics, 'total_merged_prs')}\n"
+                + f":heavy_plus_sign: *+{metrics.total_lines_added:,}* lines added{_change(metrics, 'total_lines_added')}\n"
+                + f":heavy_minus_sign: *-{metrics.total_lines_deleted:,}* lines deleted{_change(metrics, 'total_lines_deleted')}\n"
+                + (f"_Compared to the previous {metrics.time_window_days} days_\n" if metrics.previous_period is not None else ""),
             },
         }
 
+    def __format_other_windows(self, metrics: TeamProductivityMetrics) -> SlackBlock:
+        windows_text = ":calendar: *Other Periods*\n"
+        for window in metrics.other_windows:
+            windows_text += (
+                f":small_orange_diamond: _Last {window.time_window_days} days_: *{window.total_merged_prs}* merged PRs{_change(window, 'total_merged_prs')}"
+                + f" (+{window.total_lines_added:,}/-{window.total_lines_deleted:,})\n"
+            )
+
+        return {"type": "section", "text": {"type": "mrkdwn", "text": windows_text.strip()}}
+
     def __format_repository_breakdown(self, metrics: TeamProductivityMetrics) -> SlackBlock:
         repo_text = ":bar_chart: *Repository Breakdown*\n"
 
@@ -92,3 +113,15 @@ class ProductivityMessageFormatter:
                 reviewer_text += f"{i+1}. {medal} *{username}*: {approval_count} {approval_text}\n"
 
         return {"type": "section", "text": {"type": "mrkdwn", "text": reviewer_text.strip()}}
+
+
+def _change(metrics: TeamProductivityMetrics, total: str) -> str:
+    """The change of a total against the previous period, e.g. ` (:arrow_up: +3)`, nothing when not compared"""
+    if metrics.previous_period is None:
+        return ""
+    current: int = getattr(metrics, total)
+    previous: int = getattr(metrics.previous_period, total)
+    if current == previous:
+        return " (:left_right_arrow: ±0)"
+    arrow = ":arrow_up:" if current > previous else ":arrow_down:"
+    return f" ({arrow} {current - previous:+,})"
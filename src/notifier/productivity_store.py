@@ -0,0 +1,158 @@
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from notifier.repository import (
+    ApprovalFact,
+    MergedPullRequestFact,
+    RepositoryProductivityFacts,
+)
+
+"""
+Local store of productivity facts (merged pull requests and their approvals) kept between runs.
+Each repository has a watermark telling which part of its history is already in the store,
+so a run only fetches the pull requests updated since the previous run and computes any window from the store.
+"""
+
+# fixed-width UTC timestamps compare correctly as strings, which lets SQLite use the indexes for the window queries
+_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS merged_pull_requests (
+    repository TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    author TEXT NOT NULL,
+    merged_at TEXT NOT NULL,
+    additions INTEGER NOT NULL,
+    deletions INTEGER NOT NULL,
+    PRIMARY KEY (repository, number)
+);
+CREATE INDEX IF NOT EXISTS merged_pull_requests_by_merged_at ON merged_pull_requests (repository, merged_at);
+CREATE TABLE IF NOT EXISTS approvals (
+    repository TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    reviewer TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    PRIMARY KEY (repository, number, reviewer, submitted_at)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    repository TEXT PRIMARY KEY,
+    covered_since TEXT NOT NULL,
+    fetched_until TEXT NOT NULL,
+    authors TEXT NOT NULL
+);
+"""
+
+
+def _to_timestamp(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime(_TIMESTAMP_FORMAT)
+
+
+def _from_timestamp(value: str) -> datetime:
+    return datetime.strptime(value, _TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True, slots=True)
+class Watermark:
+    """The store holds every PR by `authors` merged since `covered_since`, as seen by GitHub at `fetched_until`"""
+
+    covered_since: datetime
+    fetched_until: datetime
+    authors: frozenset[str]
+
+    def covers(self, since_date: datetime, authors: list[str]) -> bool:
+        return self.covered_since <= since_date and self.authors.issuperset(authors)
+
+
+class ProductivityStore:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # the fetcher calls the store from its worker threads, the lock serializes the access to the single connection
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock, self.__connection:
+            self.__connection.executescript(_SCHEMA)
+
+    def get_watermark(self, repository_name: str) -> Watermark | None:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT covered_since, fetched_until, authors FROM watermarks WHERE repository = ?", (repository_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return Watermark(covered_since=_from_timestamp(row[0]), fetched_until=_from_timestamp(row[1]), authors=frozenset(json.loads(row[2])))
+
+    def save(self, facts: RepositoryProductivityFacts, watermark: Watermark) -> None:
+        """
+        Inserts or updates the facts and moves the repository's watermark, all in one transaction.
+        The approvals of a pull request in `facts` replace those stored (an approval may have been dismissed since),
+        and the pull requests merged before the watermark's `covered_since` are dropped together with their approvals.
+        """
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO merged_pull_requests VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (pr.repository_name, pr.number, pr.author, _to_timestamp(pr.merged_at), pr.additions, pr.deletions)
+                    for pr in facts.merged_pull_requests
+                ],
+            )
+            self.__connection.executemany(
+                "DELETE FROM approvals WHERE repository = ? AND number = ?", [(pr.repository_name, pr.number) for pr in facts.merged_pull_requests]
+            )
+            self.__connection.executemany(
+                "INSERT OR IGNORE INTO approvals VALUES (?, ?, ?, ?)",
+                [
+                    (approval.repository_name, approval.number, approval.reviewer, _to_timestamp(approval.submitted_at))
+                    for approval in facts.approvals
+                ],
+            )
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+                (
+                    facts.repository_name,
+                    _to_timestamp(watermark.covered_since),
+                    _to_timestamp(watermark.fetched_until),
+                    json.dumps(sorted(watermark.authors)),
+                ),
+            )
+            covered_since = (facts.repository_name, _to_timestamp(watermark.covered_since))
+            self.__connection.execute(
+                "DELETE FROM approvals WHERE repository = ? AND number IN"
+                " (SELECT number FROM merged_pull_requests WHERE repository = ? AND merged_at < ?)",
+                (facts.repository_name, *covered_since),
+            )
+            self.__connection.execute("DELETE FROM merged_pull_requests WHERE repository = ? AND merged_at < ?", covered_since)
+
+    def load(self, repository_name: str, since_date: datetime) -> RepositoryProductivityFacts:
+        """Returns the pull requests merged since `since_date` and all approvals of those pull requests"""
+        since = _to_timestamp(since_date)
+        with self.__lock:
+            merged_rows = self.__connection.execute(
+                "SELECT number, author, merged_at, additions, deletions FROM merged_pull_requests"
+                " WHERE repository = ? AND merged_at >= ? ORDER BY merged_at",
+                (repository_name, since),
+            ).fetchall()
+            approval_rows = self.__connection.execute(
+                "SELECT approvals.number, reviewer, submitted_at FROM approvals"
+                " JOIN merged_pull_requests USING (repository, number)"
+                " WHERE repository = ? AND merged_at >= ? ORDER BY submitted_at",
+                (repository_name, since),
+            ).fetchall()
+
+        return RepositoryProductivityFacts(
+            repository_name=repository_name,
+            merged_pull_requests=[
+                MergedPullRequestFact(repository_name, number, author, _from_timestamp(merged_at), additions, deletions)
+                for number, author, merged_at, additions, deletions in merged_rows
+            ],
+            approvals=[
+                ApprovalFact(repository_name, number, reviewer, _from_timestamp(submitted_at)) for number, reviewer, submitted_at in approval_rows
+            ],
+        )
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
@@ -2,18 +2,24 @@ import json
 import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, TypedDict
+from typing import Any, NotRequired, TypedDict
 
 from dotenv import load_dotenv
 
+from notifier.cron import CronSchedule
 from notifier.repository import (
     AuthorFilter,
     DraftFilter,
+    ProductivityWindows,
     PullRequestFilter,
+    RepositoryPattern,
     TitleFilter,
 )
 
-load_dotenv()
+
+def load_environment() -> None:
+    """Loads the variables of the `.env` file into the environment, where the `get_*` functions read them from"""
+    load_dotenv()
 
 
 def _get_env(env_variable: str) -> str:
@@ -34,6 +40,10 @@ def get_github_api_url() -> str:
     return _get_env("GITHUB_REST_API_URL")
 
 
+def get_github_webhook_secret() -> str:
+    return _get_env("GITHUB_WEBHOOK_SECRET")
+
+
 def _strip_and_deduplicate(items: list[str]) -> list[str]:
     return list(dict.fromkeys(item.strip() for item in items if item.strip()))
 
@@ -46,28 +56,67 @@ class PullRequestConfig(TypedDict):
 class ProductivityConfig(TypedDict):
     repositories: list[str]
     team_members: list[str]
-    time_window_days: int
+    time_window_days: int  # the main window of the report, the first one configured
+    other_time_windows_days: NotRequired[list[int]]
+    compare_to_previous_period: NotRequired[bool]
+
+
+def productivity_windows(config: ProductivityConfig) -> ProductivityWindows:
+    return ProductivityWindows(
+        config["time_window_days"], tuple(config.get("other_time_windows_days", [])), config.get("compare_to_previous_period", False)
+    )
 
 
 @dataclass(frozen=True, slots=True)
 class PullRequestNotification:
     slack_channel: str
     config: PullRequestConfig
+    # GitHub requests of notifications with a higher priority are sent first when the rate limit is tight
+    priority: int = 0
+    # when the daemon (`--daemon`) runs the notification, notifications without a schedule are skipped by the daemon
+    schedule: CronSchedule | None = None
+    # tells apart the notifications of a channel whose messages are kept up to date (`update_messages`), whatever their filters
+    id: str | None = None
 
 
 @dataclass(frozen=True, slots=True)
 class ProductivityNotification:
     slack_channel: str
     config: ProductivityConfig
+    # GitHub requests of notifications with a higher priority are sent first when the rate limit is tight
+    priority: int = 0
+    # when the daemon (`--daemon`) runs the notification, notifications without a schedule are skipped by the daemon
+    schedule: CronSchedule | None = None
+    # tells apart the notifications of a channel whose messages are kept up to date (`update_messages`), whatever their filters
+    id: str | None = None
 
 
 Notification = PullRequestNotification | ProductivityNotification
 
+FETCH_BACKENDS = ("rest", "graphql")
 
-def read_config(config_path: Path) -> list[Notification]:
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    fetch_backend: str = "rest"
+    cache_dir: Path | None = None
+    http_cache_max_size_mb: int = 100
+    max_concurrent_fetches: int | None = None
+    pull_request_cache_max_entries: int = 5000
+    pull_request_cache_ttl_hours: int = 168
+    pack_messages: bool = False
+    update_messages: bool = False
+    webhook_port: int | None = None
+    run_report_file: Path | None = None
+    prometheus_metrics_file: Path | None = None
+    trace_file: Path | None = None
+    repository_listing_ttl_hours: int = 1
+
+
+def _load_config(config_path: Path) -> dict[str, Any]:
     try:
         with open(config_path) as json_data_file:
-            config = json.load(json_data_file)
+            config: dict[str, Any] = json.load(json_data_file)
     except FileNotFoundError as exc:
         raise FileNotFoundError(f"Config file {config_path} not found.") from exc
     except json.JSONDecodeError as exc:
@@ -78,32 +127,143 @@ def read_config(config_path: Path) -> list[Notification]:
     if not config:
         raise ValueError(f"Config file {config_path} is empty")
 
+    return config
+
+
+def read_settings(config_path: Path) -> Settings:
+    """Reads the optional top-level `settings` section of the config, falling back to defaults for anything not specified"""
+    settings = _load_config(config_path).get("settings", {})
+
+    fetch_backend = settings.get("fetch_backend", "rest")
+    if fetch_backend not in FETCH_BACKENDS:
+        raise ValueError(f"fetch_backend must be one of {FETCH_BACKENDS}")
+
+    pack_messages = settings.get("pack_messages", False)
+    if not isinstance(pack_messages, bool):
+        raise ValueError("pack_messages must be a boolean")
+
+    update_messages = settings.get("update_messages", False)
+    if not isinstance(update_messages, bool):
+        raise ValueError("update_messages must be a boolean")
+    if update_messages and "cache_dir" not in settings:
+        # the posted messages are remembered in the cache directory
+        raise ValueError("update_messages requires cache_dir")
+
+    cache_dir = None
+    if "cache_dir" in settings:
+        # relative paths are relative to the config file, so that the config works regardless of the working directory
+        cache_dir = config_path.parent / Path(settings["cache_dir"]).expanduser()
+
+    return Settings(
+        fetch_backend=fetch_backend,
+        cache_dir=cache_dir,
+        http_cache_max_size_mb=_get_positive_int(settings, "http_cache_max_size_mb", 100),
+        max_concurrent_fetches=_get_positive_int(settings, "max_concurrent_fetches", 1) if "max_concurrent_fetches" in settings else None,
+        pull_request_cache_max_entries=_get_positive_int(settings, "pull_request_cache_max_entries", 5000),
+        pull_request_cache_ttl_hours=_get_positive_int(settings, "pull_request_cache_ttl_hours", 168),
+        pack_messages=pack_messages,
+        update_messages=update_messages,
+        webhook_port=_get_positive_int(settings, "webhook_port", 8080) if "webhook_port" in settings else None,
+        run_report_file=_get_path(config_path, settings, "run_report_file"),
+        prometheus_metrics_file=_get_path(config_path, settings, "prometheus_metrics_file"),
+        trace_file=_get_path(config_path, settings, "trace_file"),
+        repository_listing_ttl_hours=_get_positive_int(settings, "repository_listing_ttl_hours", 1),
+    )
+
+
+def _get_path(config_path: Path, config_entry: dict[str, Any], key: str) -> Path | None:
+    """Optional path relative to the config file, like `cache_dir`"""
+    if key not in config_entry:
+        return None
+    value = config_entry[key]
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"{key} must be a path")
+    return config_path.parent / Path(value).expanduser()
+
+
+def _get_positive_int(config_entry: dict[str, Any], key: str, default: int) -> int:
+    value = config_entry.get(key, default)
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise ValueError(f"{key} must be a positive integer")
+    return value
+
+
+def read_config(config_path: Path) -> list[Notification]:
+    config = _load_config(config_path)
+
     result: list[Notification] = []
     for entry in config["notifications"]:
         channel_name = entry["slack_channel"]
         notification_type = entry.get("type", "pull_requests")  # Default to pull_requests for backward compatibility
+        priority = entry.get("priority", 0)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise ValueError("priority must be an integer")
+        schedule = _parse_schedule(entry)
+        notification_id = entry.get("id")
+        if notification_id is not None and (not isinstance(notification_id, str) or not notification_id.strip()):
+            raise ValueError("id must be a non-empty string")
 
         if notification_type == "pull_requests":
             pr_config: PullRequestConfig = {"repositories": _parse_repositories(entry), "filters": _parse_filters(entry)}
-            result.append(PullRequestNotification(slack_channel=channel_name, config=pr_config))
+            result.append(
+                PullRequestNotification(slack_channel=channel_name, config=pr_config, priority=priority, schedule=schedule, id=notification_id)
+            )
         elif notification_type == "team_productivity":
             repositories = _parse_repositories(entry)
             team_members = _parse_team_members(entry)
-            time_window_days = entry.get("time_window_days", 14)
-            if not isinstance(time_window_days, int) or time_window_days <= 0:
-                raise ValueError("time_window_days must be a positive integer")
+            time_windows_days = _parse_time_windows(entry)
+            compare_to_previous_period = entry.get("compare_to_previous_period", False)
+            if not isinstance(compare_to_previous_period, bool):
+                raise ValueError("compare_to_previous_period must be a boolean")
             productivity_config: ProductivityConfig = {
                 "repositories": repositories,
                 "team_members": team_members,
-                "time_window_days": time_window_days,
+                "time_window_days": time_windows_days[0],
+                "other_time_windows_days": time_windows_days[1:],
+                "compare_to_previous_period": compare_to_previous_period,
             }
-            result.append(ProductivityNotification(slack_channel=channel_name, config=productivity_config))
+            result.append(
+                ProductivityNotification(
+                    slack_channel=channel_name, config=productivity_config, priority=priority, schedule=schedule, id=notification_id
+                )
+            )
         else:
             raise ValueError(f"Unknown notification type: {notification_type}")
 
+    if config.get("settings", {}).get("update_messages", False):
+        _check_distinct_ids(result)
     return result
 
 
+def _check_distinct_ids(notifications: list[Notification]) -> None:
+    """The pull request notifications of a channel must have distinct ids, otherwise they would edit each other's messages"""
+    seen = set()
+    for notification in notifications:
+        if isinstance(notification, PullRequestNotification):
+            if (notification.slack_channel, notification.id) in seen:
+                raise ValueError(
+                    f"pull_requests notifications posting to channel '{notification.slack_channel}' need distinct ids with update_messages"
+                )
+            seen.add((notification.slack_channel, notification.id))
+
+
+def _parse_schedule(config_entry: dict[str, Any]) -> CronSchedule | None:
+    if "schedule" not in config_entry:
+        return None
+    if not isinstance(config_entry["schedule"], str):
+        raise ValueError("schedule must be a cron expression string")
+    return CronSchedule.parse(config_entry["schedule"])
+
+
+def _parse_time_windows(config_entry: dict[str, Any]) -> list[int]:
+    """`time_window_days` is a number of days or a list of them, e.g. `[7, 14, 30]`"""
+    time_windows = config_entry.get("time_window_days", 14)
+    time_windows = time_windows if isinstance(time_windows, list) else [time_windows]
+    if not time_windows or any(not isinstance(days, int) or isinstance(days, bool) or days <= 0 for days in time_windows):
+        raise ValueError("time_window_days must be a positive integer or a list of them")
+    return list(dict.fromkeys(time_windows))
+
+
 def _parse_team_members(config_entry: dict[str, Any]) -> list[str]:
     if "team_members" not in config_entry:
         raise ValueError("team_productivity notifications require 'team_members' field")
@@ -117,7 +277,11 @@ def _parse_team_members(config_entry: dict[str, Any]) -> list[str]:
 
 
 def _parse_repositories(config_entry: dict[str, Any]) -> list[str]:
-    return _strip_and_deduplicate(config_entry["repositories"])
+    repositories = _strip_and_deduplicate(config_entry["repositories"])
+    for entry in repositories:
+        # patterns like `myorg/*` are expanded when the notifications run, here they are only checked
+        RepositoryPattern.parse(entry)
+    return repositories
 
 
 def _parse_filters(config_entry: Any) -> list[PullRequestFilter]:
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from notifier.repository import PullRequestInfo, get_age
+
+"""
+Cache of PullRequestInfo kept between runs.
+A pull request that was not updated since the last run has the same review status, reviewers and line counts,
+so its details do not have to be fetched again. Only the age is time-dependent, it is recomputed on every read.
+"""
+
+LOG = logging.getLogger(__name__)
+
+
+class PullRequestInfoCache:
+    """
+    Maps (repository, pull request number) to the PullRequestInfo built for the pull request's `updated_at`.
+    An entry is only returned for the same `updated_at`, so any change to the pull request makes it a miss.
+    Entries are evicted when older than `ttl` or when the cache holds more than `max_entries` (least recently used first).
+    """
+
+    def __init__(self, path: Path, max_entries: int, ttl: timedelta):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self.__load()
+
+    @staticmethod
+    def __key(repository_name: str, number: int) -> str:
+        return f"{repository_name}#{number}"
+
+    def get(self, repository_name: str, number: int, updated_at: datetime) -> PullRequestInfo | None:
+        key = self.__key(repository_name, number)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry["updated_at"] != updated_at.isoformat() or self.__is_expired(entry):
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+
+        info = dict(entry["info"])
+        created_at = datetime.fromisoformat(info.pop("created_at"))
+        return PullRequestInfo(created_at=created_at, age=get_age(created_at), **info)
+
+    def put(self, repository_name: str, number: int, updated_at: datetime, info: PullRequestInfo) -> None:
+        serialized = asdict(info)
+        del serialized["age"]
+        serialized["created_at"] = info.created_at.isoformat()
+        with self.__lock:
+            key = self.__key(repository_name, number)
+            self.__entries[key] = {"updated_at": updated_at.isoformat(), "stored_at": time.time(), "info": serialized}
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def save(self) -> None:
+        with self.__lock:
+            entries = [(key, entry) for key, entry in self.__entries.items() if not self.__is_expired(entry)]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(temporary_path, "w") as cache_file:
+            # a list keeps the LRU order explicit in the file
+            json.dump([[key, entry] for key, entry in entries], cache_file)
+        os.replace(temporary_path, self.path)
+        LOG.debug("Saved %d Pull Request cache entries to %s", len(entries), self.path)
+
+    def __is_expired(self, entry: dict[str, Any]) -> bool:
+        return bool(time.time() - entry["stored_at"] > self.ttl.total_seconds())
+
+    def __load(self) -> None:
+        try:
+            with open(self.path) as cache_file:
+                entries = json.load(cache_file)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError) as e:
+            LOG.warning("Ignoring unreadable Pull Request cache %s: %s", self.path, e)
+            return
+        for key, entry in entries[-self.max_entries :]:
+            if not self.__is_expired(entry):
+                self.__entries[key] = entry
@@ -1,176 +1,463 @@
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import Future
 from datetime import datetime, timedelta, timezone
-from typing import TypedDict
+from functools import partial
 
-from github import Auth, Github, UnknownObjectException
+from github import UnknownObjectException
 from github.GithubException import GithubException
+from github.Issue import Issue
 from github.PaginatedList import PaginatedList
 from github.PullRequest import PullRequest
-
+from github.Repository import Repository
+from urllib3.util.retry import Retry
+
+from notifier.copilot_requester_cache import CopilotRequesterCache
+from notifier.github_transport import TransportMiddleware, create_github
+from notifier.graphql_fetcher import (
+    MAX_SEARCH_RESULTS,
+    GraphQLPullRequestSource,
+    merged_pull_requests_query,
+)
+from notifier.http_cache import ConditionalRequestMiddleware, HttpResponseCache
+from notifier.productivity_store import ProductivityStore, Watermark
+from notifier.pull_request_cache import PullRequestInfoCache
+from notifier.pull_request_index import PullRequestIndex
 from notifier.repository import (
+    ApprovalFact,
+    ListedRepository,
+    MergedPullRequestFact,
+    ProductivityScan,
+    ProductivityWindows,
+    PullRequestDetails,
     PullRequestFilter,
     PullRequestInfo,
+    PullRequestLike,
+    PullRequestSnapshot,
     RepositoryInfo,
-    RepositoryProductivityMetrics,
+    RepositoryProductivityFacts,
     TeamProductivityMetrics,
     create_pull_request_info,
+    create_pull_request_snapshot,
 )
+from notifier.request_scheduler import RateLimitScheduler
+from notifier.run_report import ApiCallAccounting, RunReport
+from notifier.tracing import span
+from notifier.worker_pool import WorkerPool
 
 LOG = logging.getLogger(__name__)
 
 CONNECTION_POOL_SIZE = 25
+WATERMARK_OVERLAP = timedelta(minutes=5)
+# the productivity store keeps the PRs merged within this many times the scanned window, older ones are dropped
+KEPT_WINDOWS = 2
 
 
-class _RepositoryProductivityData(TypedDict):
-    merged_prs_count: int
-    lines_added: int
-    lines_deleted: int
-    approvals: dict[str, int]
+def _applies(pr_filter: PullRequestFilter, pull_request: PullRequestLike, details: PullRequestDetails | None = None) -> bool:
+    with span(f"filter {type(pr_filter).__name__}", pull_request=pull_request.number):
+        return pr_filter.applies(pull_request, details)
 
 
 class PullRequestFetcher:
-    def __init__(self, github_url: str, token: str):
+    def __init__(
+        self,
+        github_url: str,
+        token: str,
+        fetch_backend: str = "rest",
+        http_cache: HttpResponseCache | None = None,
+        pull_request_cache: PullRequestInfoCache | None = None,
+        copilot_requester_cache: CopilotRequesterCache | None = None,
+        productivity_store: ProductivityStore | None = None,
+        pull_request_index: PullRequestIndex | None = None,
+        run_report: RunReport | None = None,
+        space_requests: bool = True,
+    ):
+        """
+        `space_requests=False` drops PyGithub's spacing of the requests (0.25s apart, writes incl. GraphQL queries 1s apart),
+        only meant for a server without GitHub's secondary rate limits, such as the fake GitHub of the benchmarks.
+        """
         self.__github_url = github_url
-        self.__github = Github(base_url=github_url, auth=Auth.Token(token), retry=3, pool_size=CONNECTION_POOL_SIZE)
-        self.__cached_pull_requests_for_repos: dict[str, PaginatedList[PullRequest]] = {}
-
-    def get_repository_info(self, repository_name: str, pull_request_filters: list[PullRequestFilter]) -> RepositoryInfo:
-        LOG.info("Fetching data for repository %s", repository_name)
-
-        # Check if we have cached data for this repository
-        if (cached_pull_requests := self.__cached_pull_requests_for_repos.get(repository_name)) is not None:
-            LOG.info("|-> Using cached data for this repo")
-            pull_requests = cached_pull_requests
-        else:
+        self.__pull_request_cache = pull_request_cache
+        self.__copilot_requester_cache = copilot_requester_cache
+        self.__productivity_store = productivity_store
+        # kept up to date by webhooks, the open pull requests are read from it instead of the API
+        self.__pull_request_index = pull_request_index
+        middlewares: list[TransportMiddleware] = []
+        if http_cache is not None:
+            middlewares.append(ConditionalRequestMiddleware(http_cache))
+        # closest to the network, so that the revalidations of cached responses are scheduled too
+        middlewares.append(RateLimitScheduler(max_concurrency=CONNECTION_POOL_SIZE))
+        if run_report is not None:
+            # behind the scheduler, so that every request that goes to the network is counted, retries included
+            middlewares.append(ApiCallAccounting(run_report))
+        # waiting out rate limits is left to the scheduler, urllib3 only retries failed connections
+        retry = Retry(total=3, respect_retry_after_header=False)
+        spacing = {} if space_requests else {"seconds_between_requests": None, "seconds_between_writes": None}
+        self.__github = create_github(github_url, token, middlewares, retry=retry, pool_size=CONNECTION_POOL_SIZE, **spacing)
+        self.__graphql_source = GraphQLPullRequestSource(self.__github.requester, github_url) if fetch_backend == "graphql" else None
+        # one pool for the per pull request work of all repositories, as big as the connection pool it keeps busy
+        self.__worker_pool = WorkerPool(max_workers=CONNECTION_POOL_SIZE)
+        self.__cached_pull_requests_for_repos: dict[str, list[PullRequestLike]] = {}
+        # shared by the notifications of a run: the repositories by both the pull request and the productivity path,
+        # the details (reviews, review requests) of a pull request by all the notifications watching its repository
+        self.__repositories: dict[str, Repository] = {}
+        self.__pull_request_details: dict[tuple[str, int], PullRequestDetails] = {}
+        # the merged pull requests of a repository are scanned once for all the teams watching it, see `share_productivity_scans`
+        self.__shared_productivity_scans: dict[str, tuple[frozenset[str], datetime]] = {}
+        self.__shared_productivity_facts: dict[str, RepositoryProductivityFacts] = {}
+        self.__run_state_lock = threading.Lock()
+        self.__repository_locks: dict[str, threading.Lock] = {}
+        self.__repository_locks_guard = threading.Lock()
+
+    @property
+    def worker_pool(self) -> WorkerPool:
+        return self.__worker_pool
+
+    def close(self) -> None:
+        self.__worker_pool.close()
+
+    def reset_run_state(self) -> None:
+        """Forgets the open pull requests fetched by the previous run, so that the next run sees the current ones. The caches between runs are kept."""
+        self.__cached_pull_requests_for_repos.clear()
+        self.__repositories.clear()
+        self.__pull_request_details.clear()
+        self.__shared_productivity_scans.clear()
+        self.__shared_productivity_facts.clear()
+
+    def share_productivity_scans(self, scans: dict[str, ProductivityScan]) -> None:
+        """
+        Scans the merged pull requests of each repository once in this run, for the union of the `authors` and back to `scanned_days`,
+        the productivity metrics of each team are then counted from the shared facts. Teams and windows not covered are scanned on their own.
+        """
+        now = datetime.now(timezone.utc)
+        with self.__run_state_lock:
+            self.__shared_productivity_scans = {
+                repository_name: (scan.authors, now - timedelta(days=scan.scanned_days)) for repository_name, scan in scans.items()
+            }
+            self.__shared_productivity_facts.clear()
+
+    def list_repositories(self, owner: str) -> list[ListedRepository]:
+        """The repositories of an organization or a user, in one paginated listing"""
+        with span("list_repositories", owner=owner):
             try:
-                repo = self.__github.get_repo(repository_name)
+                try:
+                    repositories = self.__list_repositories(f"/orgs/{owner}/repos", "all")
+                except UnknownObjectException:
+                    # not an organization but a user
+                    repositories = self.__list_repositories(f"/users/{owner}/repos", "owner")
             except UnknownObjectException as e:
-                raise ValueError(f"Failed to find repository '{repository_name}' in {self.__github_url}", e) from e
+                raise ValueError(f"Failed to find the organization or user '{owner}' in {self.__github_url}", e) from e
             except GithubException as e:
                 raise ValueError(f"Failed to retrieve data from {self.__github_url}", e) from e
 
-            pull_requests = repo.get_pulls(state="open", sort="created")
-            self.__cached_pull_requests_for_repos[repository_name] = pull_requests
+        with self.__run_state_lock:
+            # the listing has everything fetching a repository would get, this run does not have to get them again
+            for repository in repositories:
+                self.__repositories.setdefault(repository.full_name, repository)
+        return [
+            ListedRepository(
+                full_name=repository.full_name,
+                archived=repository.archived,
+                topics=repository.topics,
+                open_issues_count=repository.open_issues_count,
+                pushed_at=repository.pushed_at,
+            )
+            for repository in repositories
+        ]
 
-        LOG.info("|-> Found %d open Pull Requests", pull_requests.totalCount)
+    def __list_repositories(self, url: str, repository_type: str) -> list[Repository]:
+        # PyGithub's Organization completes itself (another request) before listing, the listing alone is enough
+        return list(PaginatedList(Repository, self.__github.requester, url, {"type": repository_type}))
 
-        filtered_pull_requests = self.__filter_pull_requests(pull_requests, pull_request_filters)
-        return RepositoryInfo(name=repository_name, pulls=filtered_pull_requests)
+    def get_repository_info(self, repository_name: str, pull_request_filters: list[PullRequestFilter]) -> RepositoryInfo:
+        with span("get_repository_info", repository=repository_name):
+            return self.__get_repository_info(repository_name, pull_request_filters)
 
-    def __filter_pull_requests(
-        self, pull_requests: PaginatedList[PullRequest], pull_request_filters: list[PullRequestFilter]
-    ) -> list[PullRequestInfo]:
-        if pull_requests.totalCount == 0:
-            return []
+    def __get_repository_info(self, repository_name: str, pull_request_filters: list[PullRequestFilter]) -> RepositoryInfo:
+        LOG.info("Fetching data for repository %s", repository_name)
 
-        filtered = []
-        for pull_request in pull_requests:
-            for pr_filter in pull_request_filters:
-                if not pr_filter.applies(pull_request):
-                    break
+        # Concurrent callers asking for the same repository wait for the first one instead of fetching it again
+        with self.__lock_for(repository_name):
+            if self.__pull_request_index is not None:
+                pull_requests: list[PullRequestLike] = list(
+                    self.__pull_request_index.get_open_pull_requests(repository_name, partial(self.__load_snapshots, repository_name))
+                )
+            # Check if we have cached data for this repository
+            elif (cached_pull_requests := self.__cached_pull_requests_for_repos.get(repository_name)) is not None:
+                LOG.info("|-> Using cached data for this repo")
+                pull_requests = cached_pull_requests
             else:
-                filtered.append(pull_request)
-        LOG.info("|-> Filtered down to %d Pull Requests", len(filtered))
-        with ThreadPoolExecutor(max_workers=CONNECTION_POOL_SIZE) as pool:
-            pr_infos = list(pool.map(create_pull_request_info, filtered))
-        return pr_infos
+                pull_requests = self.__fetch_open_pull_requests(repository_name)
+                self.__cached_pull_requests_for_repos[repository_name] = pull_requests
 
-    def get_team_productivity_metrics(self, repository_names: list[str], team_members: list[str], time_window_days: int) -> TeamProductivityMetrics:
-        LOG.info("Fetching team productivity metrics for %d repositories, %d days window", len(repository_names), time_window_days)
+        LOG.info("|-> Found %d open Pull Requests", len(pull_requests))
 
-        since_date = datetime.now(timezone.utc) - timedelta(days=time_window_days)
-        repository_metrics = []
-        total_merged_prs = 0
-        total_lines_added = 0
-        total_lines_deleted = 0
-        reviewer_approvals: dict[str, int] = {}
+        filtered_pull_requests = self.__filter_pull_requests(repository_name, pull_requests, pull_request_filters)
+        return RepositoryInfo(name=repository_name, pulls=filtered_pull_requests)
 
-        for repo_name in repository_names:
-            repo_data = self.__get_repository_productivity_data(repo_name, team_members, since_date)
+    def __lock_for(self, repository_name: str) -> threading.Lock:
+        with self.__repository_locks_guard:
+            return self.__repository_locks.setdefault(repository_name, threading.Lock())
 
-            repo_metrics = RepositoryProductivityMetrics(
-                repository_name=repo_name,
-                merged_prs_count=repo_data["merged_prs_count"],
-                lines_added=repo_data["lines_added"],
-                lines_deleted=repo_data["lines_deleted"],
+    def __fetch_open_pull_requests(self, repository_name: str) -> list[PullRequestLike]:
+        if self.__graphql_source is not None:
+            return list(self.__graphql_source.get_open_pull_requests(repository_name))
+
+        repo = self.__get_repository(repository_name)
+        try:
+            # materialize the pages right away, asking for `totalCount` would cost an extra request
+            return list(repo.get_pulls(state="open", sort="created"))
+        except GithubException as e:
+            raise ValueError(f"Failed to retrieve data from {self.__github_url}", e) from e
+
+    def __get_repository(self, repository_name: str) -> Repository:
+        with self.__run_state_lock:
+            if (repository := self.__repositories.get(repository_name)) is not None:
+                return repository
+        try:
+            repository = self.__github.get_repo(repository_name)
+        except UnknownObjectException as e:
+            raise ValueError(f"Failed to find repository '{repository_name}' in {self.__github_url}", e) from e
+        except GithubException as e:
+            raise ValueError(f"Failed to retrieve data from {self.__github_url}", e) from e
+        with self.__run_state_lock:
+            return self.__repositories.setdefault(repository_name, repository)
+
+    def __get_pull_request_details(self, repository_name: str, pull_request: PullRequestLike) -> PullRequestDetails:
+        with self.__run_state_lock:
+            return self.__pull_request_details.setdefault(
+                (repository_name, pull_request.number), PullRequestDetails(pull_request, repository_name, self.__copilot_requester_cache)
             )
 
-            repository_metrics.append(repo_metrics)
-            total_merged_prs += repo_data["merged_prs_count"]
-            total_lines_added += repo_data["lines_added"]
-            total_lines_deleted += repo_data["lines_deleted"]
+    def __load_snapshots(self, repository_name: str) -> list[PullRequestSnapshot]:
+        if self.__graphql_source is not None:
+            return self.__graphql_source.get_open_pull_requests(repository_name)
+        futures = [
+            self.__worker_pool.submit("pull_request_snapshot", create_pull_request_snapshot, pull_request)
+            for pull_request in self.__fetch_open_pull_requests(repository_name)
+        ]
+        return [future.result() for future in futures]
 
-            # Aggregate approval counts
-            for username, count in repo_data["approvals"].items():
-                reviewer_approvals[username] = reviewer_approvals.get(username, 0) + count
+    def __filter_pull_requests(
+        self, repository_name: str, pull_requests: list[PullRequestLike], pull_request_filters: list[PullRequestFilter]
+    ) -> list[PullRequestInfo]:
+        if not pull_requests:
+            return []
+
+        # filters reading only the list payload go first (whatever their order in the config) and run right here,
+        # the expensive ones run on the worker pool and only for the pull requests that passed the cheap ones
+        cheap_filters = [pr_filter for pr_filter in pull_request_filters if pr_filter.cost == 0]
+        expensive_filters = sorted((pr_filter for pr_filter in pull_request_filters if pr_filter.cost > 0), key=lambda pr_filter: pr_filter.cost)
+        candidates = [pull_request for pull_request in pull_requests if all(_applies(pr_filter, pull_request) for pr_filter in cheap_filters)]
+
+        futures = [
+            self.__worker_pool.submit("pull_request_info", self.__filter_and_describe, repository_name, pull_request, expensive_filters)
+            for pull_request in candidates
+        ]
+        pr_infos = [pr_info for future in futures if (pr_info := future.result()) is not None]
+        LOG.info("|-> Filtered down to %d Pull Requests", len(pr_infos))
+        return pr_infos
+
+    def __filter_and_describe(
+        self, repository_name: str, pull_request: PullRequestLike, expensive_filters: list[PullRequestFilter]
+    ) -> PullRequestInfo | None:
+        # whatever the filters fetch (e.g. review requests of a Copilot PR) is reused for the PullRequestInfo, and by the other notifications
+        details = self.__get_pull_request_details(repository_name, pull_request)
+        if not all(_applies(pr_filter, pull_request, details) for pr_filter in expensive_filters):
+            return None
+        return self.__get_pull_request_info(repository_name, pull_request, details)
+
+    def __get_pull_request_info(self, repository_name: str, pull_request: PullRequestLike, details: PullRequestDetails) -> PullRequestInfo:
+        updated_at = pull_request.updated_at
+        if self.__pull_request_cache is None or updated_at is None:
+            return create_pull_request_info(pull_request, details)
+        if (cached_info := self.__pull_request_cache.get(repository_name, pull_request.number, updated_at)) is not None:
+            return cached_info
+        pr_info = create_pull_request_info(pull_request, details)
+        self.__pull_request_cache.put(repository_name, pull_request.number, updated_at, pr_info)
+        return pr_info
+
+    def get_team_productivity_metrics(
+        self,
+        repository_names: list[str],
+        team_members: list[str],
+        time_window_days: int,
+        other_windows_days: list[int] | None = None,
+        compare_to_previous_period: bool = False,
+    ) -> TeamProductivityMetrics:
+        """The metrics of `time_window_days` and of the `other_windows_days`, all from one scan of the longest window"""
+        windows = ProductivityWindows(time_window_days, tuple(other_windows_days or ()), compare_to_previous_period)
+        LOG.info("Fetching team productivity metrics for %d repositories, %d days window", len(repository_names), windows.scanned_days)
+
+        now = datetime.now(timezone.utc)
+        since_date = now - timedelta(days=windows.scanned_days)
+        repository_facts = [self.get_repository_productivity_facts(repo_name, team_members, since_date) for repo_name in repository_names]
+        metrics = windows.summarize(repository_facts, team_members, now)
 
         LOG.info(
             "Team productivity summary: %d merged PRs, +%d/-%d lines across %d repositories",
-            total_merged_prs,
-            total_lines_added,
-            total_lines_deleted,
+            metrics.total_merged_prs,
+            metrics.total_lines_added,
+            metrics.total_lines_deleted,
             len(repository_names),
         )
-
-        return TeamProductivityMetrics(
-            time_window_days=time_window_days,
-            total_merged_prs=total_merged_prs,
-            total_lines_added=total_lines_added,
-            total_lines_deleted=total_lines_deleted,
-            repository_breakdown=repository_metrics,
-            reviewer_approvals=reviewer_approvals,
-        )
-
-    def __get_repository_productivity_data(self, repository_name: str, team_members: list[str], since_date: datetime) -> _RepositoryProductivityData:
+        return metrics
+
+    def get_repository_productivity_facts(self, repository_name: str, team_members: list[str], since_date: datetime) -> RepositoryProductivityFacts:
+        """
+        Fetches the pull requests authored by `team_members` merged since `since_date`, together with their approvals.
+        Within a shared scan, the facts of all the teams sharing it are returned, the summary counts only those of `team_members`.
+        """
+        with self.__run_state_lock:
+            shared_scan = self.__shared_productivity_scans.get(repository_name)
+        if shared_scan is None or not shared_scan[0].issuperset(team_members) or since_date < shared_scan[1]:
+            return self.__get_repository_productivity_facts(repository_name, team_members, since_date)
+
+        # the other teams wait for the first one instead of scanning again
+        with self.__lock_for(f"{repository_name} merged"):
+            with self.__run_state_lock:
+                facts = self.__shared_productivity_facts.get(repository_name)
+            if facts is None:
+                authors, shared_since_date = shared_scan
+                facts = self.__get_repository_productivity_facts(repository_name, sorted(authors), shared_since_date)
+                with self.__run_state_lock:
+                    self.__shared_productivity_facts[repository_name] = facts
+            return facts
+
+    def __get_repository_productivity_facts(self, repository_name: str, team_members: list[str], since_date: datetime) -> RepositoryProductivityFacts:
         LOG.info("Fetching productivity data for repository %s", repository_name)
 
+        if self.__productivity_store is None:
+            facts = self.__fetch_productivity_facts(repository_name, team_members, since_date, updated_since=since_date)
+        else:
+            facts = self.__fetch_productivity_facts_incrementally(self.__productivity_store, repository_name, team_members, since_date)
+
+        LOG.info("|-> Found %d merged PRs by the team with %d approvals", len(facts.merged_pull_requests), len(facts.approvals))
+        return facts
+
+    def __fetch_productivity_facts_incrementally(
+        self, store: ProductivityStore, repository_name: str, team_members: list[str], since_date: datetime
+    ) -> RepositoryProductivityFacts:
+        fetched_until = datetime.now(timezone.utc)
+        watermark = store.get_watermark(repository_name)
+        if watermark is not None and watermark.covers(since_date, team_members):
+            LOG.info("|-> Fetching only PRs updated since the last run at %s", watermark.fetched_until)
+            # the overlap makes up for clock differences between GitHub and this machine
+            updated_since = watermark.fetched_until - WATERMARK_OVERLAP
+            covered_since = max(watermark.covered_since, fetched_until - KEPT_WINDOWS * (fetched_until - since_date))
+            facts = self.__fetch_productivity_facts(repository_name, sorted(watermark.authors), covered_since, updated_since)
+            store.save(facts, Watermark(covered_since, fetched_until, watermark.authors))
+        else:
+            # a longer window or new team members than what the store covers, the whole window has to be fetched
+            authors = frozenset(team_members) | (watermark.authors if watermark is not None else frozenset())
+            facts = self.__fetch_productivity_facts(repository_name, sorted(authors), since_date, updated_since=since_date)
+            store.save(facts, Watermark(since_date, fetched_until, authors))
+
+        return store.load(repository_name, since_date)
+
+    def __fetch_productivity_facts(
+        self, repository_name: str, team_members: list[str], since_date: datetime, updated_since: datetime
+    ) -> RepositoryProductivityFacts:
+        if self.__graphql_source is not None:
+            facts = self.__graphql_source.get_merged_pull_requests(repository_name, since_date, updated_since)
+            # the search cannot OR several authors reliably, the team filter is applied to the (already small) search result
+            team = set(team_members)
+            merged_pull_requests = [pr for pr in facts.merged_pull_requests if pr.author in team]
+            numbers = {pr.number for pr in merged_pull_requests}
+            approvals = [approval for approval in facts.approvals if approval.number in numbers]
+        elif (found := self.__search_merged_pull_requests(repository_name, team_members, since_date, updated_since)) is not None:
+            merged_pull_requests, approvals = found
+        else:
+            merged_pull_requests, approvals = self.__scan_closed_pull_requests(repository_name, team_members, since_date, updated_since)
+
+        return RepositoryProductivityFacts(repository_name=repository_name, merged_pull_requests=merged_pull_requests, approvals=approvals)
+
+    def __search_merged_pull_requests(
+        self, repository_name: str, team_members: list[str], since_date: datetime, updated_since: datetime
+    ) -> tuple[list[MergedPullRequestFact], list[ApprovalFact]] | None:
+        """
+        Asks the search API only for the pull requests merged in the window, unlike the scan, PRs closed without merging
+        and PRs merged before the window are never downloaded. None when the window has more merged PRs than the search returns.
+        """
+        results = self.__github.search_issues(merged_pull_requests_query(repository_name, since_date, updated_since))
+        futures: list[Future[tuple[MergedPullRequestFact, list[ApprovalFact]]]] = []
         try:
-            repo = self.__github.get_repo(repository_name)
-        except UnknownObjectException as e:
-            raise ValueError(f"Failed to find repository '{repository_name}' in {self.__github_url}", e) from e
+            for issue in results:
+                # known once the first page is in
+                if results.totalCount > MAX_SEARCH_RESULTS:
+                    LOG.info("|-> %d PRs merged in the time window, more than the search returns, scanning the closed PRs", results.totalCount)
+                    return None
+                merged_at = issue.pull_request.merged_at if issue.pull_request is not None else None
+                # the search cannot OR several authors reliably, the team filter is applied to the search result
+                if merged_at is not None and issue.user.login in team_members:
+                    futures.append(
+                        self.__worker_pool.submit("merged_pull_request", self.__merged_pull_request_facts, repository_name, issue, merged_at)
+                    )
         except GithubException as e:
             raise ValueError(f"Failed to retrieve data from {self.__github_url}", e) from e
 
-        # Get closed PRs
-        closed_pulls = repo.get_pulls(state="closed", sort="updated", direction="desc")
-        LOG.info("|-> Found %d closed Pull Requests in total", closed_pulls.totalCount)
+        facts = [future.result() for future in futures]
+        return [merged_pull_request for merged_pull_request, _ in facts], [approval for _, approvals in facts for approval in approvals]
+
+    def __merged_pull_request_facts(
+        self, repository_name: str, issue: Issue, merged_at: datetime
+    ) -> tuple[MergedPullRequestFact, list[ApprovalFact]]:
+        # the search returns issues, the line counts are in the pull request itself
+        pr = issue.as_pull_request()
+        merged_pull_request = MergedPullRequestFact(
+            repository_name=repository_name,
+            number=issue.number,
+            author=issue.user.login,
+            merged_at=merged_at,
+            additions=pr.additions,
+            deletions=pr.deletions,
+        )
+        return merged_pull_request, self.__fetch_approvals(repository_name, pr)
 
-        merged_prs_count = 0
-        lines_added = 0
-        lines_deleted = 0
-        approval_counts: dict[str, int] = {}
+    def __scan_closed_pull_requests(
+        self, repository_name: str, team_members: list[str], since_date: datetime, updated_since: datetime
+    ) -> tuple[list[MergedPullRequestFact], list[ApprovalFact]]:
+        repo = self.__get_repository(repository_name)
+        merged_pull_requests: list[MergedPullRequestFact] = []
+        # the reviews are fetched on the worker pool while the scan goes on
+        approval_futures: list[Future[list[ApprovalFact]]] = []
 
-        for pr in closed_pulls:
+        # Get closed PRs
+        for pr in repo.get_pulls(state="closed", sort="updated", direction="desc"):
             LOG.info("|-> Examining PR #%d: '%s'", pr.number, pr.title)
-            # Stop if we've gone beyond our time window
-            if pr.updated_at and pr.updated_at < since_date:
+            # Stop if we've gone beyond our time window (or the PRs seen by the previous run)
+            if pr.updated_at and pr.updated_at < updated_since:
                 break
 
-            # Count merged PRs and approvals from team members
-            if pr.merged and pr.user.login in team_members:
-                merged_prs_count += 1
-                lines_added += pr.additions
-                lines_deleted += pr.deletions
+            # `merged_at` is part of the list payload, unlike `merged` which loads the full PR
+            if pr.merged_at is None or pr.merged_at < since_date or pr.user.login not in team_members:
+                continue
+
+            merged_pull_requests.append(
+                MergedPullRequestFact(
+                    repository_name=repository_name,
+                    number=pr.number,
+                    author=pr.user.login,
+                    merged_at=pr.merged_at,
+                    additions=pr.additions,
+                    deletions=pr.deletions,
+                )
+            )
 
-                # Count approvals from team members on PRs authored by team members
-                try:
-                    LOG.info("|->|-> Checking reviews for PR #%d", pr.number)
-                    reviews = pr.get_reviews()
-                    for review in reviews:
-                        if (
-                            review.state == "APPROVED"
-                            and review.user.login in team_members
-                            and review.submitted_at
-                            and review.submitted_at >= since_date
-                        ):
-                            reviewer_username = review.user.login
-                            LOG.info("|->|-> Found approval from %s", reviewer_username)
-                            approval_counts[reviewer_username] = approval_counts.get(reviewer_username, 0) + 1
-                except GithubException:
-                    # Skip reviews for this PR if we can't access them
-                    continue
-
-        LOG.info("|-> Found %d merged PRs with +%d/-%d lines, approvals: %s", merged_prs_count, lines_added, lines_deleted, dict(approval_counts))
-
-        return {"merged_prs_count": merged_prs_count, "lines_added": lines_added, "lines_deleted": lines_deleted, "approvals": approval_counts}
+            approval_futures.append(self.__worker_pool.submit("reviews", self.__fetch_approvals, repository_name, pr))
+
+        approvals = [approval for future in approval_futures for approval in future.result()]
+        return merged_pull_requests, approvals
+
+    @staticmethod
+    def __fetch_approvals(repository_name: str, pr: PullRequest) -> list[ApprovalFact]:
+        try:
+            LOG.info("|->|-> Checking reviews for PR #%d", pr.number)
+            return [
+                ApprovalFact(repository_name=repository_name, number=pr.number, reviewer=review.user.login, submitted_at=review.submitted_at)
+                for review in pr.get_reviews()
+                if review.state == "APPROVED" and review.submitted_at
+            ]
+        except GithubException:
+            # Skip reviews for this PR if we can't access them
+            return []
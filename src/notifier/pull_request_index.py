@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from notifier.repository import GitHubUser, PullRequestSnapshot, ReviewSnapshot
+
+"""
+In-memory index of the open pull requests of each repository, kept up to date by GitHub webhook events
+so that a digest can be produced without asking GitHub for anything.
+A repository is loaded from the API the first time it is asked for and again whenever the events may have missed something.
+"""
+
+LOG = logging.getLogger(__name__)
+
+# deliveries GitHub failed to make are not redelivered, a repository is loaded again after this long just in case
+RESYNC_INTERVAL = timedelta(hours=24)
+
+# actions of the `pull_request` event that introduce a pull request the index may not know yet
+_OPENING_ACTIONS = frozenset({"opened", "reopened"})
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _update_snapshot(previous: PullRequestSnapshot | None, payload: dict[str, Any]) -> PullRequestSnapshot:
+    """
+    Applies the `pull_request` object of an event to the snapshot. The object in review events lacks the line counts,
+    those are kept from the previous snapshot.
+    """
+    return PullRequestSnapshot(
+        number=payload["number"],
+        title=payload["title"],
+        user=GitHubUser(login=payload["user"]["login"]),
+        draft=payload.get("draft", False),
+        created_at=_parse_datetime(payload["created_at"]),
+        updated_at=_parse_datetime(payload["updated_at"]),
+        html_url=payload["html_url"],
+        additions=payload.get("additions", previous.additions if previous else 0),
+        deletions=payload.get("deletions", previous.deletions if previous else 0),
+        changed_files=payload.get("changed_files", previous.changed_files if previous else 0),
+        # team review requests have no login, they are skipped just like in the REST implementation
+        requested_reviewers=[GitHubUser(login=user["login"]) for user in payload.get("requested_reviewers", []) if "login" in user],
+        reviews=previous.reviews if previous else [],
+    )
+
+
+class _RepositoryIndex:
+    def __init__(self, pull_requests: list[PullRequestSnapshot]):
+        self.pull_requests = {pull_request.number: pull_request for pull_request in pull_requests}
+        self.loaded_at = time.monotonic()
+
+    def newest_first(self) -> list[PullRequestSnapshot]:
+        # the order the API lists them in
+        return sorted(self.pull_requests.values(), key=lambda pull_request: pull_request.created_at, reverse=True)
+
+
+class PullRequestIndex:
+    def __init__(self, resync_interval: timedelta = RESYNC_INTERVAL):
+        self.resync_interval = resync_interval
+        self.hits = 0
+        self.loads = 0
+        self.__lock = threading.Lock()
+        self.__repositories: dict[str, _RepositoryIndex] = {}
+        # events arriving while a repository is being loaded, applied on top of what was loaded
+        self.__pending_events: dict[str, list[tuple[str, dict[str, Any]]]] = {}
+
+    def get_open_pull_requests(self, repository_name: str, load: Callable[[], list[PullRequestSnapshot]]) -> list[PullRequestSnapshot]:
+        """
+        The open pull requests of the repository, newest first. `load` fetches them from the API when the index
+        does not have the repository yet or lost track of it. Concurrent calls for the same repository must be serialized by the caller.
+        """
+        with self.__lock:
+            repository = self.__repositories.get(repository_name)
+            if repository is not None and time.monotonic() - repository.loaded_at < self.resync_interval.total_seconds():
+                self.hits += 1
+                return repository.newest_first()
+            self.__repositories.pop(repository_name, None)
+            self.__pending_events[repository_name] = []
+            self.loads += 1
+
+        try:
+            pull_requests = load()
+        except BaseException:
+            with self.__lock:
+                self.__pending_events.pop(repository_name, None)
+            raise
+
+        with self.__lock:
+            repository = self.__repositories[repository_name] = _RepositoryIndex(pull_requests)
+            for event_name, payload in self.__pending_events.pop(repository_name):
+                self.__apply(repository_name, repository, event_name, payload)
+            if repository_name in self.__repositories:
+                return repository.newest_first()
+        # one of the pending events revealed a gap, what was loaded is still the best there is for this run
+        return pull_requests
+
+    def apply_event(self, event_name: str, payload: dict[str, Any]) -> None:
+        """Applies a `pull_request` or `pull_request_review` webhook event, events of repositories that are not indexed are ignored"""
+        repository_name = payload["repository"]["full_name"]
+        with self.__lock:
+            if (pending_events := self.__pending_events.get(repository_name)) is not None:
+                pending_events.append((event_name, payload))
+            elif (repository := self.__repositories.get(repository_name)) is not None:
+                self.__apply(repository_name, repository, event_name, payload)
+
+    def __apply(self, repository_name: str, repository: _RepositoryIndex, event_name: str, payload: dict[str, Any]) -> None:
+        action = payload["action"]
+        pull_request_payload = payload["pull_request"]
+        number = pull_request_payload["number"]
+        previous = repository.pull_requests.get(number)
+
+        if previous is None and not (event_name == "pull_request" and action in _OPENING_ACTIONS):
+            if pull_request_payload["state"] == "open":
+                # an open pull request the index never heard of, some of its events were missed
+                LOG.info("Missed events of %s#%d, the repository will be loaded again", repository_name, number)
+                del self.__repositories[repository_name]
+            return
+        if previous is not None and _parse_datetime(pull_request_payload["updated_at"]) < previous.updated_at:
+            LOG.debug("Ignoring out of order event %s.%s of %s#%d", event_name, action, repository_name, number)
+            return
+
+        if event_name == "pull_request" and action == "closed":
+            repository.pull_requests.pop(number, None)
+            return
+        snapshot = _update_snapshot(previous, pull_request_payload)
+        if event_name == "pull_request_review":
+            snapshot = replace(snapshot, reviews=self.__apply_review(snapshot.reviews, action, payload["review"]))
+        repository.pull_requests[number] = snapshot
+
+    @staticmethod
+    def __apply_review(reviews: list[ReviewSnapshot], action: str, review_payload: dict[str, Any]) -> list[ReviewSnapshot]:
+        review = ReviewSnapshot(
+            user=GitHubUser(login=review_payload["user"]["login"]),
+            # events use lowercase states, the API uppercase ones
+            state=review_payload["state"].upper(),
+            submitted_at=_parse_datetime(review_payload["submitted_at"]) if review_payload.get("submitted_at") else None,
+            id=review_payload["id"],
+        )
+        if action == "submitted":
+            # a redelivered event must not count the review twice
+            return reviews if any(existing.id == review.id for existing in reviews) else [*reviews, review]
+        if action == "dismissed":
+            return [replace(existing, state="DISMISSED") if existing.id == review.id else existing for existing in reviews]
+        return reviews
@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import fnmatch
 import math
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
-from datetime import datetime, timezone
+from collections.abc import Iterable
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, ClassVar, Protocol, TypeAlias
 
-import regex
-from github.PaginatedList import PaginatedList
-from github.PullRequest import PullRequest
-from github.PullRequestReview import PullRequestReview
+if TYPE_CHECKING:
+    # PyGithub and regex take a while to import, the config check and the snapshots do not need PyGithub, only title filters need regex
+    import regex
+    from github.PullRequest import PullRequest
+    from github.PullRequestReview import PullRequestReview
+
+    from notifier.copilot_requester_cache import CopilotRequesterCache
+
+from notifier.tracing import span
 
 COPILOT_AUTHOR_LOGINS = frozenset({"copilot", "copilot-swe-agent"})
 # Bot reviewer logins to ignore when picking the "first approver" fallback for Copilot-authored PRs.
@@ -19,21 +28,109 @@ def _is_copilot_author(login: str) -> bool:
     return login.lower() in COPILOT_AUTHOR_LOGINS
 
 
-def _resolve_copilot_requester(pull_request: PullRequest, requested_reviewer_logins: list[str] | None = None) -> str | None:
+@dataclass(frozen=True, slots=True)
+class GitHubUser:
+    login: str
+
+
+@dataclass(frozen=True, slots=True)
+class ReviewSnapshot:
+    user: GitHubUser
+    state: str
+    submitted_at: datetime | None = None
+    id: int | None = None  # needed to find the review a webhook event dismisses
+
+
+@dataclass(frozen=True, slots=True)
+class PullRequestSnapshot:
     """
-    For a Copilot-authored PR, return the human who requested the work.
-    Preference: first requested reviewer; fallback: first non-bot approver.
-    Pass `requested_reviewer_logins` to avoid a duplicate `get_review_requests` call when the caller already has them.
+    A pull request whose reviews and review requests were already fetched (e.g. by a single GraphQL query).
+    It mimics the subset of PyGithub's PullRequest used by the filters and `create_pull_request_info`, without any network I/O.
     """
-    if requested_reviewer_logins is None:
-        try:
-            requested_reviewer_logins = [user.login for user in pull_request.get_review_requests()[0]]
-        except (IndexError, AttributeError):
-            requested_reviewer_logins = []
-    if requested_reviewer_logins:
-        return requested_reviewer_logins[0]
-    try:
-        for review in pull_request.get_reviews():
+
+    number: int
+    title: str
+    user: GitHubUser
+    draft: bool
+    created_at: datetime
+    updated_at: datetime
+    html_url: str
+    additions: int
+    deletions: int
+    changed_files: int
+    requested_reviewers: list[GitHubUser] = field(default_factory=list)
+    reviews: list[ReviewSnapshot] = field(default_factory=list)
+
+    def get_review_requests(self) -> tuple[list[GitHubUser], list[Any]]:
+        return (self.requested_reviewers, [])
+
+    def get_reviews(self) -> list[ReviewSnapshot]:
+        return self.reviews
+
+
+PullRequestLike: TypeAlias = "PullRequest | PullRequestSnapshot"
+
+
+# Fields of a pull request that come with the list of pull requests, reading them costs no request.
+LIST_PAYLOAD_FIELDS = frozenset({"number", "title", "user", "draft", "created_at", "updated_at", "html_url"})
+# Fields that cost an extra request per pull request (for PyGithub's PullRequest; a PullRequestSnapshot carries all of them).
+FIELD_COSTS = {"review_requests": 1, "reviews": 1, "line_counts": 1}
+
+
+class PullRequestDetails:
+    """
+    The parts of a pull request that need a request each, loaded on first use and then remembered.
+    The filters and `create_pull_request_info` share one instance per pull request, so each part is fetched at most once.
+    With a `copilot_requester_cache`, the requester of a Copilot-authored PR of `repository_name` is resolved once across the runs.
+    """
+
+    def __init__(
+        self, pull_request: PullRequestLike, repository_name: str | None = None, copilot_requester_cache: CopilotRequesterCache | None = None
+    ):
+        self.pull_request = pull_request
+        self.repository_name = repository_name
+        self.copilot_requester_cache = copilot_requester_cache
+
+    @cached_property
+    def requested_reviewer_logins(self) -> list[str]:
+        with span("get_review_requests", pull_request=self.pull_request.number):
+            try:
+                return [user.login for user in self.pull_request.get_review_requests()[0]]  # returns (users, teams)
+            except (IndexError, AttributeError):
+                return []
+
+    @cached_property
+    def reviews(self) -> list[PullRequestReview | ReviewSnapshot]:
+        with span("get_reviews", pull_request=self.pull_request.number):
+            try:
+                return list(self.pull_request.get_reviews())
+            except (AttributeError, TypeError):
+                return []
+
+    @cached_property
+    def copilot_requester(self) -> str | None:
+        """
+        For a Copilot-authored PR, return the human who requested the work, None for other PRs.
+        Preference: first requested reviewer; fallback: first non-bot approver.
+        """
+        if not _is_copilot_author(self.pull_request.user.login):
+            return None
+        if self.repository_name is None or self.copilot_requester_cache is None:
+            with span("copilot_requester", pull_request=self.pull_request.number):
+                return self.__find_copilot_requester()
+
+        updated_at = self.pull_request.updated_at or self.pull_request.created_at
+        if (cached := self.copilot_requester_cache.get(self.repository_name, self.pull_request.number, updated_at)) is not None:
+            return cached.login
+        with span("copilot_requester", pull_request=self.pull_request.number):
+            requester = self.__find_copilot_requester()
+        self.copilot_requester_cache.put(self.repository_name, self.pull_request.number, updated_at, requester)
+        return requester
+
+    def __find_copilot_requester(self) -> str | None:
+        if self.requested_reviewer_logins:
+            return self.requested_reviewer_logins[0]
+        for review in self.reviews:
             if review.state != "APPROVED":
                 continue
             login = review.user.login
@@ -42,9 +139,7 @@ def _resolve_copilot_requester(pull_request: PullRequest, requested_reviewer_log
             if login.lower().endswith("[bot]"):
                 continue
             return login
-    except (AttributeError, TypeError):
-        pass
-    return None
+        return None
 
 
 @dataclass(frozen=True, slots=True)
@@ -83,9 +178,171 @@ class TeamProductivityMetrics:
     total_lines_deleted: int
     repository_breakdown: list[RepositoryProductivityMetrics]
     reviewer_approvals: dict[str, int]  # username -> approval count
+    # the same metrics for the period of the same length right before this one, when compared
+    previous_period: TeamProductivityMetrics | None = None
+    # the metrics of the other windows of the report (with their previous periods), in the order of the config
+    other_windows: list[TeamProductivityMetrics] = field(default_factory=list)
+
+    @property
+    def has_activity(self) -> bool:
+        """Whether any of the windows has something to report"""
+        return self.total_merged_prs > 0 or bool(self.reviewer_approvals) or any(window.has_activity for window in self.other_windows)
+
+
+@dataclass(frozen=True, slots=True)
+class MergedPullRequestFact:
+    repository_name: str
+    number: int
+    author: str
+    merged_at: datetime
+    additions: int
+    deletions: int
+
+
+@dataclass(frozen=True, slots=True)
+class ApprovalFact:
+    repository_name: str
+    number: int  # of the approved pull request
+    reviewer: str
+    submitted_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class RepositoryProductivityFacts:
+    """Merged pull requests of a repository and the approvals they received, the raw data the productivity metrics are computed from"""
+
+    repository_name: str
+    merged_pull_requests: list[MergedPullRequestFact]
+    approvals: list[ApprovalFact]
+
 
+TOPIC_PREFIX = "topic:"
+_GLOB_CHARACTERS = frozenset("*?[")
 
-def _get_age(from_when: datetime) -> tuple[int, int]:
+
+@dataclass(frozen=True, slots=True)
+class ListedRepository:
+    """What the listing of an owner's repositories tells about each of them, without any request per repository"""
+
+    full_name: str
+    archived: bool
+    topics: list[str]
+    open_issues_count: int  # open issues and pull requests
+    pushed_at: datetime | None  # None for an empty repository
+
+
+@dataclass(frozen=True, slots=True)
+class RepositoryPattern:
+    owner: str
+    name_pattern: str = "*"
+    topic: str | None = None
+
+    @classmethod
+    def parse(cls, entry: str) -> "RepositoryPattern | None":
+        """The pattern of a `repositories` entry, None for the name of a single repository"""
+        owner, _, name = entry.partition("/")
+        if _GLOB_CHARACTERS.intersection(owner):
+            raise ValueError(f"Repository pattern '{entry}' must name the owner, patterns only match the repository names")
+        if name.startswith(TOPIC_PREFIX):
+            topic = name.removeprefix(TOPIC_PREFIX).strip()
+            if not owner or not topic:
+                raise ValueError(f"Repository pattern '{entry}' must look like 'owner/topic:some-topic'")
+            return cls(owner, topic=topic.lower())
+        if not _GLOB_CHARACTERS.intersection(name):
+            return None
+        if not owner:
+            raise ValueError(f"Repository pattern '{entry}' must name the owner, e.g. 'owner/service-*'")
+        return cls(owner, name_pattern=name)
+
+    def matches(self, repository: ListedRepository) -> bool:
+        if self.topic is not None:
+            return self.topic in repository.topics
+        # repository names are case-insensitive on GitHub
+        return fnmatch.fnmatchcase(repository.full_name.partition("/")[2].lower(), self.name_pattern.lower())
+
+
+@dataclass(frozen=True, slots=True)
+class ProductivityWindows:
+    """The time windows of a productivity report, all computed from one scan of the pull requests merged in the longest of them"""
+
+    time_window_days: int
+    other_windows_days: tuple[int, ...] = ()
+    compare_to_previous_period: bool = False
+
+    @property
+    def scanned_days(self) -> int:
+        """How far back the pull requests are needed, the previous period of the longest window included"""
+        return max((self.time_window_days, *self.other_windows_days)) * (2 if self.compare_to_previous_period else 1)
+
+    def summarize(self, repository_facts: list[RepositoryProductivityFacts], team_members: list[str], now: datetime) -> TeamProductivityMetrics:
+        """`repository_facts` have to go back `scanned_days` from `now`"""
+
+        def window(days: int) -> TeamProductivityMetrics:
+            since_date = now - timedelta(days=days)
+            previous_period = None
+            if self.compare_to_previous_period:
+                previous_period = summarize_team_productivity(
+                    days, repository_facts, team_members, since_date - timedelta(days=days), until=since_date
+                )
+            return replace(summarize_team_productivity(days, repository_facts, team_members, since_date), previous_period=previous_period)
+
+        return replace(window(self.time_window_days), other_windows=[window(days) for days in self.other_windows_days])
+
+
+@dataclass(frozen=True, slots=True)
+class ProductivityScan:
+    """What the productivity notifications of a run need of a repository: the PRs of all their teams, back to the longest window"""
+
+    authors: frozenset[str]
+    scanned_days: int
+
+
+def summarize_team_productivity(
+    time_window_days: int,
+    repository_facts: list[RepositoryProductivityFacts],
+    team_members: list[str],
+    since_date: datetime,
+    until: datetime | None = None,
+) -> TeamProductivityMetrics:
+    """
+    Counts the pull requests authored by `team_members` and merged since `since_date` (and before `until`),
+    and the approvals team members gave to those pull requests since `since_date`.
+    """
+    team = set(team_members)
+    repository_metrics = []
+    reviewer_approvals: dict[str, int] = {}
+
+    def in_window(when: datetime) -> bool:
+        return when >= since_date and (until is None or when < until)
+
+    for facts in repository_facts:
+        counted_prs = [pr for pr in facts.merged_pull_requests if pr.author in team and in_window(pr.merged_at)]
+        repository_metrics.append(
+            RepositoryProductivityMetrics(
+                repository_name=facts.repository_name,
+                merged_prs_count=len(counted_prs),
+                lines_added=sum(pr.additions for pr in counted_prs),
+                lines_deleted=sum(pr.deletions for pr in counted_prs),
+            )
+        )
+
+        counted_numbers = {pr.number for pr in counted_prs}
+        for approval in facts.approvals:
+            if approval.number in counted_numbers and approval.reviewer in team and in_window(approval.submitted_at):
+                reviewer_approvals[approval.reviewer] = reviewer_approvals.get(approval.reviewer, 0) + 1
+
+    return TeamProductivityMetrics(
+        time_window_days=time_window_days,
+        total_merged_prs=sum(repo.merged_prs_count for repo in repository_metrics),
+        total_lines_added=sum(repo.lines_added for repo in repository_metrics),
+        total_lines_deleted=sum(repo.lines_deleted for repo in repository_metrics),
+        repository_breakdown=repository_metrics,
+        reviewer_approvals=reviewer_approvals,
+    )
+
+
+def get_age(from_when: datetime) -> tuple[int, int]:
+    """(days, hours) elapsed since `from_when`"""
     now = datetime.now(timezone.utc)
     difference = now - from_when
     days = difference.days
@@ -93,9 +350,12 @@ def _get_age(from_when: datetime) -> tuple[int, int]:
     return (days, hours)
 
 
-def _get_review_status(reviews: PaginatedList[PullRequestReview], required_reviewers: list[str] | None = None) -> str:
-    if reviews.totalCount == 0:
-        return "WAITING"
+def _get_review_status(reviews: Iterable[PullRequestReview | ReviewSnapshot], required_reviewers: list[str] | None = None) -> str:
+    with span("get_review_status"):
+        return _review_status_of(reviews, required_reviewers)
+
+
+def _review_status_of(reviews: Iterable[PullRequestReview | ReviewSnapshot], required_reviewers: list[str] | None) -> str:
     latest_reviews = {}
     for review in reviews:
         reviewer = review.user.login
@@ -123,50 +383,87 @@ def _get_review_status(reviews: PaginatedList[PullRequestReview], required_revie
     return "WAITING"
 
 
-def create_pull_request_info(pull_request: PullRequest) -> PullRequestInfo:
+def create_pull_request_info(pull_request: PullRequestLike, details: PullRequestDetails | None = None) -> PullRequestInfo:
     """
     Creates a PullRequestInfo from a PullRequest
-    Note that this method does network I/O - it calls the GitHub API to fetch the reviews for given Pull Request.
+    Note that this method does network I/O for PyGithub's PullRequest - it calls the GitHub API to fetch the reviews for given Pull Request.
+    A PullRequestSnapshot already carries its reviews, so no requests are made for it.
+    Pass the `details` the filters used, so that what they already fetched is not fetched again.
+    """
+    if details is None:
+        details = PullRequestDetails(pull_request)
+    with span("create_pull_request_info", pull_request=pull_request.number):
+        return PullRequestInfo(
+            name=pull_request.title,
+            author=pull_request.user.login,
+            created_at=pull_request.created_at,
+            age=get_age(pull_request.created_at),
+            review_status=_get_review_status(details.reviews, details.requested_reviewer_logins),
+            url=pull_request.html_url,
+            additions=pull_request.additions,
+            deletions=pull_request.deletions,
+            changed_files=pull_request.changed_files,
+            copilot_requester=details.copilot_requester,
+        )
+
+
+def create_pull_request_snapshot(pull_request: PullRequestLike) -> PullRequestSnapshot:
+    """
+    Copies everything the filters and `create_pull_request_info` read from a PyGithub's PullRequest, so that it can be kept and updated
+    without further requests. Costs the same requests as `create_pull_request_info`.
     """
-    # Fetch required reviewers (users only)
-    required_reviewers = []
-    try:
-        reqs = pull_request.get_review_requests()[0]  # returns (users, teams)
-        required_reviewers = [user.login for user in reqs]
-    except (IndexError, AttributeError):
-        pass
-    copilot_requester = _resolve_copilot_requester(pull_request, required_reviewers) if _is_copilot_author(pull_request.user.login) else None
-    return PullRequestInfo(
-        name=pull_request.title,
-        author=pull_request.user.login,
+    details = PullRequestDetails(pull_request)
+    return PullRequestSnapshot(
+        number=pull_request.number,
+        title=pull_request.title,
+        user=GitHubUser(login=pull_request.user.login),
+        draft=pull_request.draft,
         created_at=pull_request.created_at,
-        age=_get_age(pull_request.created_at),
-        review_status=_get_review_status(pull_request.get_reviews(), required_reviewers),
-        url=pull_request.html_url,
+        updated_at=pull_request.updated_at or pull_request.created_at,
+        html_url=pull_request.html_url,
         additions=pull_request.additions,
         deletions=pull_request.deletions,
         changed_files=pull_request.changed_files,
-        copilot_requester=copilot_requester,
+        requested_reviewers=[GitHubUser(login=login) for login in details.requested_reviewer_logins],
+        reviews=[
+            ReviewSnapshot(user=GitHubUser(login=review.user.login), state=review.state, submitted_at=review.submitted_at, id=review.id)
+            for review in details.reviews
+        ],
     )
 
 
 class PullRequestFilter(ABC):
+    """
+    Filters declare the pull request fields they read, the fetcher evaluates the cheap filters (reading only the list payload) first,
+    so the expensive ones only run for the pull requests that passed them.
+    """
+
+    required_fields: ClassVar[frozenset[str]] = LIST_PAYLOAD_FIELDS
+
+    @property
+    def cost(self) -> int:
+        """How many extra requests per pull request evaluating the filter may take"""
+        return sum(FIELD_COSTS.get(name, 0) for name in self.required_fields)
+
     @abstractmethod
-    def applies(self, pull_request: PullRequest) -> bool:
-        pass
+    def applies(self, pull_request: PullRequestLike, details: PullRequestDetails | None = None) -> bool:
+        """`details` memoizes the expensive fields, it is created on the fly when not passed"""
 
 
 @dataclass(frozen=True, slots=True)
 class AuthorFilter(PullRequestFilter):
     authors: list[str]
 
-    def applies(self, pull_request: PullRequest) -> bool:
+    # the review requests and reviews are only needed for Copilot-authored PRs
+    required_fields: ClassVar[frozenset[str]] = frozenset({"user", "review_requests", "reviews"})
+
+    def applies(self, pull_request: PullRequestLike, details: PullRequestDetails | None = None) -> bool:
         if not self.authors:
             return True
         if pull_request.user.login in self.authors:
             return True
         if _is_copilot_author(pull_request.user.login):
-            requester = _resolve_copilot_requester(pull_request)
+            requester = (details or PullRequestDetails(pull_request)).copilot_requester
             return requester is not None and requester in self.authors
         return False
 
@@ -175,7 +472,9 @@ class AuthorFilter(PullRequestFilter):
 class DraftFilter(PullRequestFilter):
     include_drafts: bool
 
-    def applies(self, pull_request: PullRequest) -> bool:
+    required_fields: ClassVar[frozenset[str]] = frozenset({"draft"})
+
+    def applies(self, pull_request: PullRequestLike, details: PullRequestDetails | None = None) -> bool:
         return self.include_drafts or pull_request.draft is False
 
 
@@ -184,15 +483,34 @@ class TitleFilter(PullRequestFilter):
     title_regex: str
     compiled_pattern: regex.Pattern = field(init=False)
 
+    required_fields: ClassVar[frozenset[str]] = frozenset({"title"})
+
     def __post_init__(self) -> None:
+        import regex
+
         try:
             self.compiled_pattern = regex.compile(self.title_regex)
         except regex.error as e:
             raise ValueError(f"The provided regex is invalid: {e}") from e
 
-    def applies(self, pull_request: PullRequest) -> bool:
+    def applies(self, pull_request: PullRequestLike, details: PullRequestDetails | None = None) -> bool:
         try:
             match = self.compiled_pattern.search(pull_request.title, timeout=0.1)  # 100ms timeout
             return match is not None
         except TimeoutError as e:
             raise ValueError("The provided regex is too complex and timed out.") from e
+
+
+class RepositoryDataSource(Protocol):
+    """What the notifications read from GitHub: PullRequestFetcher fetches it, ShardedFetcher serves what its worker processes fetched"""
+
+    def get_repository_info(self, repository_name: str, pull_request_filters: list[PullRequestFilter]) -> RepositoryInfo: ...
+
+    def get_team_productivity_metrics(
+        self,
+        repository_names: list[str],
+        team_members: list[str],
+        time_window_days: int,
+        other_windows_days: list[int] | None = None,
+        compare_to_previous_period: bool = False,
+    ) -> TeamProductivityMetrics: ...
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, replace
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from notifier.properties import (
+    Notification,
+    ProductivityNotification,
+    productivity_windows,
+)
+from notifier.repository import ListedRepository, RepositoryPattern
+
+"""
+Repository patterns in the `repositories` of a notification: `myorg/*`, `myorg/service-*` (a glob on the name) and
+`myorg/topic:backend` (the repositories of the owner with the topic). Each owner is listed once (one paginated listing),
+the listing is kept on disk for a while, so that the next runs do not list the owner again.
+The archived and the inactive repositories a pattern matches are skipped before anything is fetched for them.
+"""
+
+LOG = logging.getLogger(__name__)
+
+
+def has_repository_patterns(notifications: list[Notification]) -> bool:
+    return any(RepositoryPattern.parse(entry) is not None for notification in notifications for entry in notification.config["repositories"])
+
+
+class RepositoryDiscovery:
+    """
+    Expands the repository patterns of the notifications. The listings of the owners are kept for `ttl` in memory,
+    and in the file `cache_path` when given, so a repository created (or getting its first pull request) shows up once the listing expired.
+    """
+
+    def __init__(self, list_repositories: Callable[[str], list[ListedRepository]], ttl: timedelta, cache_path: Path | None = None):
+        self.list_repositories = list_repositories
+        self.ttl = ttl
+        self.cache_path = cache_path
+        self.__lock = threading.Lock()
+        self.__listings: dict[str, dict[str, Any]] = self.__load()
+
+    def expand(self, notifications: list[Notification]) -> tuple[list[Notification], list[tuple[Notification, Exception]]]:
+        """
+        The notifications with their repository patterns replaced by the repositories matching them,
+        and the notifications that could not be expanded (e.g. an owner failed to list) with the error, which the others do not wait for.
+        """
+        expanded: list[Notification] = []
+        failed: list[tuple[Notification, Exception]] = []
+        # listed once for all the notifications, even when the listing expires in between (or fails)
+        listings: dict[str, list[ListedRepository] | Exception] = {}
+        for notification in notifications:
+            if not any(RepositoryPattern.parse(entry) is not None for entry in notification.config["repositories"]):
+                expanded.append(notification)
+                continue
+            try:
+                if isinstance(notification, ProductivityNotification):
+                    # merging a pull request pushes to its repository, a repository without pushes in the window has nothing to count
+                    active_since = datetime.now(timezone.utc) - timedelta(days=productivity_windows(notification.config).scanned_days)
+                    repositories = self.resolve(
+                        notification.config["repositories"], lambda repository: _pushed_since(repository, active_since), listings
+                    )
+                    expanded.append(replace(notification, config={**notification.config, "repositories": repositories}))
+                else:
+                    repositories = self.resolve(notification.config["repositories"], lambda repository: repository.open_issues_count > 0, listings)
+                    expanded.append(replace(notification, config={**notification.config, "repositories": repositories}))
+            except (ValueError, RuntimeError, ConnectionError) as e:
+                failed.append((notification, e))
+        return expanded, failed
+
+    def resolve(
+        self,
+        entries: list[str],
+        is_active: Callable[[ListedRepository], bool],
+        listings: dict[str, list[ListedRepository] | Exception] | None = None,
+    ) -> list[str]:
+        """
+        The repositories of `entries` in their order, the explicitly named ones as they are,
+        the ones matching a pattern unless archived or not `is_active`. `listings` keeps the listings of the owners (or why
+        they failed) for the caller.
+        """
+        listings = {} if listings is None else listings
+        repositories: list[str] = []
+        for entry in entries:
+            pattern = RepositoryPattern.parse(entry)
+            if pattern is None:
+                repositories.append(entry)
+                continue
+            if (listing := listings.get(pattern.owner.lower())) is None:
+                try:
+                    listing = listings[pattern.owner.lower()] = self.__listing(pattern.owner)
+                except (ValueError, RuntimeError, ConnectionError) as e:
+                    listings[pattern.owner.lower()] = e
+                    raise
+            if isinstance(listing, Exception):
+                raise ValueError(f"Failed to list the repositories of '{pattern.owner}': {listing}")
+            matching = [repository for repository in listing if pattern.matches(repository)]
+            active = [repository.full_name for repository in matching if not repository.archived and is_active(repository)]
+            LOG.info(
+                "Repository pattern '%s' matches %d repositories, %d of them archived or inactive", entry, len(matching), len(matching) - len(active)
+            )
+            repositories.extend(active)
+        return list(dict.fromkeys(repositories))
+
+    def __listing(self, owner: str) -> list[ListedRepository]:
+        key = owner.lower()
+        with self.__lock:
+            listing = self.__listings.get(key)
+        if listing is not None and time.time() - listing["listed_at"] < self.ttl.total_seconds():
+            return [_listed_repository_from_dict(repository) for repository in listing["repositories"]]
+
+        LOG.info("Listing the repositories of %s", owner)
+        repositories = self.list_repositories(owner)
+        with self.__lock:
+            self.__listings[key] = {"listed_at": time.time(), "repositories": [_listed_repository_to_dict(repository) for repository in repositories]}
+            self.__save()
+        return repositories
+
+    def __load(self) -> dict[str, dict[str, Any]]:
+        if self.cache_path is None:
+            return {}
+        try:
+            with open(self.cache_path) as cache_file:
+                listings: dict[str, dict[str, Any]] = json.load(cache_file)
+                return listings
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, OSError) as e:
+            LOG.warning("Ignoring the repository listings in %s: %s", self.cache_path, e)
+            return {}
+
+    def __save(self) -> None:
+        if self.cache_path is None:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.cache_path.with_name(f"{self.cache_path.name}.tmp")
+        with open(temporary_path, "w") as cache_file:
+            json.dump(self.__listings, cache_file)
+        os.replace(temporary_path, self.cache_path)
+
+
+def _pushed_since(repository: ListedRepository, since: datetime) -> bool:
+    return repository.pushed_at is not None and repository.pushed_at >= since
+
+
+def _listed_repository_to_dict(repository: ListedRepository) -> dict[str, Any]:
+    serialized = asdict(repository)
+    serialized["pushed_at"] = repository.pushed_at.isoformat() if repository.pushed_at is not None else None
+    return serialized
+
+
+def _listed_repository_from_dict(serialized: dict[str, Any]) -> ListedRepository:
+    pushed_at = datetime.fromisoformat(serialized["pushed_at"]) if serialized["pushed_at"] is not None else None
+    return ListedRepository(**{**serialized, "pushed_at": pushed_at})
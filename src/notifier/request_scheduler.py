@@ -0,0 +1,206 @@
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Iterator, NamedTuple
+from urllib.parse import urlsplit
+
+from requests import PreparedRequest, Response
+
+from notifier.github_transport import SendFunction, TransportMiddleware
+
+"""
+Central scheduling of the requests sent to GitHub.
+Every request waits for a free slot, the number of slots follows the rate limit GitHub reports in the response headers,
+and requests rejected by a (primary or secondary) rate limit are queued until the limit resets instead of failing the notification.
+"""
+
+LOG = logging.getLogger(__name__)
+
+# below this share of the quota left, fewer requests run at once so the rest of the quota is not burnt in one burst
+LOW_QUOTA_RATIO = 0.1
+# the longest we wait for a rate limit to reset, beyond that the request is let through and fails
+MAX_WAIT_SECONDS = 15 * 60
+# GitHub asks to wait at least a minute after a secondary rate limit that came without Retry-After
+DEFAULT_RETRY_AFTER_SECONDS = 60
+
+_PRIORITY: ContextVar[int] = ContextVar("github_request_priority", default=0)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """GitHub requests sent within the block are queued with `priority`, requests with a higher priority are sent first"""
+    token = _PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def _resource_of(request: PreparedRequest) -> str:
+    """GitHub counts the REST, search and GraphQL requests against separate quotas"""
+    path = urlsplit(request.url).path if request.url else ""
+    if path.endswith("/graphql"):
+        return "graphql"
+    if "/search/" in path:
+        return "search"
+    return "core"
+
+
+def _retry_after_seconds(response: Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+
+def _is_rate_limited(response: Response) -> bool:
+    if response.status_code == 429:
+        return True
+    # a 403 is also returned for missing permissions, only the rate limit ones mention it in the message
+    return response.status_code == 403 and "rate limit" in response.text.lower()
+
+
+@dataclass
+class _Quota:
+    limit: int | None = None
+    remaining: int | None = None
+    reset_at: float = 0.0
+    paused_until: float = 0.0
+
+
+class _Ticket(NamedTuple):
+    # negated priority first, so that the smallest ticket is the one to go next
+    order: int
+    sequence: int
+    resource: str
+
+
+class RateLimitScheduler(TransportMiddleware):
+    def __init__(self, max_concurrency: int, max_retries: int = 3, max_wait_seconds: float = MAX_WAIT_SECONDS):
+        self.__max_concurrency = max_concurrency
+        self.__max_retries = max_retries
+        self.__max_wait_seconds = max_wait_seconds
+        # lowered on secondary rate limits, raised again by one after every `concurrency` successful requests
+        self.__concurrency = max_concurrency
+        self.__successes = 0
+        self.__running = 0
+        self.__waiting: list[_Ticket] = []
+        self.__sequence = itertools.count()
+        self.__quotas: dict[str, _Quota] = {}
+        self.__condition = threading.Condition()
+        self.throttled = 0
+
+    @property
+    def concurrency(self) -> int:
+        with self.__condition:
+            return self.__concurrency
+
+    def handle(self, request: PreparedRequest, send: SendFunction) -> Response:
+        resource = _resource_of(request)
+        attempt = 0
+        while True:
+            self.__acquire(resource)
+            try:
+                response = send(request)
+                wait_seconds = self.__update(resource, response)
+            finally:
+                self.__release()
+
+            if wait_seconds is None or attempt >= self.__max_retries:
+                return response
+            if wait_seconds > self.__max_wait_seconds:
+                LOG.warning("GitHub %s rate limit resets in %d seconds, not waiting for it", resource, wait_seconds)
+                return response
+
+            LOG.warning("GitHub %s rate limit hit, %s %s is queued for %.1f seconds", resource, request.method, request.path_url, wait_seconds)
+            response.close()
+            attempt += 1
+
+    def __quota(self, resource: str) -> _Quota:
+        return self.__quotas.setdefault(resource, _Quota())
+
+    def __pause_left(self, resource: str, now: float) -> float:
+        pause = self.__quota(resource).paused_until - now
+        # a pause longer than we are willing to wait is ignored, the request fails instead of blocking the run
+        return pause if 0 < pause <= self.__max_wait_seconds else 0.0
+
+    def __allowed_concurrency(self, resource: str, now: float) -> int:
+        quota = self.__quota(resource)
+        if quota.reset_at and now >= quota.reset_at:
+            quota.remaining = None
+        if not quota.limit or quota.remaining is None or quota.remaining >= quota.limit * LOW_QUOTA_RATIO:
+            return self.__concurrency
+        # spread what is left of the quota, down to a single request at a time
+        share = quota.remaining / (quota.limit * LOW_QUOTA_RATIO)
+        return min(self.__concurrency, max(1, math.ceil(self.__max_concurrency * share)))
+
+    def __wait_time(self, ticket: _Ticket) -> float | None:
+        """0 when the request can be sent now, otherwise how long to wait (None means until another request finishes)"""
+        now = time.time()
+        if pause := self.__pause_left(ticket.resource, now):
+            return pause
+        if self.__running >= self.__allowed_concurrency(ticket.resource, now):
+            return None
+        next_ticket = min(other for other in self.__waiting if not self.__pause_left(other.resource, now))
+        return 0 if next_ticket == ticket else None
+
+    def __acquire(self, resource: str) -> None:
+        ticket = _Ticket(-_PRIORITY.get(), next(self.__sequence), resource)
+        with self.__condition:
+            self.__waiting.append(ticket)
+            try:
+                while (wait_time := self.__wait_time(ticket)) != 0:
+                    self.__condition.wait(timeout=wait_time)
+            finally:
+                self.__waiting.remove(ticket)
+            self.__running += 1
+            # the next request in the queue may be able to start as well
+            self.__condition.notify_all()
+
+    def __release(self) -> None:
+        with self.__condition:
+            self.__running -= 1
+            self.__condition.notify_all()
+
+    def __update(self, resource: str, response: Response) -> float | None:
+        """Records the rate limit state reported by the response, returns how long to wait before retrying a rate limited request"""
+        now = time.time()
+        with self.__condition:
+            quota = self.__quota(resource)
+            if "X-RateLimit-Remaining" in response.headers:
+                quota.remaining = int(response.headers["X-RateLimit-Remaining"])
+                quota.limit = int(response.headers.get("X-RateLimit-Limit", quota.limit or 0)) or None
+                quota.reset_at = float(response.headers.get("X-RateLimit-Reset", 0))
+                if quota.remaining == 0 and quota.reset_at > now:
+                    quota.paused_until = max(quota.paused_until, quota.reset_at)
+
+            if not _is_rate_limited(response):
+                self.__successes += 1
+                if self.__successes >= self.__concurrency and self.__concurrency < self.__max_concurrency:
+                    self.__concurrency += 1
+                    self.__successes = 0
+                return None
+
+            self.throttled += 1
+            retry_after = _retry_after_seconds(response)
+            if retry_after is None and quota.remaining == 0 and quota.reset_at > now:
+                retry_after = quota.reset_at - now
+            elif retry_after is None:
+                retry_after = DEFAULT_RETRY_AFTER_SECONDS
+            if quota.remaining != 0:
+                # quota left but still rejected, a secondary rate limit: too many requests at once
+                self.__concurrency = max(1, self.__concurrency // 2)
+                self.__successes = 0
+            quota.paused_until = max(quota.paused_until, now + retry_after)
+            return retry_after
@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import urlsplit
+
+from requests import PreparedRequest, Response
+
+from notifier.github_transport import SendFunction, TransportMiddleware
+
+"""
+Accounting of the GitHub and Slack calls of a run: per endpoint, per repository and per notification,
+written at the end of a run as a JSON report and optionally in the Prometheus text format (e.g. for the node exporter's textfile collector).
+"""
+
+LOG = logging.getLogger(__name__)
+
+# calls made outside of any notification, or not about a particular repository
+UNATTRIBUTED = "-"
+
+_NOTIFICATION: ContextVar[str] = ContextVar("reported_notification", default=UNATTRIBUTED)
+_NUMBER = re.compile(r"/\d+(?=/|$)")
+
+
+@contextmanager
+def reported_notification(name: str) -> Iterator[None]:
+    """GitHub and Slack calls made within the block are accounted to the notification `name`"""
+    token = _NOTIFICATION.set(name)
+    try:
+        yield
+    finally:
+        _NOTIFICATION.reset(token)
+
+
+def current_notification() -> str:
+    return _NOTIFICATION.get()
+
+
+@dataclass(frozen=True, slots=True)
+class CallCounts:
+    calls: int = 0
+    retries: int = 0
+    errors: int = 0
+    not_modified: int = 0  # revalidated cached responses, free for the rate limit
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+    def __add__(self, other: "CallCounts") -> "CallCounts":
+        return CallCounts(*(mine + theirs for mine, theirs in zip(self.__values(), other.__values())))
+
+    def __values(self) -> tuple[int, ...]:
+        return (self.calls, self.retries, self.errors, self.not_modified, self.bytes_sent, self.bytes_received)
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitUsage:
+    limit: int
+    remaining: int
+    reset_at: int
+    used: int = 0  # by this process (and whatever else shares the token) while it was watching
+
+
+@dataclass(frozen=True, slots=True)
+class GitHubCalls:
+    """The GitHub calls of one RunReport, to be added to another one, e.g. those of a worker process to the report of the run"""
+
+    by_endpoint: dict[str, CallCounts]
+    by_repository: dict[str, CallCounts]
+    by_notification: dict[str, CallCounts]
+    rate_limits: dict[str, RateLimitUsage]
+
+
+@dataclass
+class _Breakdown:
+    by_endpoint: dict[str, CallCounts] = field(default_factory=dict)
+    by_repository: dict[str, CallCounts] = field(default_factory=dict)
+    by_notification: dict[str, CallCounts] = field(default_factory=dict)
+
+    def add(self, endpoint: str, repository: str, notification: str, counts: CallCounts) -> None:
+        for breakdown, key in ((self.by_endpoint, endpoint), (self.by_repository, repository), (self.by_notification, notification)):
+            breakdown[key] = breakdown.get(key, CallCounts()) + counts
+
+
+def _body_of(request: PreparedRequest) -> bytes:
+    if isinstance(request.body, str):
+        return request.body.encode()
+    # streamed bodies are not sent by the GitHub client
+    return request.body if isinstance(request.body, bytes) else b""
+
+
+def _endpoint_of(request: PreparedRequest) -> tuple[str, str]:
+    """(endpoint, repository) of a GitHub request, with the repository and numbers taken out of the endpoint"""
+    path = urlsplit(request.url).path if request.url else ""
+    if path.endswith("/graphql"):
+        try:
+            payload = json.loads(_body_of(request) or b"{}")
+        except json.JSONDecodeError:
+            return "POST /graphql", UNATTRIBUTED
+        variables = payload.get("variables") or {}
+        # the first field of the query tells the queries apart, e.g. `repository` or `search`
+        query_field = re.search(r"\{\s*(\w+)", payload.get("query", ""))
+        repository = f"{variables['owner']}/{variables['name']}" if "owner" in variables and "name" in variables else UNATTRIBUTED
+        if search_repository := re.search(r"\brepo:(\S+)", variables.get("searchQuery", "")):
+            repository = search_repository.group(1)
+        return f"POST /graphql {query_field.group(1) if query_field else ''}".rstrip(), repository
+
+    # GitHub Enterprise serves the API under a prefix, e.g. /api/v3
+    if (repos_match := re.search(r"/repos/([^/]+/[^/]+)(/.*)?$", path)) is not None:
+        rest = _NUMBER.sub("/{number}", repos_match.group(2) or "")
+        return f"{request.method} /repos/{{repo}}{rest}", repos_match.group(1)
+    return f"{request.method} {_NUMBER.sub('/{number}', path)}", UNATTRIBUTED
+
+
+class RunReport:
+    def __init__(self) -> None:
+        self.started_at = datetime.now(timezone.utc)
+        self.__lock = threading.Lock()
+        self.__github = _Breakdown()
+        self.__slack = _Breakdown()
+        self.__slack_by_channel: dict[str, CallCounts] = {}
+        self.__rate_limits: dict[str, RateLimitUsage] = {}
+        self.__caches: dict[str, dict[str, int]] = {}
+
+    def record_github_call(self, request: PreparedRequest, response: Response, retry: bool) -> None:
+        endpoint, repository = _endpoint_of(request)
+        counts = CallCounts(
+            calls=1,
+            retries=int(retry),
+            errors=int(response.status_code >= 400),
+            not_modified=int(response.status_code == 304),
+            bytes_sent=len(_body_of(request)),
+            bytes_received=len(response.content or b""),
+        )
+        with self.__lock:
+            self.__github.add(endpoint, repository, current_notification(), counts)
+            if "X-RateLimit-Remaining" in response.headers:
+                self.__record_rate_limit(response)
+
+    def record_slack_call(self, channel_name: str, method: str, notification: str, retries: int, failed: bool) -> None:
+        counts = CallCounts(calls=1, retries=retries, errors=int(failed))
+        with self.__lock:
+            self.__slack.add(method, channel_name, notification, counts)
+            self.__slack_by_channel[channel_name] = self.__slack_by_channel.get(channel_name, CallCounts()) + counts
+
+    def record_cache(self, name: str, hits: int, misses: int) -> None:
+        with self.__lock:
+            self.__caches[name] = {"hits": hits, "misses": misses}
+
+    def github_calls(self) -> GitHubCalls:
+        with self.__lock:
+            return GitHubCalls(
+                by_endpoint=dict(self.__github.by_endpoint),
+                by_repository=dict(self.__github.by_repository),
+                by_notification=dict(self.__github.by_notification),
+                rate_limits=dict(self.__rate_limits),
+            )
+
+    def add_github_calls(self, calls: GitHubCalls) -> None:
+        with self.__lock:
+            for breakdown, added in (
+                (self.__github.by_endpoint, calls.by_endpoint),
+                (self.__github.by_repository, calls.by_repository),
+                (self.__github.by_notification, calls.by_notification),
+            ):
+                for key, counts in added.items():
+                    breakdown[key] = breakdown.get(key, CallCounts()) + counts
+            for resource, usage in calls.rate_limits.items():
+                previous = self.__rate_limits.get(resource)
+                if previous is None:
+                    self.__rate_limits[resource] = usage
+                    continue
+                # both watched the same token, the latest observation (a later window, or less remaining in it) wins
+                latest = max(previous, usage, key=lambda observed: (observed.reset_at, -observed.remaining))
+                self.__rate_limits[resource] = replace(latest, used=previous.used + usage.used)
+
+    def __record_rate_limit(self, response: Response) -> None:
+        resource = response.headers.get("X-RateLimit-Resource", "core")
+        limit = int(response.headers.get("X-RateLimit-Limit", 0))
+        remaining = int(response.headers["X-RateLimit-Remaining"])
+        reset_at = int(response.headers.get("X-RateLimit-Reset", 0))
+        previous = self.__rate_limits.get(resource)
+        used = 0 if previous is None else previous.used
+        if previous is not None and previous.reset_at == reset_at:
+            used += max(0, previous.remaining - remaining)
+        elif previous is not None:
+            # a new rate limit window, everything it used so far happened since
+            used += max(0, limit - remaining)
+        self.__rate_limits[resource] = RateLimitUsage(limit=limit, remaining=remaining, reset_at=reset_at, used=used)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self.__lock:
+            return {
+                "started_at": self.started_at.isoformat(),
+                "written_at": datetime.now(timezone.utc).isoformat(),
+                "github": {
+                    "total": asdict(sum(self.__github.by_endpoint.values(), CallCounts())),
+                    "by_endpoint": {key: asdict(value) for key, value in sorted(self.__github.by_endpoint.items())},
+                    "by_repository": {key: asdict(value) for key, value in sorted(self.__github.by_repository.items())},
+                    "by_notification": {key: asdict(value) for key, value in sorted(self.__github.by_notification.items())},
+                    "rate_limits": {key: asdict(value) for key, value in sorted(self.__rate_limits.items())},
+                },
+                "slack": {
+                    "total": asdict(sum(self.__slack.by_endpoint.values(), CallCounts())),
+                    "by_method": {key: asdict(value) for key, value in sorted(self.__slack.by_endpoint.items())},
+                    "by_channel": {key: asdict(value) for key, value in sorted(self.__slack_by_channel.items())},
+                    "by_notification": {key: asdict(value) for key, value in sorted(self.__slack.by_notification.items())},
+                },
+                "caches": dict(sorted(self.__caches.items())),
+            }
+
+    def write_json(self, path: Path) -> None:
+        _write_atomically(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path: Path) -> None:
+        report = self.to_dict()
+        lines: list[str] = []
+
+        def counters(name: str, help_text: str, label: str, breakdown: dict[str, dict[str, int]], field_name: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f'{name}{{{label}="{_escape(key)}"}} {counts[field_name]}' for key, counts in breakdown.items())
+
+        github = report["github"]
+        for label, breakdown_name in (("endpoint", "by_endpoint"), ("repository", "by_repository"), ("notification", "by_notification")):
+            breakdown = github[breakdown_name]
+            counters(f"notifier_github_requests_by_{label}_total", f"GitHub API requests per {label}", label, breakdown, "calls")
+            counters(f"notifier_github_retries_by_{label}_total", f"Retried GitHub API requests per {label}", label, breakdown, "retries")
+            counters(
+                f"notifier_github_received_bytes_by_{label}_total",
+                f"Bytes received from the GitHub API per {label}",
+                label,
+                breakdown,
+                "bytes_received",
+            )
+        counters(
+            "notifier_github_not_modified_total",
+            "GitHub responses served from the HTTP cache after revalidation",
+            "endpoint",
+            github["by_endpoint"],
+            "not_modified",
+        )
+        counters("notifier_github_errors_total", "GitHub API requests that failed", "endpoint", github["by_endpoint"], "errors")
+        for metric, field_name in (("remaining", "remaining"), ("used", "used")):
+            lines.append(f"# HELP notifier_github_rate_limit_{metric} GitHub rate limit {metric} per resource")
+            lines.append(f"# TYPE notifier_github_rate_limit_{metric} gauge")
+            lines.extend(
+                f'notifier_github_rate_limit_{metric}{{resource="{_escape(key)}"}} {usage[field_name]}'
+                for key, usage in github["rate_limits"].items()
+            )
+
+        slack = report["slack"]
+        for label, breakdown_name in (("method", "by_method"), ("channel", "by_channel"), ("notification", "by_notification")):
+            counters(f"notifier_slack_calls_by_{label}_total", f"Slack API calls per {label}", label, slack[breakdown_name], "calls")
+        counters("notifier_slack_retries_total", "Slack API calls retried after a rate limit", "channel", slack["by_channel"], "retries")
+        counters("notifier_slack_errors_total", "Slack API calls that failed", "channel", slack["by_channel"], "errors")
+
+        for metric in ("hits", "misses"):
+            lines.append(f"# HELP notifier_cache_{metric}_total Cache {metric}")
+            lines.append(f"# TYPE notifier_cache_{metric}_total counter")
+            lines.extend(f'notifier_cache_{metric}_total{{cache="{_escape(name)}"}} {counts[metric]}' for name, counts in report["caches"].items())
+        _write_atomically(path, "\n".join(lines) + "\n")
+
+    def log_summary(self, top: int = 5) -> None:
+        with self.__lock:
+            by_repository = sorted(self.__github.by_repository.items(), key=lambda item: item[1].calls, reverse=True)
+            by_notification = sorted(self.__github.by_notification.items(), key=lambda item: item[1].calls, reverse=True)
+        for name, breakdown in (("repositories", by_repository), ("notifications", by_notification)):
+            if breakdown:
+                LOG.info("GitHub requests of the top %s: %s", name, ", ".join(f"{key}: {counts.calls}" for key, counts in breakdown[:top]))
+
+
+def _escape(label_value: str) -> str:
+    return label_value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomically(path: Path, content: str) -> None:
+    # a scraper must never read a half-written file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    temporary_path.write_text(content)
+    os.replace(temporary_path, path)
+
+
+class ApiCallAccounting(TransportMiddleware):
+    """Records every request that goes to the network in the RunReport, it is meant to be the last middleware of the chain"""
+
+    def __init__(self, report: RunReport):
+        self.report = report
+        # the scheduler retries a rate limited request by sending the same request object again from the same thread
+        self.__last_request = threading.local()
+
+    def handle(self, request: PreparedRequest, send: SendFunction) -> Response:
+        retry = getattr(self.__last_request, "request", None) is request
+        self.__last_request.request = request
+        response = send(request)
+        self.report.record_github_call(request, response, retry)
+        return response
@@ -0,0 +1,261 @@
+import logging
+import multiprocessing
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from notifier.execution_plan import notification_name, productivity_scans
+from notifier.properties import Notification, PullRequestNotification
+from notifier.repository import (
+    ProductivityWindows,
+    PullRequestFilter,
+    RepositoryInfo,
+    RepositoryProductivityFacts,
+    TeamProductivityMetrics,
+)
+from notifier.run_report import GitHubCalls, RunReport, reported_notification
+
+if TYPE_CHECKING:
+    from notifier.http_cache import HttpResponseCache
+
+"""
+Fetching in several processes for configurations too big for one (thousands of repositories, where building the PyGithub objects
+and decoding the JSON keeps a single process busy). The repositories are split into shards by a stable hash of their name,
+each shard is fetched by its own process with its own connection pool, and the results are merged back in the main process,
+which formats and sends the messages as usual.
+"""
+
+LOG = logging.getLogger(__name__)
+
+RepositoryKey = tuple[str, tuple[str, ...]]  # (repository name, filters)
+
+
+def shard_of(repository_name: str, shard_count: int) -> int:
+    """Stable across runs and processes (unlike `hash`), so a repository stays in its shard and the shard's cache file"""
+    return zlib.crc32(repository_name.lower().encode()) % shard_count
+
+
+class ShardFetchError(RuntimeError):
+    """A fetch that failed in a worker process, carried over as text, as not every exception survives pickling"""
+
+
+@dataclass(frozen=True, slots=True)
+class WorkerConfig:
+    github_url: str
+    token: str
+    fetch_backend: str = "rest"
+    cache_dir: Path | None = None
+    http_cache_max_size_mb: int = 100
+    pull_request_cache_max_entries: int = 5000
+    pull_request_cache_ttl_hours: int = 168
+
+
+@dataclass(frozen=True, slots=True)
+class RepositoryFetch:
+    repository_name: str
+    pull_request_filters: list[PullRequestFilter]
+    notification_name: str  # the first notification needing it, the GitHub calls are accounted to it
+
+
+@dataclass(frozen=True, slots=True)
+class ProductivityFetch:
+    repository_name: str
+    authors: list[str]  # of all the teams watching the repository
+    since_date: datetime  # of the longest window of these teams
+    notification_name: str
+
+
+@dataclass(frozen=True, slots=True)
+class ShardResult:
+    repositories: dict[RepositoryKey, RepositoryInfo | ShardFetchError]
+    productivity_facts: dict[str, RepositoryProductivityFacts | ShardFetchError]
+    github_calls: GitHubCalls
+
+
+def _filters_key(pull_request_filters: list[PullRequestFilter]) -> tuple[str, ...]:
+    # not every filter is hashable (the author filter holds a list), their representation tells them apart
+    return tuple(repr(pull_request_filter) for pull_request_filter in pull_request_filters)
+
+
+class ShardedFetcher:
+    """
+    Fetches everything the notifications need up front, in `shard_count` processes, and then serves it in place of PullRequestFetcher.
+    A fetch that failed in a worker, or a worker that died, fails the notifications needing it, the others are sent.
+    """
+
+    def __init__(self, config: WorkerConfig, shard_count: int):
+        self.config = config
+        self.shard_count = shard_count
+        self.__repositories: dict[RepositoryKey, RepositoryInfo | ShardFetchError] = {}
+        # per repository, one scan for all the teams watching it
+        self.__productivity_facts: dict[str, RepositoryProductivityFacts | ShardFetchError] = {}
+        self.__fetched_at = datetime.now(timezone.utc)
+
+    def fetch(self, notifications: list[Notification], run_report: RunReport | None = None) -> None:
+        self.__repositories.clear()
+        self.__productivity_facts.clear()
+        self.__fetched_at = now = datetime.now(timezone.utc)
+        repository_fetches: dict[RepositoryKey, RepositoryFetch] = {}
+        productivity_notification_names: dict[str, str] = {}
+        for notification in notifications:
+            name = notification_name(notification)
+            for repository_name in notification.config["repositories"]:
+                if isinstance(notification, PullRequestNotification):
+                    key = (repository_name, _filters_key(notification.config["filters"]))
+                    repository_fetches.setdefault(key, RepositoryFetch(repository_name, notification.config["filters"], name))
+                else:
+                    productivity_notification_names.setdefault(repository_name, name)
+        productivity_fetches = [
+            ProductivityFetch(
+                repository_name, sorted(scan.authors), now - timedelta(days=scan.scanned_days), productivity_notification_names[repository_name]
+            )
+            for repository_name, scan in productivity_scans(notifications).items()
+        ]
+
+        shards: dict[int, tuple[list[RepositoryFetch], list[ProductivityFetch]]] = {}
+        for repository_fetch in repository_fetches.values():
+            shards.setdefault(shard_of(repository_fetch.repository_name, self.shard_count), ([], []))[0].append(repository_fetch)
+        for productivity_fetch in productivity_fetches:
+            shards.setdefault(shard_of(productivity_fetch.repository_name, self.shard_count), ([], []))[1].append(productivity_fetch)
+        if not shards:
+            return
+
+        LOG.info(
+            "Fetching %d repositories in %d shards", len({key[0] for key in repository_fetches} | productivity_notification_names.keys()), len(shards)
+        )
+        # spawned, the main process already runs threads (Slack dispatcher, worker pool) which forking would not carry over consistently
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures: dict[int, Future[ShardResult]] = {
+                index: pool.submit(_fetch_shard, self.config, index, self.shard_count, shard_repositories, shard_productivity)
+                for index, (shard_repositories, shard_productivity) in sorted(shards.items())
+            }
+            for index, future in futures.items():
+                try:
+                    result = future.result()
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    # e.g. the worker died, everything of the shard fails, and with it only the notifications needing it
+                    LOG.error("Shard %d failed: %s", index, e)
+                    error = ShardFetchError(f"Shard {index} failed: {e}")
+                    shard_repositories, shard_productivity = shards[index]
+                    self.__repositories.update(
+                        ((fetch.repository_name, _filters_key(fetch.pull_request_filters)), error) for fetch in shard_repositories
+                    )
+                    self.__productivity_facts.update((fetch.repository_name, error) for fetch in shard_productivity)
+                    continue
+                self.__repositories.update(result.repositories)
+                self.__productivity_facts.update(result.productivity_facts)
+                if run_report is not None:
+                    run_report.add_github_calls(result.github_calls)
+
+    def get_repository_info(self, repository_name: str, pull_request_filters: list[PullRequestFilter]) -> RepositoryInfo:
+        result = self.__repositories.get((repository_name, _filters_key(pull_request_filters)))
+        if result is None:
+            raise ValueError(f"Repository {repository_name} was not fetched, was it in the notifications passed to `fetch`?")
+        if isinstance(result, ShardFetchError):
+            raise result
+        return result
+
+    def get_team_productivity_metrics(
+        self,
+        repository_names: list[str],
+        team_members: list[str],
+        time_window_days: int,
+        other_windows_days: list[int] | None = None,
+        compare_to_previous_period: bool = False,
+    ) -> TeamProductivityMetrics:
+        windows = ProductivityWindows(time_window_days, tuple(other_windows_days or ()), compare_to_previous_period)
+        repository_facts = []
+        for repository_name in repository_names:
+            facts = self.__productivity_facts.get(repository_name)
+            if facts is None:
+                raise ValueError(f"The productivity of {repository_name} was not fetched, was it in the notifications passed to `fetch`?")
+            if isinstance(facts, ShardFetchError):
+                raise facts
+            repository_facts.append(facts)
+        return windows.summarize(repository_facts, team_members, self.__fetched_at)
+
+
+def shard_http_cache(cache_dir: Path, max_size_mb: int, shard_index: int, shard_count: int) -> "HttpResponseCache":
+    """
+    The HTTP cache of a shard process: its own directory and its part of the size budget, as a cache evicts any file of its directory
+    (a shard always gets the same repositories, so it asks for the same resources run after run)
+    """
+    from notifier.http_cache import HttpResponseCache
+
+    return HttpResponseCache(cache_dir / "http" / f"shard-{shard_index}-of-{shard_count}", max_size_mb * 1024 * 1024 // shard_count)
+
+
+def _fetch_shard(
+    config: WorkerConfig,
+    shard_index: int,
+    shard_count: int,
+    repository_fetches: list[RepositoryFetch],
+    productivity_fetches: list[ProductivityFetch],
+) -> ShardResult:
+    """Runs in a worker process"""
+    from notifier.copilot_requester_cache import CopilotRequesterCache
+    from notifier.productivity_store import ProductivityStore
+    from notifier.pull_request_cache import PullRequestInfoCache
+    from notifier.pull_request_fetcher import PullRequestFetcher
+
+    http_cache = None
+    pull_request_cache = None
+    copilot_requester_cache = None
+    productivity_store = None
+    if config.cache_dir is not None:
+        http_cache = shard_http_cache(config.cache_dir, config.http_cache_max_size_mb, shard_index, shard_count)
+        # a shard always gets the same repositories, so it owns a cache file, the file is rewritten as a whole on save
+        pull_request_cache = PullRequestInfoCache(
+            config.cache_dir / f"pull_requests.shard-{shard_index}-of-{shard_count}.json",
+            config.pull_request_cache_max_entries,
+            timedelta(hours=config.pull_request_cache_ttl_hours),
+        )
+        copilot_requester_cache = CopilotRequesterCache(
+            config.cache_dir / f"copilot_requesters.shard-{shard_index}-of-{shard_count}.json", config.pull_request_cache_max_entries
+        )
+        # SQLite locks the database for the writes of the processes
+        productivity_store = ProductivityStore(config.cache_dir / "productivity.sqlite3")
+
+    run_report = RunReport()
+    fetcher = PullRequestFetcher(
+        config.github_url,
+        config.token,
+        fetch_backend=config.fetch_backend,
+        http_cache=http_cache,
+        pull_request_cache=pull_request_cache,
+        copilot_requester_cache=copilot_requester_cache,
+        productivity_store=productivity_store,
+        run_report=run_report,
+    )
+    repositories: dict[RepositoryKey, RepositoryInfo | ShardFetchError] = {}
+    productivity_facts: dict[str, RepositoryProductivityFacts | ShardFetchError] = {}
+    try:
+        for repository_fetch in repository_fetches:
+            key = (repository_fetch.repository_name, _filters_key(repository_fetch.pull_request_filters))
+            try:
+                with reported_notification(repository_fetch.notification_name):
+                    repositories[key] = fetcher.get_repository_info(repository_fetch.repository_name, repository_fetch.pull_request_filters)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                repositories[key] = ShardFetchError(f"{type(e).__name__}: {e}")
+        for productivity_fetch in productivity_fetches:
+            repository_name = productivity_fetch.repository_name
+            try:
+                with reported_notification(productivity_fetch.notification_name):
+                    productivity_facts[repository_name] = fetcher.get_repository_productivity_facts(
+                        repository_name, productivity_fetch.authors, productivity_fetch.since_date
+                    )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                productivity_facts[repository_name] = ShardFetchError(f"{type(e).__name__}: {e}")
+    finally:
+        fetcher.close()
+        if pull_request_cache is not None:
+            pull_request_cache.save()
+        if copilot_requester_cache is not None:
+            copilot_requester_cache.save()
+        if productivity_store is not None:
+            productivity_store.close()
+
+    return ShardResult(repositories=repositories, productivity_facts=productivity_facts, github_calls=run_report.github_calls())
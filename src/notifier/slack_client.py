@@ -1,29 +1,250 @@
+import contextvars
 import logging
-from typing import Any, TypeAlias
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from functools import partial
+from typing import Any, Callable, Protocol, TypeAlias, TypeVar
 
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from slack_sdk.web import SlackResponse
+
+from notifier.run_report import RunReport, current_notification
+from notifier.tracing import span
 
 LOG = logging.getLogger(__name__)
 
 SlackBlock: TypeAlias = dict[str, Any]
 SlackBlockKitMessage: TypeAlias = list[SlackBlock]
 
+T = TypeVar("T")
+
+# how long to wait after a 429 that came without Retry-After
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+MAX_RETRIES = 5
+
+
+class SlackRateLimitedError(ValueError):
+    def __init__(self, message: str, retry_after_seconds: float):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class MessageSender(Protocol):
+    def send_message_from_blocks(self, channel_name: str, message: SlackBlockKitMessage) -> None: ...
+
+
+class SlackMessageNotFoundError(ValueError):
+    pass
+
 
 class SlackClient:
-    def __init__(self, oauth_token: str):
-        self.client = WebClient(token=oauth_token)
+    def __init__(self, oauth_token: str, base_url: str = WebClient.BASE_URL):
+        self.client = WebClient(token=oauth_token, base_url=base_url)
 
     def send_message_from_blocks(self, channel_name: str, message: SlackBlockKitMessage) -> None:
-        try:
-            response = self.client.chat_postMessage(
+        self.post_message(channel_name, message)
+
+    def post_message(self, channel_name: str, message: SlackBlockKitMessage) -> tuple[str, str]:
+        """Posts the message, returns the channel ID and the `ts` identifying the message, which `update_message` and `delete_message` need"""
+        response = self.__call(
+            "chat.postMessage",
+            channel_name,
+            partial(
+                self.client.chat_postMessage,
                 channel=channel_name,
                 blocks=message,
                 text="Failed to render content",  # this is a fallback message in case the blocks are not rendered
                 unfurl_links=False,
                 unfurl_media=False,
-            )
-            LOG.debug("Slack responded with Result: %s", response)
+            ),
+        )
+        LOG.debug("Slack responded with Result: %s", response)
+        return response["channel"], response["ts"]
+
+    def update_message(self, channel_id: str, ts: str, message: SlackBlockKitMessage) -> None:
+        self.__call(
+            "chat.update", channel_id, partial(self.client.chat_update, channel=channel_id, ts=ts, blocks=message, text="Failed to render content")
+        )
+
+    def delete_message(self, channel_id: str, ts: str) -> None:
+        try:
+            self.__call("chat.delete", channel_id, partial(self.client.chat_delete, channel=channel_id, ts=ts))
+        except SlackMessageNotFoundError:
+            LOG.debug("Message %s in %s was already deleted", ts, channel_id)
 
+    @staticmethod
+    def __call(method: str, channel: str, api_call: Callable[[], SlackResponse]) -> SlackResponse:
+        try:
+            with span(f"slack {method}", channel=channel):
+                return api_call()
         except SlackApiError as e:
+            if e.response.status_code == 429:
+                retry_after = float(e.response.headers.get("Retry-After", DEFAULT_RETRY_AFTER_SECONDS))
+                raise SlackRateLimitedError(f"Slack rate limit hit: {e}", retry_after) from e
+            if e.response.get("error") == "message_not_found":
+                raise SlackMessageNotFoundError(f"Slack message not found: {e}") from e
             raise ValueError(f"Failed to send message to Slack: {e}") from e
+
+
+@dataclass(frozen=True, slots=True)
+class MethodLimit:
+    interval_seconds: float
+    per_channel: bool
+
+
+# Slack's rate limit tiers: chat.postMessage allows about one message per second in a channel,
+# the Tier 3 methods about 50 calls per minute in the whole workspace
+METHOD_LIMITS = {
+    "chat.postMessage": MethodLimit(interval_seconds=1.0, per_channel=True),
+    "chat.update": MethodLimit(interval_seconds=60 / 50, per_channel=False),
+    "chat.delete": MethodLimit(interval_seconds=60 / 50, per_channel=False),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class ChannelStats:
+    calls: int = 0
+    latency_seconds: float = 0.0  # from queueing a call until it is done, summed over all calls
+    max_latency_seconds: float = 0.0
+    throttled_seconds: float = 0.0  # waiting for Retry-After of 429 responses
+    retries: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class _Job:
+    method: str
+    call: Callable[[], Any]
+    future: Future[Any]
+    queued_at: float
+    context: contextvars.Context
+
+
+class SlackDispatcher:
+    """
+    Sends the Slack calls through one ordered queue per channel, each with its own worker thread.
+    Channels are served in parallel, a channel's messages keep their order. The calls are spaced out by Slack's per-method limits
+    and calls rejected with 429 are retried after the Retry-After Slack asked for, instead of failing the notification.
+    """
+
+    def __init__(
+        self,
+        client: SlackClient,
+        method_limits: dict[str, MethodLimit] | None = None,
+        max_retries: int = MAX_RETRIES,
+        run_report: RunReport | None = None,
+    ):
+        self.client = client
+        self.__run_report = run_report
+        self.__method_limits = METHOD_LIMITS if method_limits is None else method_limits
+        self.__max_retries = max_retries
+        self.__queues: dict[str, queue.Queue[_Job | None]] = {}
+        self.__workers: list[threading.Thread] = []
+        self.__next_call_at: dict[tuple[str, str], float] = {}
+        self.__stats: dict[str, ChannelStats] = {}
+        self.__failures: list[tuple[str, Exception]] = []
+        self.__lock = threading.Lock()
+
+    def send_message_from_blocks(self, channel_name: str, message: SlackBlockKitMessage) -> None:
+        """Queues the message and returns right away, failures are reported by `close`"""
+        self.submit(channel_name, "chat.postMessage", partial(self.client.send_message_from_blocks, channel_name, message))
+
+    def submit(self, channel_name: str, method: str, call: Callable[[], T]) -> Future[T]:
+        """Queues a call of the Slack API `method` behind everything queued for the channel so far"""
+        future: Future[T] = Future()
+        with self.__lock:
+            if (channel_queue := self.__queues.get(channel_name)) is None:
+                channel_queue = self.__queues[channel_name] = queue.Queue()
+                worker = threading.Thread(target=self.__serve, args=(channel_name, channel_queue), name=f"slack-{channel_name}", daemon=True)
+                self.__workers.append(worker)
+                worker.start()
+        # the call runs in the caller's context, so that it is accounted to the caller's notification and its span nests under the caller's
+        channel_queue.put(_Job(method, call, future, time.monotonic(), contextvars.copy_context()))
+        return future
+
+    def close(self) -> list[tuple[str, Exception]]:
+        """
+        Waits until everything queued was sent and stops the workers, returns the (channel, error) of every call that failed since the last close.
+        Calls queued afterwards start new workers.
+        """
+        with self.__lock:
+            channel_queues, self.__queues = self.__queues, {}
+            workers, self.__workers = self.__workers, []
+        for channel_queue in channel_queues.values():
+            channel_queue.put(None)
+        for worker in workers:
+            worker.join()
+        with self.__lock:
+            failures, self.__failures = self.__failures, []
+        return failures
+
+    def stats(self) -> dict[str, ChannelStats]:
+        with self.__lock:
+            return dict(self.__stats)
+
+    def __serve(self, channel_name: str, channel_queue: "queue.Queue[_Job | None]") -> None:
+        while (job := channel_queue.get()) is not None:
+            # only this worker retries the channel's calls, so the growth of its retries belongs to this job
+            retries_before = self.__stats.get(channel_name, ChannelStats()).retries
+            failed = False
+            try:
+                job.future.set_result(self.__call(channel_name, job))
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # the worker must survive a failed call, the remaining messages of the channel are still sent
+                LOG.error("Slack call %s to channel '%s' failed: %s", job.method, channel_name, e)
+                with self.__lock:
+                    self.__failures.append((channel_name, e))
+                job.future.set_exception(e)
+                failed = True
+            # Slack API methods are namespaced (chat.update), other jobs such as storing the posted messages are not calls of the API
+            if "." not in job.method:
+                continue
+            self.__record_call(channel_name, time.monotonic() - job.queued_at)
+            if self.__run_report is not None:
+                retries = self.__stats[channel_name].retries - retries_before
+                self.__run_report.record_slack_call(channel_name, job.method, job.context.run(current_notification), retries, failed)
+
+    def __call(self, channel_name: str, job: _Job) -> Any:
+        attempt = 0
+        while True:
+            self.__wait_for_turn(channel_name, job.method)
+            try:
+                return job.context.run(job.call)
+            except SlackRateLimitedError as e:
+                if attempt >= self.__max_retries:
+                    raise
+                attempt += 1
+                LOG.warning("Slack rate limit hit for %s in channel '%s', retrying in %.1f seconds", job.method, channel_name, e.retry_after_seconds)
+                self.__delay(channel_name, job.method, e.retry_after_seconds)
+
+    def __limit_key(self, channel_name: str, method: str) -> tuple[tuple[str, str], MethodLimit]:
+        limit = self.__method_limits.get(method, MethodLimit(interval_seconds=0.0, per_channel=True))
+        return (method, channel_name if limit.per_channel else ""), limit
+
+    def __wait_for_turn(self, channel_name: str, method: str) -> None:
+        key, limit = self.__limit_key(channel_name, method)
+        with self.__lock:
+            now = time.monotonic()
+            call_at = max(now, self.__next_call_at.get(key, now))
+            self.__next_call_at[key] = call_at + limit.interval_seconds
+        time.sleep(call_at - now)
+
+    def __delay(self, channel_name: str, method: str, seconds: float) -> None:
+        key, _ = self.__limit_key(channel_name, method)
+        with self.__lock:
+            self.__next_call_at[key] = max(self.__next_call_at.get(key, 0.0), time.monotonic() + seconds)
+            stats = self.__stats.get(channel_name, ChannelStats())
+            self.__stats[channel_name] = replace(stats, throttled_seconds=stats.throttled_seconds + seconds, retries=stats.retries + 1)
+
+    def __record_call(self, channel_name: str, latency_seconds: float) -> None:
+        with self.__lock:
+            stats = self.__stats.get(channel_name, ChannelStats())
+            self.__stats[channel_name] = replace(
+                stats,
+                calls=stats.calls + 1,
+                latency_seconds=stats.latency_seconds + latency_seconds,
+                max_latency_seconds=max(stats.max_latency_seconds, latency_seconds),
+            )
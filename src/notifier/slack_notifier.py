@@ -1,7 +1,8 @@
 from typing import Callable
 
+from notifier.message_updater import MessageUpdater
 from notifier.repository import RepositoryInfo
-from notifier.slack_client import SlackClient
+from notifier.slack_client import MessageSender
 from notifier.summary_formatter import SummaryMessageFormatter
 
 """
@@ -10,15 +11,26 @@ Sending messages to Slack channels using Slack API and the Block Kit formatting.
 
 
 class SlackBlockNotifier:
-    def __init__(self, slack_client: SlackClient, notification_formatter: SummaryMessageFormatter):
+    def __init__(self, slack_client: MessageSender, notification_formatter: SummaryMessageFormatter, message_updater: MessageUpdater | None = None):
         self.client = slack_client
         self.notification_formatter = notification_formatter
+        # when set, the messages posted by the previous run are edited instead of posting new ones
+        self.message_updater = message_updater
 
-    def send_report_for_repos(self, channel_name: str, repository_names: list[str], get_repository_info: Callable[[str], RepositoryInfo]) -> None:
-        repositories = [get_repository_info(repo_name) for repo_name in repository_names]
-        if len(repositories) == 0:
+    def send_report_for_repos(
+        self, channel_name: str, repository_names: list[str], get_repository_info: Callable[[str], RepositoryInfo], notification_key: str = ""
+    ) -> None:
+        """
+        The messages of each repository are queued as soon as it is fetched, the dispatcher posts them while the next one is being fetched.
+        `notification_key` tells apart the messages of notifications posting the same repository to the channel, for the message updater.
+        """
+        for repo_name in repository_names:
+            self.send_report_for_repo(channel_name, get_repository_info(repo_name), notification_key=notification_key)
+
+    def send_report_for_repo(self, channel_name: str, repo: RepositoryInfo, notification_key: str = "") -> None:
+        if self.message_updater is not None:
+            messages = self.notification_formatter.get_keyed_messages_for_repo(repo)
+            self.message_updater.sync_messages(channel_name, notification_key, repo.name, messages)
             return
-        for repo in repositories:
-            messages = self.notification_formatter.get_messages_for_repo(repo)
-            for message in messages:
-                self.client.send_message_from_blocks(channel_name, message)
+        for message in self.notification_formatter.get_messages_for_repo(repo):
+            self.client.send_message_from_blocks(channel_name, message)
@@ -1,12 +1,36 @@
+import json
+from dataclasses import dataclass
+
 from notifier.repository import PullRequestInfo, RepositoryInfo
 from notifier.slack_client import SlackBlock, SlackBlockKitMessage
+from notifier.tracing import span
 
 """
 Formats the summary message for Slack using Slack's Block Kit format (instead of Markdown which is simpler but less capable)
 """
 
+# Slack rejects messages with more blocks than this
+MAX_BLOCKS_PER_MESSAGE = 50
+# size budget of the serialized blocks of one packed message, well below the size where Slack starts truncating or rejecting messages
+MAX_MESSAGE_LENGTH = 30_000
+# key of the message carrying the repository header, the other messages are keyed by the URL of their (first) pull request
+HEADER_MESSAGE_KEY = "header"
+
+
+@dataclass(frozen=True, slots=True)
+class KeyedMessage:
+    """A message with a key telling what it shows, so that the message posted for it by a previous run can be found again"""
+
+    key: str
+    blocks: SlackBlockKitMessage
+    # what the message shows without the ages, which change with every run: a message is only edited when this changes
+    state: str
+
 
 class SummaryMessageFormatter:
+    def __init__(self, pack_messages: bool = False):
+        # one message per pull request by default, packing puts as many pull requests into a message as Slack allows
+        self.pack_messages = pack_messages
 
     def __format_author(self, pull: PullRequestInfo) -> str:
         if pull.copilot_requester:
@@ -29,16 +53,53 @@ class SummaryMessageFormatter:
         return ""
 
     def get_messages_for_repo(self, repo: RepositoryInfo) -> list[SlackBlockKitMessage]:
-        results = []
-        for index, pull in enumerate(repo.pulls):
-            formatted_pull = []
-            # Append the reposity name header to the first pull request to avoid sending the repo header as a separate message (it looks ugly)
-            if index == 0:
-                formatted_pull.append(self.__format_repository_name_header(repo))
-            formatted_pull.append(self.__format_pull_request(pull))
-            results.append(formatted_pull)
-
-        return results
+        return [message.blocks for message in self.get_keyed_messages_for_repo(repo)]
+
+    def get_keyed_messages_for_repo(self, repo: RepositoryInfo) -> list[KeyedMessage]:
+        if not repo.pulls:
+            return []
+
+        with span("format_repository", repository=repo.name, pull_requests=len(repo.pulls)):
+            # The repository name header goes with the first pull request to avoid sending it as a separate message (it looks ugly)
+            blocks = [self.__format_repository_name_header(repo), *(self.__format_pull_request(pull) for pull in repo.pulls)]
+            messages = self.__pack(blocks) if self.pack_messages else [blocks[:2], *([block] for block in blocks[2:])]
+
+        states = [repo.name, *(self.__pull_request_state(pull) for pull in repo.pulls)]
+        keyed_messages = []
+        first_block = 0  # blocks[0] is the header, blocks[i] the block of repo.pulls[i - 1]
+        for message in messages:
+            key = HEADER_MESSAGE_KEY if first_block == 0 else repo.pulls[first_block - 1].url
+            keyed_messages.append(KeyedMessage(key, message, json.dumps(states[first_block : first_block + len(message)])))
+            first_block += len(message)
+        return keyed_messages
+
+    def __pull_request_state(self, pull: PullRequestInfo) -> list[object]:
+        # the urgency emoji changes only every few days, the age text with every run
+        urgency = self.__get_age_urgency(self.__displayed_age(pull)[0])
+        return [pull.name, pull.url, pull.review_status, pull.additions, pull.deletions, pull.changed_files, self.__format_author(pull), urgency]
+
+    @staticmethod
+    def __displayed_age(pull: PullRequestInfo) -> tuple[int, int]:
+        days_ago, hours_ago = pull.age
+        if days_ago > 0 and hours_ago >= 12:
+            days_ago += 1  # this mimics the behavior of GitHub UI
+        return days_ago, hours_ago
+
+    @staticmethod
+    def __pack(blocks: list[SlackBlock]) -> list[SlackBlockKitMessage]:
+        """Splits the blocks into as few messages as the block count and size limits allow, keeping their order"""
+        messages: list[SlackBlockKitMessage] = []
+        message: SlackBlockKitMessage = []
+        message_length = 0
+        for block in blocks:
+            block_length = len(json.dumps(block)) + 2  # with the separator in the list of blocks
+            if message and (len(message) == MAX_BLOCKS_PER_MESSAGE or message_length + block_length > MAX_MESSAGE_LENGTH):
+                messages.append(message)
+                message, message_length = [], 0
+            message.append(block)
+            message_length += block_length
+        messages.append(message)
+        return messages
 
     def __format_repository_name_header(self, repo: RepositoryInfo) -> SlackBlock:
         return {"type": "header", "text": {"type": "plain_text", "text": f"{repo.name}"}}
@@ -46,10 +107,7 @@ class SummaryMessageFormatter:
     def __format_pull_request(self, pull: PullRequestInfo) -> SlackBlock:
 
         def __format_pull(pull: PullRequestInfo) -> SlackBlock:
-            (days_ago, hours_ago) = pull.age
-            if days_ago > 0 and hours_ago >= 12:
-                days_ago += 1  # this mimics the behavior of GitHub UI
-
+            days_ago, hours_ago = self.__displayed_age(pull)
             age = f"{days_ago} days" if days_ago > 0 else f"{hours_ago} hours"
             age_urgency = self.__get_age_urgency(days_ago)
 
@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+"""
+Lightweight tracing of a run: nested spans around the fetching, filtering, formatting and sending, each with its duration,
+thread and attributes (repository, pull request, channel). Finished spans go to a pluggable SpanExporter, the built-in one
+appends them to a file in the OTLP JSON format. When tracing is not configured, `span` returns a shared no-op context manager.
+"""
+
+AttributeValue = str | int | float | bool
+
+SERVICE_NAME = "github-slack-pr-notifier"
+EXPORT_BATCH_SIZE = 512
+
+
+@dataclass(frozen=True, slots=True)
+class FinishedSpan:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None
+    start_time_ns: int
+    end_time_ns: int
+    attributes: dict[str, AttributeValue]
+    error: str | None = None
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end_time_ns - self.start_time_ns) / 1e9
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: list[FinishedSpan]) -> None:
+        """Called from whichever thread finished the batch, one call at a time"""
+
+    def close(self) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.spans: list[FinishedSpan] = []
+
+    def export(self, spans: list[FinishedSpan]) -> None:
+        self.spans.extend(spans)
+
+
+class OtlpJsonFileExporter(SpanExporter):
+    """
+    Appends each batch as one line of OTLP JSON (an ExportTraceServiceRequest), the format of the OpenTelemetry collector's file exporter,
+    so that the file can be replayed into any OTLP backend (e.g. with the collector's otlpjsonfile receiver).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: list[FinishedSpan]) -> None:
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                    "scopeSpans": [{"scope": {"name": "notifier"}, "spans": [_otlp_span(span) for span in spans]}],
+                }
+            ]
+        }
+        with open(self.path, "a") as trace_file:
+            trace_file.write(json.dumps(request, separators=(",", ":")) + "\n")
+
+
+def _otlp_span(span: FinishedSpan) -> dict[str, Any]:
+    otlp_span: dict[str, Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        # 64-bit integers are strings in OTLP JSON
+        "startTimeUnixNano": str(span.start_time_ns),
+        "endTimeUnixNano": str(span.end_time_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": 2, "message": span.error} if span.error is not None else {},
+    }
+    if span.parent_span_id is not None:
+        otlp_span["parentSpanId"] = span.parent_span_id
+    return otlp_span
+
+
+def _otlp_attributes(attributes: dict[str, AttributeValue]) -> list[dict[str, Any]]:
+    def value(attribute: AttributeValue) -> dict[str, Any]:
+        if isinstance(attribute, bool):
+            return {"boolValue": attribute}
+        if isinstance(attribute, int):
+            return {"intValue": str(attribute)}
+        if isinstance(attribute, float):
+            return {"doubleValue": attribute}
+        return {"stringValue": attribute}
+
+    return [{"key": key, "value": value(attribute)} for key, attribute in attributes.items()]
+
+
+@dataclass(frozen=True, slots=True)
+class _SpanContext:
+    trace_id: str
+    span_id: str
+
+
+# the innermost open span, the worker pool copies the context of the submitter, so spans of pool tasks nest under it
+_CURRENT_SPAN: ContextVar[_SpanContext | None] = ContextVar("current_span", default=None)
+
+
+class _Span(AbstractContextManager[None]):
+    __slots__ = ("_tracer", "_name", "_attributes", "_context", "_parent", "_token", "_start_time_ns")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict[str, AttributeValue]):
+        self._tracer = tracer
+        self._name = name
+        self._attributes = attributes
+        self._context: _SpanContext
+        self._parent: _SpanContext | None
+        self._token: Token[_SpanContext | None]
+        self._start_time_ns = 0
+
+    def __enter__(self) -> None:
+        self._parent = _CURRENT_SPAN.get()
+        trace_id = self._parent.trace_id if self._parent is not None else os.urandom(16).hex()
+        self._context = _SpanContext(trace_id, os.urandom(8).hex())
+        self._token = _CURRENT_SPAN.set(self._context)
+        self._start_time_ns = time.time_ns()
+
+    def __exit__(self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None) -> None:
+        end_time_ns = time.time_ns()
+        _CURRENT_SPAN.reset(self._token)
+        thread = threading.current_thread()
+        self._attributes["thread.name"] = thread.name
+        self._attributes["thread.id"] = thread.ident or 0
+        self._tracer.finish(
+            FinishedSpan(
+                name=self._name,
+                trace_id=self._context.trace_id,
+                span_id=self._context.span_id,
+                parent_span_id=self._parent.span_id if self._parent is not None else None,
+                start_time_ns=self._start_time_ns,
+                end_time_ns=end_time_ns,
+                attributes=self._attributes,
+                error=f"{exc_type.__name__}: {exc_value}" if exc_type is not None else None,
+            )
+        )
+
+
+class Tracer:
+    def __init__(self, exporter: SpanExporter, batch_size: int = EXPORT_BATCH_SIZE):
+        self.exporter = exporter
+        self.__batch_size = batch_size
+        self.__finished: list[FinishedSpan] = []
+        self.__lock = threading.Lock()
+        self.__export_lock = threading.Lock()
+
+    def span(self, name: str, attributes: dict[str, AttributeValue]) -> AbstractContextManager[None]:
+        return _Span(self, name, attributes)
+
+    def finish(self, span: FinishedSpan) -> None:
+        with self.__lock:
+            self.__finished.append(span)
+            if len(self.__finished) < self.__batch_size:
+                return
+            batch, self.__finished = self.__finished, []
+        self.__export(batch)
+
+    def flush(self) -> None:
+        with self.__lock:
+            batch, self.__finished = self.__finished, []
+        if batch:
+            self.__export(batch)
+
+    def __export(self, batch: list[FinishedSpan]) -> None:
+        with self.__export_lock:
+            self.exporter.export(batch)
+
+
+_NO_SPAN: AbstractContextManager[None] = nullcontext()
+_TRACER: Tracer | None = None
+
+
+def configure_tracing(exporter: SpanExporter | None) -> None:
+    """Sends the spans to `exporter` from now on, None turns tracing off. The spans of the previous exporter are flushed to it first."""
+    global _TRACER  # pylint: disable=global-statement
+    shutdown_tracing()
+    _TRACER = Tracer(exporter) if exporter is not None else None
+
+
+def flush_tracing() -> None:
+    if _TRACER is not None:
+        _TRACER.flush()
+
+
+def shutdown_tracing() -> None:
+    global _TRACER  # pylint: disable=global-statement
+    tracer, _TRACER = _TRACER, None
+    if tracer is not None:
+        tracer.flush()
+        tracer.exporter.close()
+
+
+def span(name: str, **attributes: AttributeValue) -> AbstractContextManager[None]:
+    """
+    Measures the block as a span nested in the current one, e.g. `with span("get_repository_info", repository=name):`.
+    Costs a global lookup when tracing is off, so it can wrap the per pull request work too.
+    """
+    if _TRACER is None:
+        return _NO_SPAN
+    return _TRACER.span(name, attributes)
@@ -0,0 +1,74 @@
+import hashlib
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from notifier.pull_request_index import PullRequestIndex
+
+"""
+HTTP endpoint for GitHub webhooks, feeding the pull request events into the PullRequestIndex.
+Configure the webhook of the repositories (or the organization) with the content type `application/json`, a secret and the
+"Pull requests" and "Pull request reviews" events. Review requests arrive as actions of the `pull_request` event.
+"""
+
+LOG = logging.getLogger(__name__)
+
+HANDLED_EVENTS = frozenset({"pull_request", "pull_request_review"})
+
+
+def _signature(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class WebhookReceiver:
+    """Serves the webhook on a background thread, `port` 0 picks a free port"""
+
+    def __init__(self, index: PullRequestIndex, secret: str, host: str = "0.0.0.0", port: int = 8080):
+        receiver = self
+        self.index = index
+        self.__secret = secret
+
+        class _RequestHandler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                length = int(self.headers.get("Content-Length") or 0)
+                status = receiver.handle(self.headers.get("X-GitHub-Event", ""), self.headers.get("X-Hub-Signature-256", ""), self.rfile.read(length))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+                LOG.debug(format, *args)
+
+        self.__server = ThreadingHTTPServer((host, port), _RequestHandler)
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="webhook-receiver", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return int(self.__server.server_address[1])
+
+    def start(self) -> None:
+        self.__thread.start()
+        LOG.info("Receiving GitHub webhooks on port %d", self.port)
+
+    def close(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def handle(self, event_name: str, signature: str, body: bytes) -> int:
+        """Returns the HTTP status of the response"""
+        if not hmac.compare_digest(_signature(self.__secret, body), signature):
+            LOG.warning("Rejected a webhook delivery with an invalid signature")
+            return 401
+        if event_name not in HANDLED_EVENTS:
+            # e.g. the `ping` GitHub sends when the webhook is created
+            return 204
+        try:
+            payload = json.loads(body)
+            self.index.apply_event(event_name, payload)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            LOG.warning("Ignoring malformed %s event: %s", event_name, e)
+            return 400
+        return 202
@@ -0,0 +1,67 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, ParamSpec, TypeVar
+
+"""
+The thread pool doing the per pull request work (review status, reviews) for every repository and notification.
+One long-lived pool sized to the HTTP connection pool replaces a short-lived pool per repository,
+so threads are not started over and over and the work of different repositories overlaps.
+"""
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+@dataclass(frozen=True, slots=True)
+class TaskTimings:
+    count: int = 0
+    queued_seconds: float = 0.0
+    run_seconds: float = 0.0
+    max_run_seconds: float = 0.0
+
+    def add(self, queued_seconds: float, run_seconds: float) -> "TaskTimings":
+        return TaskTimings(
+            count=self.count + 1,
+            queued_seconds=self.queued_seconds + queued_seconds,
+            run_seconds=self.run_seconds + run_seconds,
+            max_run_seconds=max(self.max_run_seconds, run_seconds),
+        )
+
+
+class WorkerPool:
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="github-worker")
+        self.__timings: dict[str, TaskTimings] = {}
+        self.__lock = threading.Lock()
+
+    def submit(self, task_kind: str, function: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> Future[T]:
+        """
+        Runs the function on the pool, in a copy of the caller's context (e.g. keeping the priority of the caller's GitHub requests).
+        Time spent in the queue and running is recorded under `task_kind`.
+        """
+        context = contextvars.copy_context()
+        submitted_at = time.monotonic()
+
+        def run() -> T:
+            started_at = time.monotonic()
+            try:
+                return context.run(function, *args, **kwargs)
+            finally:
+                self.__record(task_kind, started_at - submitted_at, time.monotonic() - started_at)
+
+        return self.__executor.submit(run)
+
+    def timings(self) -> dict[str, TaskTimings]:
+        with self.__lock:
+            return dict(self.__timings)
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=True, cancel_futures=True)
+
+    def __record(self, task_kind: str, queued_seconds: float, run_seconds: float) -> None:
+        with self.__lock:
+            self.__timings[task_kind] = self.__timings.get(task_kind, TaskTimings()).add(queued_seconds, run_seconds)
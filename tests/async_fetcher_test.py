@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from contextlib import aclosing
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+from notifier.async_fetcher import AsyncPullRequestFetcher
+from notifier.repository import (
+    ApprovalFact,
+    MergedPullRequestFact,
+    RepositoryInfo,
+    RepositoryProductivityFacts,
+)
+
+LATENCY = 0.2
+
+
+class _SlowFetcher:
+    """Fake PullRequestFetcher where every repository takes LATENCY seconds, tracking how many fetches run at once"""
+
+    def __init__(self):
+        self.started = 0
+        self.running = 0
+        self.max_running = 0
+        self.__lock = threading.Lock()
+
+    def __enter_fetch(self):
+        with self.__lock:
+            self.started += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(LATENCY)
+        with self.__lock:
+            self.running -= 1
+
+    def get_repository_info(self, repository_name, pull_request_filters):
+        self.__enter_fetch()
+        return RepositoryInfo(name=repository_name, pulls=[])
+
+    def get_repository_productivity_facts(self, repository_name, team_members, since_date) -> RepositoryProductivityFacts:
+        self.__enter_fetch()
+        now = datetime.now(timezone.utc)
+        return RepositoryProductivityFacts(
+            repository_name=repository_name,
+            merged_pull_requests=[MergedPullRequestFact(repository_name, 1, team_members[0], now, 10, 5)],
+            approvals=[ApprovalFact(repository_name, 1, team_members[0], now)],
+        )
+
+
+def test_repositories_are_fetched_concurrently_in_order() -> None:
+    sync_fetcher = _SlowFetcher()
+    fetcher = AsyncPullRequestFetcher(sync_fetcher, max_concurrency=10)
+
+    start = time.monotonic()
+
+    async def fetch_all():
+        return [repository async for repository in fetcher.stream_repositories_info([f"org/repo{i}" for i in range(10)], [])]
+
+    repositories = asyncio.run(fetch_all())
+    elapsed = time.monotonic() - start
+    fetcher.close()
+
+    assert [repo.name for repo in repositories] == [f"org/repo{i}" for i in range(10)]
+    # roughly the slowest repository instead of the sum of all of them
+    assert elapsed < 5 * LATENCY
+
+
+def test_streamed_repositories_arrive_in_order_as_soon_as_they_are_fetched() -> None:
+    fetcher = AsyncPullRequestFetcher(_SlowFetcher(), max_concurrency=1)
+
+    async def stream():
+        start = time.monotonic()
+        arrivals = []
+        async for repository in fetcher.stream_repositories_info(["org/a", "org/b", "org/c"], []):
+            arrivals.append((repository.name, time.monotonic() - start))
+        return arrivals
+
+    arrivals = asyncio.run(stream())
+    fetcher.close()
+
+    assert [name for name, _ in arrivals] == ["org/a", "org/b", "org/c"]
+    # the first repository is there before the others are fetched
+    assert arrivals[0][1] < 2 * LATENCY
+
+
+def test_only_a_window_of_repositories_is_fetched_ahead_of_the_next_one_to_send() -> None:
+    sync_fetcher = _SlowFetcher()
+    fetcher = AsyncPullRequestFetcher(sync_fetcher, max_concurrency=2)
+
+    async def take_first():
+        repositories = fetcher.stream_repositories_info([f"org/repo{i}" for i in range(20)], [])
+        async with aclosing(repositories):
+            await anext(repositories)
+            # however long the caller takes to send it, only the window and the fetch started for the taken repository run
+            await asyncio.sleep(4 * LATENCY)
+            return sync_fetcher.started
+
+    started = asyncio.run(take_first())
+    fetcher.close()
+
+    assert started == 2 * 2 + 1
+
+
+def test_global_concurrency_limit_is_shared_by_all_calls() -> None:
+    sync_fetcher = _SlowFetcher()
+    fetcher = AsyncPullRequestFetcher(sync_fetcher, max_concurrency=3)
+
+    async def fetch_everything():
+        await asyncio.gather(
+            *(fetcher.get_repository_info(repo_name, []) for repo_name in ["org/a", "org/b", "org/c", "org/d", "org/e"]),
+            fetcher.get_team_productivity_metrics(["org/f", "org/g"], ["dev1"], 14),
+        )
+
+    asyncio.run(fetch_everything())
+    fetcher.close()
+
+    assert sync_fetcher.max_running == 3
+
+
+def test_team_productivity_metrics_are_aggregated_across_repositories() -> None:
+    fetcher = AsyncPullRequestFetcher(_SlowFetcher(), max_concurrency=5)
+
+    metrics = asyncio.run(fetcher.get_team_productivity_metrics(["org/a", "org/b"], ["dev1"], 7))
+    fetcher.close()
+
+    assert metrics.time_window_days == 7
+    assert metrics.total_merged_prs == 2
+    assert (metrics.total_lines_added, metrics.total_lines_deleted) == (20, 10)
+    assert metrics.reviewer_approvals == {"dev1": 2}
+    assert [repo.repository_name for repo in metrics.repository_breakdown] == ["org/a", "org/b"]
+
+
+def test_fetcher_errors_are_propagated() -> None:
+    sync_fetcher = Mock()
+    sync_fetcher.get_repository_info.side_effect = ValueError("Failed to find repository")
+    fetcher = AsyncPullRequestFetcher(sync_fetcher, max_concurrency=2)
+
+    try:
+        asyncio.run(fetcher.get_repository_info("org/missing", []))
+        raised = False
+    except ValueError:
+        raised = True
+    fetcher.close()
+
+    assert raised
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from notifier.copilot_requester_cache import CachedRequester, CopilotRequesterCache
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.repository import AuthorFilter
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+UPDATED_AT = datetime(2025, 1, 2, 10, tzinfo=timezone.utc)
+LATER = datetime(2025, 1, 3, 10, tzinfo=timezone.utc)
+
+
+def test_found_requester_is_kept_and_missing_one_only_until_the_pull_request_is_updated(tmp_path) -> None:
+    cache = CopilotRequesterCache(tmp_path / "copilot_requesters.json", max_entries=100)
+    cache.put("org/repo", 1, UPDATED_AT, "alice")
+    cache.put("org/repo", 2, UPDATED_AT, None)
+    cache.save()
+
+    reloaded = CopilotRequesterCache(tmp_path / "copilot_requesters.json", max_entries=100)
+    assert reloaded.get("org/repo", 1, LATER) == CachedRequester("alice")
+    assert reloaded.get("org/repo", 2, UPDATED_AT) == CachedRequester(None)
+    assert reloaded.get("org/repo", 2, LATER) is None
+    assert (reloaded.hits, reloaded.misses) == (2, 1)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path) -> None:
+    cache = CopilotRequesterCache(tmp_path / "copilot_requesters.json", max_entries=2)
+    cache.put("org/repo", 1, UPDATED_AT, "alice")
+    cache.put("org/repo", 2, UPDATED_AT, "bob")
+    cache.get("org/repo", 1, UPDATED_AT)
+    cache.put("org/repo", 3, UPDATED_AT, "carol")
+
+    assert cache.get("org/repo", 2, UPDATED_AT) is None
+    assert cache.get("org/repo", 1, UPDATED_AT) == CachedRequester("alice")
+
+
+def _copilot_pull(number, updated_at):
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "url": f"/repos/org/repo/pulls/{number}",
+        "html_url": f"https://github.com/org/repo/pull/{number}",
+        "draft": False,
+        "created_at": "2025-01-01T10:00:00Z",
+        "updated_at": updated_at,
+        "user": {"login": "copilot-swe-agent"},
+        "additions": 1,
+        "deletions": 1,
+        "changed_files": 1,
+    }
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        server.route("GET", "/repos/org/repo", lambda request: FakeResponse(200, body={"id": 1, "full_name": "org/repo", "url": "/repos/org/repo"}))
+        # PR 1 was asked for by alice, nobody asked for PR 2 yet
+        server.route("GET", "/repos/org/repo/pulls/1/requested_reviewers", lambda request: FakeResponse(200, body={"users": [{"login": "alice"}], "teams": []}))
+        server.route("GET", "/repos/org/repo/pulls/2/requested_reviewers", lambda request: FakeResponse(200, body={"users": [], "teams": []}))
+        for number in (1, 2):
+            server.route("GET", f"/repos/org/repo/pulls/{number}/reviews", lambda request: FakeResponse(200, body=[]))
+        yield server
+
+
+def test_author_filter_resolves_the_requester_of_a_copilot_pull_request_once_across_runs(github_server, tmp_path) -> None:
+    github_server.route(
+        "GET", "/repos/org/repo/pulls", lambda request: FakeResponse(200, body=[_copilot_pull(1, "2025-01-02T10:00:00Z"), _copilot_pull(2, "2025-01-02T10:00:00Z")])
+    )
+    cache = CopilotRequesterCache(tmp_path / "copilot_requesters.json", max_entries=100)
+    PullRequestFetcher(github_server.url, "token", copilot_requester_cache=cache).get_repository_info("org/repo", [AuthorFilter(["bob"])])
+    cache.save()
+    assert len(github_server.requests_to("/repos/org/repo/pulls/1/requested_reviewers")) == 1
+    assert len(github_server.requests_to("/repos/org/repo/pulls/2/reviews")) == 1
+
+    # both PRs were updated since, alice's stays hers, PR 2 is looked at again
+    github_server.route(
+        "GET", "/repos/org/repo/pulls", lambda request: FakeResponse(200, body=[_copilot_pull(1, "2025-01-03T10:00:00Z"), _copilot_pull(2, "2025-01-03T10:00:00Z")])
+    )
+    cache = CopilotRequesterCache(tmp_path / "copilot_requesters.json", max_entries=100)
+    repository = PullRequestFetcher(github_server.url, "token", copilot_requester_cache=cache).get_repository_info("org/repo", [AuthorFilter(["alice"])])
+
+    assert [(pull.name, pull.copilot_requester) for pull in repository.pulls] == [("PR 1", "alice")]
+    # PR 1 is kept, so its review requests are fetched again for the review status, but not for the filter
+    assert len(github_server.requests_to("/repos/org/repo/pulls/1/requested_reviewers")) == 2
+    assert len(github_server.requests_to("/repos/org/repo/pulls/2/requested_reviewers")) == 2
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+
+from notifier.cron import CronSchedule
+
+
+@pytest.mark.parametrize(
+    "expression, moment, expected",
+    [
+        ("* * * * *", datetime(2025, 1, 1, 9, 30, 15), datetime(2025, 1, 1, 9, 31)),
+        ("0 9 * * *", datetime(2025, 1, 1, 9, 0), datetime(2025, 1, 2, 9, 0)),
+        ("*/15 * * * *", datetime(2025, 1, 1, 9, 31), datetime(2025, 1, 1, 9, 45)),
+        # 2025-01-03 is a Friday, the next workday is Monday
+        ("30 8 * * 1-5", datetime(2025, 1, 3, 9, 0), datetime(2025, 1, 6, 8, 30)),
+        ("0 0 * * 0", datetime(2025, 1, 1), datetime(2025, 1, 5)),
+        ("0 0 * * 7", datetime(2025, 1, 1), datetime(2025, 1, 5)),
+        ("0 12 1 2,3 *", datetime(2025, 1, 15), datetime(2025, 2, 1, 12, 0)),
+        # both days restricted: the 15th or a Monday, whichever comes first
+        ("0 0 15 * 1", datetime(2025, 1, 1), datetime(2025, 1, 6)),
+        ("0 0 29 2 *", datetime(2025, 1, 1), datetime(2028, 2, 29)),
+    ],
+)
+def test_next_after(expression: str, moment: datetime, expected: datetime) -> None:
+    assert CronSchedule.parse(expression).next_after(moment) == expected
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "*/0 * * * *", "5-1 * * * *", "a * * * *"])
+def test_invalid_schedule(expression: str) -> None:
+    with pytest.raises(ValueError):
+        CronSchedule.parse(expression)
+
+
+def test_schedule_that_never_fires() -> None:
+    with pytest.raises(ValueError):
+        CronSchedule.parse("0 0 30 2 *").next_after(datetime(2025, 1, 1))
@@ -0,0 +1,89 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+from notifier.cron import CronSchedule
+from notifier.daemon import NotificationDaemon
+from notifier.properties import PullRequestNotification
+
+
+def _notification(channel: str, schedule: str | None) -> PullRequestNotification:
+    return PullRequestNotification(
+        slack_channel=channel,
+        config={"repositories": ["org/repo"], "filters": []},
+        schedule=CronSchedule.parse(schedule) if schedule is not None else None,
+    )
+
+
+class FakeClock:
+    """Every reading is a minute later than the previous one, so that the daemon never has to wait"""
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def now(self) -> datetime:
+        self.current += timedelta(minutes=1)
+        return self.current
+
+
+def test_notifications_run_on_their_schedules() -> None:
+    clock = FakeClock(datetime(2025, 1, 1, 9, 50))
+    runs: list[tuple[datetime, list[str]]] = []
+
+    def run(due):
+        runs.append((clock.current, [notification.slack_channel for notification in due]))
+        if clock.current >= datetime(2025, 1, 1, 10, 20):
+            daemon.stop()
+
+    notifications = [_notification("every-minute", "* * * * *"), _notification("hourly", "0 * * * *"), _notification("manual", None)]
+    daemon = NotificationDaemon(notifications, run, now=clock.now)
+    daemon.run_forever()
+
+    assert all("every-minute" in channels and "manual" not in channels for _, channels in runs)
+    assert [time for time, channels in runs if "hourly" in channels] == [datetime(2025, 1, 1, 10, 0)]
+
+
+def test_failed_run_does_not_stop_the_daemon() -> None:
+    clock = FakeClock(datetime(2025, 1, 1, 9, 0))
+    runs = []
+
+    def run(due):
+        runs.append(due)
+        if len(runs) == 3:
+            daemon.stop()
+        raise ValueError("Slack is down")
+
+    daemon = NotificationDaemon([_notification("team", "* * * * *")], run, now=clock.now)
+    daemon.run_forever()
+
+    assert len(runs) == 3
+
+
+def test_unexpected_error_does_not_stop_the_daemon() -> None:
+    clock = FakeClock(datetime(2025, 1, 1, 9, 0))
+    runs = []
+
+    def run(due):
+        runs.append(due)
+        if len(runs) == 2:
+            daemon.stop()
+        raise requests.exceptions.ConnectionError("Connection reset by peer")
+
+    daemon = NotificationDaemon([_notification("team", "* * * * *")], run, now=clock.now)
+    daemon.run_forever()
+
+    assert len(runs) == 2
+
+
+def test_stop_interrupts_waiting_for_the_next_run() -> None:
+    daemon = NotificationDaemon([_notification("team", "0 0 1 1 *")], lambda due: None)
+    threading.Timer(0.1, daemon.stop).start()
+
+    daemon.run_forever()
+
+
+def test_daemon_needs_a_scheduled_notification() -> None:
+    with pytest.raises(ValueError):
+        NotificationDaemon([_notification("team", None)], lambda due: None)
@@ -0,0 +1,74 @@
+from notifier.execution_plan import (
+    MERGED_PULL_REQUESTS,
+    OPEN_PULL_REQUESTS,
+    notification_key,
+    plan_notifications,
+    productivity_scans,
+)
+from notifier.properties import ProductivityNotification, PullRequestNotification
+from notifier.repository import AuthorFilter, DraftFilter, ProductivityScan
+
+
+def _notifications():
+    return [
+        PullRequestNotification(slack_channel="backend", config={"repositories": ["org/api", "org/shared"], "filters": [DraftFilter(False)]}),
+        PullRequestNotification(slack_channel="frontend", config={"repositories": ["org/web", "org/shared"], "filters": []}),
+        ProductivityNotification(slack_channel="backend", config={"repositories": ["org/shared"], "team_members": ["alice"], "time_window_days": 14}),
+    ]
+
+
+def test_repositories_are_fetched_once_and_sends_grouped_by_channel() -> None:
+    plan = plan_notifications(_notifications())
+
+    assert [(step.repository_name, step.kind, step.notification_names) for step in plan.fetches] == [
+        ("org/api", OPEN_PULL_REQUESTS, ("pull_requests:backend",)),
+        ("org/shared", OPEN_PULL_REQUESTS, ("pull_requests:backend", "pull_requests:frontend")),
+        ("org/web", OPEN_PULL_REQUESTS, ("pull_requests:frontend",)),
+        ("org/shared", MERGED_PULL_REQUESTS, ("team_productivity:backend",)),
+    ]
+    assert [notification.slack_channel for notification in plan.notifications] == ["backend", "backend", "frontend"]
+
+
+def test_estimated_api_calls() -> None:
+    plan = plan_notifications(_notifications())
+
+    # 3 repositories, 3 open PR lists with 10 PRs of 3 requests each, 1 merged PR search with 10 merged PRs of 2 requests each
+    assert plan.estimate_api_calls("rest") == 3 + 3 * (1 + 30) + (1 + 20)
+    assert plan.estimate_api_calls_without_sharing("rest") == 4 * (1 + 1 + 30) + (1 + 1 + 20)
+    assert plan.estimate_api_calls("graphql") == 4
+    assert "org/shared" in plan.explain("rest")
+
+
+def test_repository_patterns_are_shown_unexpanded_without_an_estimate() -> None:
+    notifications = [PullRequestNotification(slack_channel="team", config={"repositories": ["org/api", "org/service-*"], "filters": []})]
+    plan = plan_notifications(notifications)
+
+    assert plan.estimate_api_calls("rest") == 1 + (1 + 30)
+    assert plan.estimate_api_calls_without_sharing("rest") == 1 + 1 + 30
+    assert "fetch open_pull_requests of org/service-*: unexpanded pattern, not estimated" in plan.explain("rest")
+
+
+def test_productivity_scans_cover_all_the_teams_and_the_longest_window() -> None:
+    notifications = [
+        *_notifications(),
+        ProductivityNotification(
+            slack_channel="frontend",
+            config={"repositories": ["org/shared", "org/web"], "team_members": ["bob", "carol"], "time_window_days": 7, "compare_to_previous_period": True},
+        ),
+    ]
+
+    assert productivity_scans(notifications) == {
+        "org/shared": ProductivityScan(frozenset({"alice", "bob", "carol"}), 14),
+        "org/web": ProductivityScan(frozenset({"bob", "carol"}), 14),
+    }
+
+
+def test_notification_key_is_kept_when_the_filters_change() -> None:
+    drafts = PullRequestNotification(slack_channel="team", config={"repositories": ["org/repo"], "filters": [DraftFilter(False)]}, id="drafts")
+    edited = PullRequestNotification(slack_channel="team", config={"repositories": ["org/repo"], "filters": [AuthorFilter(["alice"])]}, id="drafts")
+    alice = PullRequestNotification(slack_channel="team", config={"repositories": ["org/repo"], "filters": [AuthorFilter(["alice"])]}, id="alice")
+    without_id = PullRequestNotification(slack_channel="team", config={"repositories": ["org/repo"], "filters": []})
+
+    assert notification_key(drafts) == notification_key(edited) == "pull_requests:team:drafts"
+    assert notification_key(alice) == "pull_requests:team:alice"
+    assert notification_key(without_id) == "pull_requests:team"
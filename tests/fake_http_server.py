@@ -0,0 +1,83 @@
+import json
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+
+@dataclass
+class RecordedRequest:
+    method: str
+    path: str
+    headers: dict[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+@dataclass
+class FakeResponse:
+    status: int = 200
+    body: Any = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+Handler = Callable[[RecordedRequest], FakeResponse]
+
+
+class FakeHttpServer:
+    """
+    A tiny HTTP server running on localhost in a background thread, used to stand in for the GitHub and Slack APIs in tests.
+    Routes are matched on (method, path without query string). Every request is recorded for assertions.
+    """
+
+    def __init__(self) -> None:
+        self.routes: dict[tuple[str, str], Handler] = {}
+        self.requests: list[RecordedRequest] = []
+        server = self
+
+        class _RequestHandler(BaseHTTPRequestHandler):
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = RecordedRequest(self.command, self.path, dict(self.headers.items()), self.rfile.read(length))
+                server.requests.append(request)
+                handler = server.routes.get((self.command, self.path.split("?")[0]))
+                response = handler(request) if handler else FakeResponse(404, {"message": "Not Found"})
+                payload = b"" if response.body is None else json.dumps(response.body).encode()
+                self.send_response(response.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in response.headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _handle
+            do_POST = _handle
+            do_PATCH = _handle
+            do_DELETE = _handle
+
+            def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+                pass
+
+        self.__server = ThreadingHTTPServer(("127.0.0.1", 0), _RequestHandler)
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.__server.server_address[1]}"
+
+    def route(self, method: str, path: str, handler: Handler) -> None:
+        self.routes[(method, path)] = handler
+
+    def requests_to(self, path: str) -> list[RecordedRequest]:
+        return [request for request in self.requests if request.path.split("?")[0] == path]
+
+    def __enter__(self) -> "FakeHttpServer":
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
@@ -0,0 +1,153 @@
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.pull_request_index import PullRequestIndex
+from notifier.repository import AuthorFilter, DraftFilter
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+
+def _pull_request_node(number, author="alice", draft=False, requested=(), reviews=()):
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "isDraft": draft,
+        "createdAt": "2025-01-01T10:00:00Z",
+        "updatedAt": "2025-01-02T10:00:00Z",
+        "url": f"https://github.com/org/repo/pull/{number}",
+        "additions": 10 * number,
+        "deletions": number,
+        "changedFiles": 1,
+        "author": {"login": author},
+        "reviewRequests": {"nodes": [{"requestedReviewer": {"login": login}} for login in requested]},
+        "latestReviews": {
+            "nodes": [
+                {"databaseId": 100 * number + index, "state": state, "submittedAt": "2025-01-02T09:00:00Z", "author": {"login": login}}
+                for index, (login, state) in enumerate(reviews)
+            ]
+        },
+    }
+
+
+def _page(nodes, end_cursor=None):
+    return {
+        "data": {
+            "repository": {
+                "pullRequests": {"pageInfo": {"hasNextPage": end_cursor is not None, "endCursor": end_cursor}, "nodes": nodes},
+            }
+        }
+    }
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        yield server
+
+
+def test_graphql_backend_builds_repository_info_from_paginated_query(github_server) -> None:
+    pages = {
+        None: _page([_pull_request_node(1, reviews=[("bob", "APPROVED")]), _pull_request_node(2, draft=True)], end_cursor="cursor-1"),
+        "cursor-1": _page([_pull_request_node(3, requested=["carol"], reviews=[("bob", "APPROVED")])]),
+    }
+    github_server.route("POST", "/graphql", lambda request: FakeResponse(body=pages[request.json()["variables"]["cursor"]]))
+
+    fetcher = PullRequestFetcher(github_server.url, "token", fetch_backend="graphql")
+    repository = fetcher.get_repository_info("org/repo", [DraftFilter(False)])
+
+    assert repository.name == "org/repo"
+    assert [pull.name for pull in repository.pulls] == ["PR 1", "PR 3"]
+    first, third = repository.pulls
+    assert first.review_status == "APPROVED"
+    assert first.created_at == datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+    assert (first.additions, first.deletions, first.changed_files) == (10, 1, 1)
+    # carol was requested but has not reviewed yet
+    assert third.review_status == "WAITING"
+    # a single query per page, no per pull request calls
+    assert len(github_server.requests) == 2
+    assert github_server.requests[0].json()["variables"]["owner"] == "org"
+    assert github_server.requests[0].json()["variables"]["name"] == "repo"
+
+
+def test_graphql_backend_resolves_copilot_requester_without_extra_calls(github_server) -> None:
+    page = _page([_pull_request_node(1, author="Copilot", requested=["alice"]), _pull_request_node(2, author="Copilot", requested=["bob"])])
+    github_server.route("POST", "/graphql", lambda request: FakeResponse(body=page))
+
+    fetcher = PullRequestFetcher(github_server.url, "token", fetch_backend="graphql")
+    repository = fetcher.get_repository_info("org/repo", [AuthorFilter(["alice"])])
+
+    assert [pull.copilot_requester for pull in repository.pulls] == ["alice"]
+    assert len(github_server.requests) == 1
+
+
+def test_graphql_backend_seeds_the_webhook_index_with_the_review_ids(github_server) -> None:
+    github_server.route("POST", "/graphql", lambda request: FakeResponse(body=_page([_pull_request_node(1, reviews=[("bob", "APPROVED")])])))
+    index = PullRequestIndex()
+    fetcher = PullRequestFetcher(github_server.url, "token", fetch_backend="graphql", pull_request_index=index)
+    assert [pull.review_status for pull in fetcher.get_repository_info("org/repo", []).pulls] == ["APPROVED"]
+
+    # events refer to reviews by their REST id, the `databaseId` of the GraphQL API
+    event = json.loads((Path(__file__).resolve().parent / "test_resources" / "webhooks" / "pull_request_review_submitted.json").read_text())
+    event["pull_request"].update(number=1, title="PR 1", user={"login": "alice"}, updated_at="2025-01-02T12:00:00Z")
+    event["review"].update(id=100, user={"login": "bob"})
+    index.apply_event("pull_request_review", event)
+    index.apply_event("pull_request_review", {**event, "action": "dismissed", "review": {**event["review"], "state": "dismissed"}})
+    fetcher.reset_run_state()
+    (pull,) = fetcher.get_repository_info("org/repo", []).pulls
+
+    # the redelivered submission was not added again, and the dismissal found the approval
+    assert [(review.user.login, review.state) for review in index.get_open_pull_requests("org/repo", list)[0].reviews] == [("bob", "DISMISSED")]
+    assert pull.review_status == "WAITING"
+    assert len(github_server.requests) == 1
+
+
+def test_graphql_backend_missing_repository_raises_value_error(github_server) -> None:
+    github_server.route("POST", "/graphql", lambda request: FakeResponse(body={"data": {"repository": None}}))
+
+    fetcher = PullRequestFetcher(github_server.url, "token", fetch_backend="graphql")
+    with pytest.raises(ValueError):
+        fetcher.get_repository_info("org/missing", [])
+
+
+def _merged_node(number, author, merged_at="2025-01-10T10:00:00Z", approvers=()):
+    return {
+        "number": number,
+        "mergedAt": merged_at,
+        "additions": 100,
+        "deletions": 10,
+        "author": {"login": author},
+        "reviews": {"nodes": [{"submittedAt": "2025-01-10T09:00:00Z", "author": {"login": login}} for login in approvers]},
+    }
+
+
+def _search_page(nodes, end_cursor=None, issue_count=None):
+    return {
+        "data": {
+            "search": {
+                "issueCount": len(nodes) if issue_count is None else issue_count,
+                "pageInfo": {"hasNextPage": end_cursor is not None, "endCursor": end_cursor},
+                "nodes": nodes,
+            }
+        }
+    }
+
+
+def test_graphql_backend_productivity_uses_merged_pull_request_search(github_server) -> None:
+    pages = {
+        None: _search_page([_merged_node(1, "dev1", approvers=["dev2", "outsider"]), _merged_node(2, "outsider", approvers=["dev1"])], end_cursor="c1"),
+        "c1": _search_page([_merged_node(3, "dev2", approvers=["dev1"])]),
+    }
+    github_server.route("POST", "/graphql", lambda request: FakeResponse(body=pages[request.json()["variables"]["cursor"]]))
+
+    fetcher = PullRequestFetcher(github_server.url, "token", fetch_backend="graphql")
+    since_date = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    facts = fetcher.get_repository_productivity_facts("org/repo", ["dev1", "dev2"], since_date)
+
+    assert [pr.number for pr in facts.merged_pull_requests] == [1, 3]
+    assert sorted((approval.number, approval.reviewer) for approval in facts.approvals) == [(1, "dev2"), (1, "outsider"), (3, "dev1")]
+    search_query = github_server.requests[0].json()["variables"]["searchQuery"]
+    assert search_query == "repo:org/repo is:pr is:merged merged:>=2025-01-01T00:00:00Z"
+    assert len(github_server.requests) == 2
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from notifier.http_cache import CachedResponse, HttpResponseCache
+from notifier.pull_request_fetcher import PullRequestFetcher
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+REPOSITORY = {"id": 1, "name": "repo", "full_name": "org/repo", "url": "/repos/org/repo"}
+ETAG = '"abc123"'
+
+
+def _conditional_repository_endpoint(request):
+    if request.headers.get("If-None-Match") == ETAG:
+        return FakeResponse(304, headers={"ETag": ETAG, "X-RateLimit-Remaining": "4999"})
+    return FakeResponse(200, body=REPOSITORY, headers={"ETag": ETAG, "X-RateLimit-Remaining": "4998"})
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        server.route("GET", "/repos/org/repo", _conditional_repository_endpoint)
+        server.route("GET", "/repos/org/repo/pulls", lambda request: FakeResponse(200, body=[]))
+        yield server
+
+
+def test_second_run_is_served_from_cache_with_conditional_request(github_server, tmp_path) -> None:
+    first_run_cache = HttpResponseCache(tmp_path, max_size_bytes=1024 * 1024)
+    PullRequestFetcher(github_server.url, "token", http_cache=first_run_cache).get_repository_info("org/repo", [])
+    assert (first_run_cache.hits, first_run_cache.misses) == (0, 2)
+
+    # a new cache instance over the same directory, as in the next cron run
+    second_run_cache = HttpResponseCache(tmp_path, max_size_bytes=1024 * 1024)
+    repository = PullRequestFetcher(github_server.url, "token", http_cache=second_run_cache).get_repository_info("org/repo", [])
+
+    assert repository.name == "org/repo"
+    assert second_run_cache.hits == 1  # the repository, the pull request list has no ETag so it was not cached
+    repository_requests = github_server.requests_to("/repos/org/repo")
+    assert "If-None-Match" not in repository_requests[0].headers
+    assert repository_requests[1].headers["If-None-Match"] == ETAG
+
+
+def test_token_is_part_of_the_cache_key(github_server, tmp_path) -> None:
+    cache = HttpResponseCache(tmp_path, max_size_bytes=1024 * 1024)
+    PullRequestFetcher(github_server.url, "token-1", http_cache=cache).get_repository_info("org/repo", [])
+    PullRequestFetcher(github_server.url, "token-2", http_cache=cache).get_repository_info("org/repo", [])
+
+    assert cache.hits == 0
+    assert all("If-None-Match" not in request.headers for request in github_server.requests_to("/repos/org/repo"))
+
+
+def _response(body_size: int) -> CachedResponse:
+    return CachedResponse(url="https://api.github.com/x", status=200, headers={"etag": ETAG}, body=b"x" * body_size)
+
+
+def test_eviction_keeps_cache_under_size_limit_and_drops_least_recently_used(tmp_path) -> None:
+    cache = HttpResponseCache(tmp_path, max_size_bytes=1000)
+    cache.put("old", _response(300))
+    cache.put("recent", _response(300))
+    os.utime(tmp_path / "old.json", (1, 1))
+
+    cache.put("new", _response(300))
+
+    assert cache.get("old") is None
+    assert cache.get("recent") is not None
+    assert cache.get("new") is not None
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.json")) <= 1000
+
+
+def test_entry_larger_than_cache_is_not_stored(tmp_path) -> None:
+    cache = HttpResponseCache(tmp_path, max_size_bytes=100)
+    cache.put("huge", _response(1000))
+    assert cache.get("huge") is None
+
+
+def test_use_order_is_kept_in_memory_and_read_back_from_the_file_times(tmp_path) -> None:
+    cache = HttpResponseCache(tmp_path, max_size_bytes=1000)
+    cache.put("first", _response(300))
+    cache.put("second", _response(300))
+    cache.get("first")
+    cache.put("third", _response(300))
+
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+
+    # a new run orders the entries by the time of their last use
+    os.utime(tmp_path / "first.json", (1, 1))
+    reopened = HttpResponseCache(tmp_path, max_size_bytes=1000)
+    reopened.put("fourth", _response(300))
+
+    assert reopened.get("first") is None
+    assert reopened.get("third") is not None
@@ -1,8 +1,26 @@
-from unittest.mock import Mock
-
-from main import filter_notifications_by_type, run_notifications
-from notifier.properties import ProductivityNotification, PullRequestNotification
-from notifier.repository import AuthorFilter, DraftFilter
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import ANY, AsyncMock, Mock
+
+import pytest
+
+from main import (
+    check_config,
+    expand_from_cached_listings,
+    filter_notifications_by_type,
+    run_notifications,
+    run_notifications_async,
+)
+from notifier.properties import (
+    ProductivityNotification,
+    PullRequestNotification,
+    Settings,
+)
+from notifier.repository import AuthorFilter, DraftFilter, RepositoryInfo
 
 
 def test_run_notifications_with_pull_requests() -> None:
@@ -24,7 +42,10 @@ def test_run_notifications_with_pull_requests() -> None:
 
 def test_run_notifications_with_productivity() -> None:
     notifications = [
-        ProductivityNotification(slack_channel="team-channel", config={"repositories": ["repo1"], "team_members": ["dev1", "dev2"], "time_window_days": 14}),
+        ProductivityNotification(
+            slack_channel="team-channel",
+            config={"repositories": ["repo1"], "team_members": ["dev1", "dev2"], "time_window_days": 14, "other_time_windows_days": [30], "compare_to_previous_period": True},
+        ),
     ]
 
     fetcher = Mock()
@@ -33,9 +54,10 @@ def test_run_notifications_with_productivity() -> None:
 
     run_notifications(notifications, fetcher, pr_notifier, productivity_notifier)
 
-    productivity_notifier.send_productivity_report.assert_called_once_with(
-        "team-channel", ["repo1"], ["dev1", "dev2"], 14, fetcher.get_team_productivity_metrics
-    )
+    productivity_notifier.send_productivity_report.assert_called_once_with("team-channel", ["repo1"], ["dev1", "dev2"], 14, ANY)
+    get_team_metrics = productivity_notifier.send_productivity_report.call_args.args[4]
+    get_team_metrics(["repo1"], ["dev1", "dev2"], 14)
+    fetcher.get_team_productivity_metrics.assert_called_once_with(["repo1"], ["dev1", "dev2"], 14, other_windows_days=[30], compare_to_previous_period=True)
     pr_notifier.send_report_for_repos.assert_not_called()
 
 
@@ -70,3 +92,88 @@ def test_filter_notifications_by_type_team_productivity() -> None:
     channels = [n.slack_channel for n in filtered]
     assert "productivity-channel-1" in channels
     assert "productivity-channel-2" in channels
+
+
+def test_run_notifications_async_isolates_failing_notification() -> None:
+    notifications = [
+        PullRequestNotification(slack_channel="failing-channel", config={"repositories": ["org/missing"], "filters": []}),
+        PullRequestNotification(slack_channel="channel", config={"repositories": ["org/repo1", "org/repo2"], "filters": []}),
+        ProductivityNotification(slack_channel="team-channel", config={"repositories": ["org/repo1"], "team_members": ["dev1"], "time_window_days": 14}),
+    ]
+
+    async def stream_repositories_info(repository_names, pull_request_filters):
+        for name in repository_names:
+            if name == "org/missing":
+                raise ValueError("Failed to find repository")
+            yield RepositoryInfo(name=name, pulls=[])
+
+    fetcher = Mock()
+    fetcher.stream_repositories_info = stream_repositories_info
+    fetcher.get_team_productivity_metrics = AsyncMock(return_value="metrics")
+    pr_notifier = Mock()
+    productivity_notifier = Mock()
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_notifications_async(notifications, fetcher, pr_notifier, productivity_notifier))
+
+    # the healthy notifications were still sent
+    assert [call.args for call in pr_notifier.send_report_for_repo.call_args_list] == [
+        ("channel", RepositoryInfo(name="org/repo1", pulls=[])),
+        ("channel", RepositoryInfo(name="org/repo2", pulls=[])),
+    ]
+    productivity_notifier.send_productivity_report.assert_called_once()
+    get_team_metrics = productivity_notifier.send_productivity_report.call_args.args[4]
+    assert get_team_metrics(["org/repo1"], ["dev1"], 14) == "metrics"
+
+
+def test_run_notifications_async_keeps_channel_order() -> None:
+    notifications = [
+        PullRequestNotification(slack_channel="channel", config={"repositories": ["org/slow"], "filters": []}),
+        PullRequestNotification(slack_channel="channel", config={"repositories": ["org/fast"], "filters": []}),
+    ]
+
+    async def stream_repositories_info(repository_names, pull_request_filters):
+        for name in repository_names:
+            await asyncio.sleep(0.1 if name == "org/slow" else 0)
+            yield RepositoryInfo(name=name, pulls=[])
+
+    fetcher = Mock()
+    fetcher.stream_repositories_info = stream_repositories_info
+    pr_notifier = Mock()
+
+    asyncio.run(run_notifications_async(notifications, fetcher, pr_notifier, Mock()))
+
+    sent_repositories = [call.args[1].name for call in pr_notifier.send_report_for_repo.call_args_list]
+    assert sent_repositories == ["org/slow", "org/fast"]
+
+
+def test_importing_main_does_not_import_network_libraries() -> None:
+    # a fresh interpreter, this one imported them for the other tests already
+    code = "import sys, main; print(sorted(m for m in ('github', 'slack_sdk', 'requests', 'urllib3', 'regex', 'asyncio') if m in sys.modules))"
+    source_dir = Path(__file__).resolve().parents[1] / "src"
+    output = subprocess.run([sys.executable, "-c", code], cwd=source_dir, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+def test_check_config(tmp_path) -> None:
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"notifications": [{"slack_channel": "team", "repositories": ["org/repo"], "pull_request_filters": {"title_regex": "^feat"}}]}))
+    assert check_config(config_path) == 0
+
+    config_path.write_text(json.dumps({"notifications": [{"slack_channel": "team", "repositories": ["org/repo"], "pull_request_filters": {"title_regex": "(unclosed"}}]}))
+    assert check_config(config_path) == 1
+    assert check_config(tmp_path / "missing.json") == 1
+
+
+def test_explain_expands_the_repository_patterns_from_the_cached_listings_only(tmp_path) -> None:
+    listed = [{"full_name": f"org/{name}", "archived": False, "topics": [], "open_issues_count": 1, "pushed_at": None} for name in ("api", "web")]
+    (tmp_path / "repository_listings.json").write_text(json.dumps({"org": {"listed_at": time.time(), "repositories": listed}}))
+    notifications = [
+        PullRequestNotification(slack_channel="team", config={"repositories": ["org/*"], "filters": []}),
+        PullRequestNotification(slack_channel="other", config={"repositories": ["other-org/*"], "filters": []}),
+    ]
+
+    expanded = expand_from_cached_listings(notifications, Settings(cache_dir=tmp_path))
+
+    assert [notification.config["repositories"] for notification in expanded] == [["org/api", "org/web"], ["other-org/*"]]
+    assert expand_from_cached_listings(notifications, Settings()) == notifications
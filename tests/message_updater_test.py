@@ -0,0 +1,150 @@
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+
+import pytest
+
+from notifier.message_updater import MessageUpdater, PostedMessage, PostedMessageStore
+from notifier.repository import PullRequestInfo, RepositoryInfo
+from notifier.slack_client import MethodLimit, SlackClient, SlackDispatcher
+from notifier.summary_formatter import KeyedMessage, SummaryMessageFormatter
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+NO_LIMITS = {method: MethodLimit(interval_seconds=0, per_channel=True) for method in ("chat.postMessage", "chat.update", "chat.delete")}
+
+
+def _message(key, text=None):
+    return KeyedMessage(key, [{"type": "section", "text": {"type": "mrkdwn", "text": text or key}}], state=text or key)
+
+
+def _repository(numbers, age=(3, 0)):
+    pulls = [
+        PullRequestInfo(
+            name=f"PR {number}",
+            author="alice",
+            created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+            age=age,
+            review_status="PENDING",
+            url=f"https://github.com/org/repo/pull/{number}",
+            additions=1,
+            deletions=1,
+            changed_files=1,
+        )
+        for number in numbers
+    ]
+    return RepositoryInfo(name="org/repo", pulls=pulls)
+
+
+def _ts(request):
+    # chat.delete is sent form encoded, the other methods as JSON
+    if request.path.endswith("chat.delete"):
+        return parse_qs(request.body.decode())["ts"][0]
+    return request.json().get("ts")
+
+
+@pytest.fixture
+def slack_server():
+    with FakeHttpServer() as server:
+        posted = []
+
+        def post_message(request):
+            posted.append(request)
+            return FakeResponse(200, body={"ok": True, "channel": "C1", "ts": f"{len(posted)}.0"})
+
+        def update_message(request):
+            if request.json()["ts"] == "missing":
+                return FakeResponse(200, body={"ok": False, "error": "message_not_found"})
+            return FakeResponse(200, body={"ok": True, "channel": "C1", "ts": request.json()["ts"]})
+
+        server.route("POST", "/api/chat.postMessage", post_message)
+        server.route("POST", "/api/chat.update", update_message)
+        server.route("POST", "/api/chat.delete", lambda request: FakeResponse(200, body={"ok": True}))
+        yield server
+
+
+def _sync(slack_server, store, messages, notification_key="pull_requests:team"):
+    dispatcher = SlackDispatcher(SlackClient("xoxb-token", base_url=f"{slack_server.url}/api/"), method_limits=NO_LIMITS)
+    slack_server.requests.clear()
+    MessageUpdater(dispatcher, store).sync_messages("team", notification_key, "org/repo", messages)
+    assert dispatcher.close() == []
+    store.save()
+    return [(request.path.removeprefix("/api/"), _ts(request)) for request in slack_server.requests]
+
+
+def test_unchanged_messages_are_not_sent_again(slack_server, tmp_path) -> None:
+    messages = [_message("PR 1"), _message("PR 2")]
+    assert _sync(slack_server, PostedMessageStore(tmp_path / "slack_messages.json"), messages) == [("chat.postMessage", None)] * 2
+
+    # a new run with the store read back from disk
+    assert _sync(slack_server, PostedMessageStore(tmp_path / "slack_messages.json"), messages) == []
+
+
+def test_changed_message_is_updated_and_gone_messages_deleted(slack_server, tmp_path) -> None:
+    store = PostedMessageStore(tmp_path / "slack_messages.json")
+    _sync(slack_server, store, [_message("PR 1"), _message("PR 2"), _message("PR 3")])
+
+    calls = _sync(slack_server, store, [_message("PR 1"), _message("PR 2", "PR 2 approved")])
+
+    assert calls == [("chat.update", "2.0"), ("chat.delete", "3.0")]
+    assert [message.ts for message in store.get("team", "pull_requests:team", "org/repo")] == ["1.0", "2.0"]
+    assert _sync(slack_server, store, [_message("PR 1"), _message("PR 2", "PR 2 approved")]) == []
+
+
+def test_message_that_failed_to_be_deleted_is_deleted_by_the_next_run(slack_server, tmp_path) -> None:
+    store = PostedMessageStore(tmp_path / "slack_messages.json")
+    _sync(slack_server, store, [_message("PR 1"), _message("PR 2")])
+    slack_server.route("POST", "/api/chat.delete", lambda request: FakeResponse(200, body={"ok": False, "error": "cant_delete_message"}))
+
+    dispatcher = SlackDispatcher(SlackClient("xoxb-token", base_url=f"{slack_server.url}/api/"), method_limits=NO_LIMITS)
+    MessageUpdater(dispatcher, store).sync_messages("team", "pull_requests:team", "org/repo", [_message("PR 1")])
+    assert [channel for channel, _ in dispatcher.close()] == ["team"]
+    # the store job is not a Slack call
+    assert dispatcher.stats()["team"].calls == 1
+    assert [message.ts for message in store.get("team", "pull_requests:team", "org/repo")] == ["1.0", "2.0"]
+
+    # a message already deleted in Slack counts as deleted
+    slack_server.route("POST", "/api/chat.delete", lambda request: FakeResponse(200, body={"ok": False, "error": "message_not_found"}))
+    assert _sync(slack_server, store, [_message("PR 1")]) == [("chat.delete", "2.0")]
+    assert [message.ts for message in store.get("team", "pull_requests:team", "org/repo")] == ["1.0"]
+
+
+def test_closed_pull_request_costs_only_the_delete_of_its_message(slack_server, tmp_path) -> None:
+    formatter = SummaryMessageFormatter()
+    store = PostedMessageStore(tmp_path / "slack_messages.json")
+    _sync(slack_server, store, formatter.get_keyed_messages_for_repo(_repository([1, 2, 3, 4, 5])))
+
+    assert _sync(slack_server, store, formatter.get_keyed_messages_for_repo(_repository([1, 2, 4, 5]))) == [("chat.delete", "3.0")]
+    # a new pull request is posted below the others
+    assert _sync(slack_server, store, formatter.get_keyed_messages_for_repo(_repository([1, 2, 4, 5, 6]))) == [("chat.postMessage", None)]
+    # the header moves to the message of the next pull request, which is the first one in the channel now
+    assert _sync(slack_server, store, formatter.get_keyed_messages_for_repo(_repository([2, 4, 5, 6]))) == [("chat.update", "1.0"), ("chat.delete", "2.0")]
+
+
+def test_message_deleted_in_slack_is_posted_again(slack_server, tmp_path) -> None:
+    store = PostedMessageStore(tmp_path / "slack_messages.json")
+    _sync(slack_server, store, [_message("PR 1")])
+    posted = store.get("team", "pull_requests:team", "org/repo")
+    store.put("team", "pull_requests:team", "org/repo", [PostedMessage(message.key, "C1", "missing", message.content_hash) for message in posted])
+
+    calls = _sync(slack_server, store, [_message("PR 1", "PR 1 approved")])
+
+    assert calls == [("chat.update", "missing"), ("chat.postMessage", None)]
+    assert [message.ts for message in store.get("team", "pull_requests:team", "org/repo")] == ["2.0"]
+
+
+def test_getting_older_edits_a_message_only_when_its_urgency_changes(slack_server, tmp_path) -> None:
+    formatter = SummaryMessageFormatter()
+    store = PostedMessageStore(tmp_path / "slack_messages.json")
+    _sync(slack_server, store, formatter.get_keyed_messages_for_repo(_repository([1, 2], age=(3, 0))))
+
+    assert _sync(slack_server, store, formatter.get_keyed_messages_for_repo(_repository([1, 2], age=(4, 0)))) == []
+    # the warning emoji from 5 days on
+    assert _sync(slack_server, store, formatter.get_keyed_messages_for_repo(_repository([1, 2], age=(5, 0)))) == [("chat.update", "1.0"), ("chat.update", "2.0")]
+
+
+def test_notifications_posting_the_same_repository_to_a_channel_keep_their_own_messages(slack_server, tmp_path) -> None:
+    store = PostedMessageStore(tmp_path / "slack_messages.json")
+    _sync(slack_server, store, [_message("PR 1"), _message("PR 2")], notification_key="pull_requests:team:drafts")
+    _sync(slack_server, store, [_message("PR 1")], notification_key="pull_requests:team:alice")
+
+    assert _sync(slack_server, store, [_message("PR 1"), _message("PR 2")], notification_key="pull_requests:team:drafts") == []
+    assert _sync(slack_server, store, [_message("PR 1")], notification_key="pull_requests:team:alice") == []
@@ -1,4 +1,5 @@
 import json
+from dataclasses import replace
 
 from notifier.productivity_formatter import ProductivityMessageFormatter
 from notifier.repository import RepositoryProductivityMetrics, TeamProductivityMetrics
@@ -120,3 +121,16 @@ def test_time_window_in_header() -> None:
     metrics = _make_metrics(time_window_days=7)
     text = _extract_text(formatter.get_messages_for_team_metrics(metrics))
     assert "Last 7 days" in text
+
+
+# Other windows and the change against the previous period
+def test_other_windows_and_changes() -> None:
+    metrics = replace(
+        _make_metrics(time_window_days=7, total_merged_prs=5),
+        previous_period=_make_metrics(time_window_days=7, total_merged_prs=3, total_lines_added=100),
+        other_windows=[replace(_make_metrics(time_window_days=30, total_merged_prs=12), previous_period=_make_metrics(total_merged_prs=14))],
+    )
+    text = _extract_text(formatter.get_messages_for_team_metrics(metrics))
+    assert "*5* merged PRs (:arrow_up: +2)" in text
+    assert "lines added (:left_right_arrow: \\u00b10)" in text
+    assert "_Last 30 days_: *12* merged PRs (:arrow_down: -2)" in text
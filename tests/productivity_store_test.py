@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from notifier.productivity_store import ProductivityStore, Watermark
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.repository import (
+    ApprovalFact,
+    MergedPullRequestFact,
+    RepositoryProductivityFacts,
+)
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+NOW = datetime.now(timezone.utc)
+
+
+def _facts(merged, approvals=()):
+    return RepositoryProductivityFacts(
+        repository_name="org/repo",
+        merged_pull_requests=[
+            MergedPullRequestFact("org/repo", number, "alice", NOW - timedelta(days=days_ago), 10, 1) for number, days_ago in merged
+        ],
+        approvals=[ApprovalFact("org/repo", number, reviewer, NOW - timedelta(days=days_ago)) for number, reviewer, days_ago in approvals],
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProductivityStore(tmp_path / "productivity.sqlite3")
+    yield store
+    store.close()
+
+
+def test_windows_are_computed_from_the_store(store) -> None:
+    store.save(
+        _facts([(1, 2), (2, 20), (3, 60)], [(1, "bob", 1), (2, "bob", 19), (3, "bob", 59)]),
+        Watermark(NOW - timedelta(days=90), NOW, frozenset({"alice"})),
+    )
+
+    week = store.load("org/repo", NOW - timedelta(days=7))
+    month = store.load("org/repo", NOW - timedelta(days=30))
+
+    assert [pr.number for pr in week.merged_pull_requests] == [1]
+    assert [approval.number for approval in week.approvals] == [1]
+    assert sorted(pr.number for pr in month.merged_pull_requests) == [1, 2]
+    assert store.load("org/other", NOW - timedelta(days=90)).merged_pull_requests == []
+
+
+def test_saving_again_updates_facts_without_duplicates(store) -> None:
+    watermark = Watermark(NOW - timedelta(days=14), NOW, frozenset({"alice"}))
+    store.save(_facts([(1, 2)], [(1, "bob", 1)]), watermark)
+    store.save(_facts([(1, 2)], [(1, "bob", 1), (1, "carol", 0)]), watermark)
+
+    facts = store.load("org/repo", NOW - timedelta(days=14))
+
+    assert len(facts.merged_pull_requests) == 1
+    assert sorted(approval.reviewer for approval in facts.approvals) == ["bob", "carol"]
+
+
+def test_saved_pull_request_replaces_its_approvals(store) -> None:
+    watermark = Watermark(NOW - timedelta(days=14), NOW, frozenset({"alice"}))
+    store.save(_facts([(1, 2), (2, 3)], [(1, "bob", 1), (2, "bob", 2)]), watermark)
+    # bob's approval of PR 1 was dismissed, PR 2 was not updated since
+    store.save(_facts([(1, 2)], [(1, "carol", 0)]), watermark)
+
+    facts = store.load("org/repo", NOW - timedelta(days=14))
+
+    assert sorted((approval.number, approval.reviewer) for approval in facts.approvals) == [(1, "carol"), (2, "bob")]
+
+
+def test_pull_requests_merged_before_the_watermark_are_dropped(store) -> None:
+    store.save(_facts([(1, 2), (2, 40)], [(1, "bob", 1), (2, "bob", 39)]), Watermark(NOW - timedelta(days=60), NOW, frozenset({"alice"})))
+    store.save(_facts([]), Watermark(NOW - timedelta(days=30), NOW, frozenset({"alice"})))
+
+    facts = store.load("org/repo", NOW - timedelta(days=60))
+
+    assert [pr.number for pr in facts.merged_pull_requests] == [1]
+    assert [approval.number for approval in facts.approvals] == [1]
+
+
+def test_watermark_round_trip_and_coverage(tmp_path) -> None:
+    path = tmp_path / "productivity.sqlite3"
+    first_run = ProductivityStore(path)
+    first_run.save(_facts([]), Watermark(NOW - timedelta(days=14), NOW, frozenset({"alice", "bob"})))
+    first_run.close()
+
+    second_run = ProductivityStore(path)
+    watermark = second_run.get_watermark("org/repo")
+    second_run.close()
+
+    assert watermark is not None
+    assert watermark.fetched_until == NOW
+    assert watermark.covers(NOW - timedelta(days=7), ["alice"])
+    assert not watermark.covers(NOW - timedelta(days=30), ["alice"])
+    assert not watermark.covers(NOW - timedelta(days=7), ["alice", "carol"])
+
+
+def _search_response(nodes):
+    return {"data": {"search": {"issueCount": len(nodes), "pageInfo": {"hasNextPage": False, "endCursor": None}, "nodes": nodes}}}
+
+
+def _merged_node(number, days_ago):
+    merged_at = (NOW - timedelta(days=days_ago)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {"number": number, "mergedAt": merged_at, "additions": 5, "deletions": 1, "author": {"login": "alice"}, "reviews": {"nodes": []}}
+
+
+def test_next_run_fetches_only_pull_requests_updated_since_watermark(store) -> None:
+    with FakeHttpServer() as github_server:
+        responses = iter([_search_response([_merged_node(1, 3)]), _search_response([_merged_node(2, 0)])])
+        github_server.route("POST", "/graphql", lambda request: FakeResponse(body=next(responses)))
+
+        fetcher = PullRequestFetcher(github_server.url, "token", fetch_backend="graphql", productivity_store=store)
+        fetcher.get_repository_productivity_facts("org/repo", ["alice"], NOW - timedelta(days=14))
+        second_run = fetcher.get_repository_productivity_facts("org/repo", ["alice"], NOW - timedelta(days=7))
+
+        first_query, second_query = (request.json()["variables"]["searchQuery"] for request in github_server.requests)
+
+    assert "updated:>=" not in first_query
+    assert "updated:>=" in second_query
+    # PR 1 comes from the store, PR 2 from the incremental fetch
+    assert sorted(pr.number for pr in second_run.merged_pull_requests) == [1, 2]
+
+
+def test_store_keeps_twice_the_scanned_window(store) -> None:
+    with FakeHttpServer() as github_server:
+        responses = iter([_search_response([_merged_node(1, 3), _merged_node(2, 20)]), _search_response([])])
+        github_server.route("POST", "/graphql", lambda request: FakeResponse(body=next(responses)))
+
+        fetcher = PullRequestFetcher(github_server.url, "token", fetch_backend="graphql", productivity_store=store)
+        fetcher.get_repository_productivity_facts("org/repo", ["alice"], NOW - timedelta(days=30))
+        fetcher.get_repository_productivity_facts("org/repo", ["alice"], NOW - timedelta(days=7))
+
+    watermark = store.get_watermark("org/repo")
+    assert watermark is not None and watermark.covered_since > NOW - timedelta(days=15)
+    assert [pr.number for pr in store.load("org/repo", NOW - timedelta(days=30)).merged_pull_requests] == [1]
@@ -87,3 +87,119 @@ def test_empty_config(tmp_path) -> None:
     config_path = create_config_file(tmp_path, config, filename="empty.json")
     with pytest.raises(ValueError):
         properties.read_config(config_path)
+
+def test_settings_default_when_section_missing(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"notifications": []})
+    assert properties.read_settings(config_path) == properties.Settings()
+
+def test_settings_fetch_backend(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"fetch_backend": "graphql"}, "notifications": []})
+    assert properties.read_settings(config_path).fetch_backend == "graphql"
+
+def test_settings_unknown_fetch_backend(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"fetch_backend": "soap"}, "notifications": []})
+    with pytest.raises(ValueError):
+        properties.read_settings(config_path)
+
+def test_settings_cache_dir_is_relative_to_config_file(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"cache_dir": "cache", "http_cache_max_size_mb": 5}, "notifications": []})
+    settings = properties.read_settings(config_path)
+    assert settings.cache_dir == tmp_path / "cache"
+    assert settings.http_cache_max_size_mb == 5
+
+def test_settings_invalid_http_cache_size(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"http_cache_max_size_mb": 0}, "notifications": []})
+    with pytest.raises(ValueError):
+        properties.read_settings(config_path)
+
+def test_notification_priority(tmp_path) -> None:
+    config = {"notifications": [{"slack_channel": "urgent", "repositories": ["repo1"], "priority": 10}, {"slack_channel": "other", "repositories": ["repo2"]}]}
+    config_path = create_config_file(tmp_path, config)
+    assert [notification.priority for notification in properties.read_config(config_path)] == [10, 0]
+
+def test_invalid_notification_priority(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"notifications": [{"slack_channel": "channel", "repositories": ["repo1"], "priority": "high"}]})
+    with pytest.raises(ValueError):
+        properties.read_config(config_path)
+
+def test_settings_pack_messages(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"pack_messages": True}, "notifications": []})
+    assert properties.read_settings(config_path).pack_messages is True
+
+def test_settings_invalid_pack_messages(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"pack_messages": "yes"}, "notifications": []})
+    with pytest.raises(ValueError):
+        properties.read_settings(config_path)
+
+def test_settings_update_messages_requires_cache_dir(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"update_messages": True}, "notifications": []})
+    with pytest.raises(ValueError):
+        properties.read_settings(config_path)
+
+    config_path = create_config_file(tmp_path, {"settings": {"update_messages": True, "cache_dir": "cache"}, "notifications": []})
+    assert properties.read_settings(config_path).update_messages is True
+
+def test_notifications_of_a_channel_need_distinct_ids_to_update_their_messages(tmp_path) -> None:
+    notifications = [{"slack_channel": "team", "repositories": ["repo1"], "id": "drafts"}, {"slack_channel": "team", "repositories": ["repo1"]}]
+    config_path = create_config_file(tmp_path, {"settings": {"update_messages": True, "cache_dir": "cache"}, "notifications": notifications})
+    assert [notification.id for notification in properties.read_config(config_path)] == ["drafts", None]
+
+    config_path = create_config_file(tmp_path, {"settings": {"update_messages": True, "cache_dir": "cache"}, "notifications": notifications[1:] * 2})
+    with pytest.raises(ValueError):
+        properties.read_config(config_path)
+    # without update_messages every notification posts its own messages
+    config_path = create_config_file(tmp_path, {"notifications": notifications[1:] * 2})
+    assert len(properties.read_config(config_path)) == 2
+
+def test_invalid_notification_id(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"notifications": [{"slack_channel": "team", "repositories": ["repo1"], "id": ""}]})
+    with pytest.raises(ValueError):
+        properties.read_config(config_path)
+
+def test_notification_schedule(tmp_path) -> None:
+    config = {"notifications": [{"slack_channel": "team", "repositories": ["repo1"], "schedule": "0 9 * * 1-5"}, {"slack_channel": "other", "repositories": ["repo2"]}]}
+    config_path = create_config_file(tmp_path, config)
+    schedules = [notification.schedule for notification in properties.read_config(config_path)]
+    assert schedules[0] is not None and schedules[0].expression == "0 9 * * 1-5"
+    assert schedules[1] is None
+
+def test_invalid_notification_schedule(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"notifications": [{"slack_channel": "team", "repositories": ["repo1"], "schedule": "every morning"}]})
+    with pytest.raises(ValueError):
+        properties.read_config(config_path)
+
+def test_settings_webhook_port(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"webhook_port": 9000}, "notifications": []})
+    assert properties.read_settings(config_path).webhook_port == 9000
+    config_path = create_config_file(tmp_path, {"settings": {}, "notifications": []})
+    assert properties.read_settings(config_path).webhook_port is None
+
+def test_settings_run_report_files_are_relative_to_config_file(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"run_report_file": "reports/run.json", "prometheus_metrics_file": "/var/lib/node_exporter/notifier.prom"}, "notifications": []})
+    settings = properties.read_settings(config_path)
+    assert settings.run_report_file == tmp_path / "reports" / "run.json"
+    assert settings.prometheus_metrics_file == Path("/var/lib/node_exporter/notifier.prom")
+
+def test_settings_trace_file(tmp_path) -> None:
+    config_path = create_config_file(tmp_path, {"settings": {"trace_file": "trace.jsonl"}, "notifications": []})
+    assert properties.read_settings(config_path).trace_file == tmp_path / "trace.jsonl"
+    config_path = create_config_file(tmp_path, {"settings": {"trace_file": 1}, "notifications": []})
+    with pytest.raises(ValueError):
+        properties.read_settings(config_path)
+
+def test_repository_patterns_are_checked(tmp_path) -> None:
+    config = {"notifications": [{"slack_channel": "test-channel", "repositories": ["org/service-*", "org/topic:backend"]}]}
+    assert properties.read_config(create_config_file(tmp_path, config))[0].config["repositories"] == ["org/service-*", "org/topic:backend"]
+
+    config["notifications"][0]["repositories"] = ["*/repo"]
+    with pytest.raises(ValueError, match="must name the owner"):
+        properties.read_config(create_config_file(tmp_path, config))
+
+def test_productivity_time_windows(tmp_path) -> None:
+    config = {"notifications": [{"type": "team_productivity", "slack_channel": "team", "repositories": ["org/repo"], "team_members": ["alice"], "time_window_days": [7, 30, 7], "compare_to_previous_period": True}]}
+    notification = properties.read_config(create_config_file(tmp_path, config))[0]
+    assert (notification.config["time_window_days"], notification.config["other_time_windows_days"], notification.config["compare_to_previous_period"]) == (7, [30], True)
+
+    config["notifications"][0]["time_window_days"] = []
+    with pytest.raises(ValueError, match="time_window_days"):
+        properties.read_config(create_config_file(tmp_path, config))
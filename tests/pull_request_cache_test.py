@@ -0,0 +1,117 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from notifier.pull_request_cache import PullRequestInfoCache
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.repository import PullRequestInfo
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+UPDATED_AT = datetime(2025, 1, 2, 10, tzinfo=timezone.utc)
+CREATED_AT = datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+
+
+def _info(name="PR", review_status="APPROVED") -> PullRequestInfo:
+    return PullRequestInfo(
+        name=name,
+        author="alice",
+        created_at=CREATED_AT,
+        age=(0, 0),
+        review_status=review_status,
+        url="https://github.com/org/repo/pull/1",
+        additions=10,
+        deletions=5,
+        changed_files=2,
+    )
+
+
+def _cache(tmp_path, max_entries=100, ttl=timedelta(days=7)) -> PullRequestInfoCache:
+    return PullRequestInfoCache(tmp_path / "pull_requests.json", max_entries, ttl)
+
+
+def test_entry_survives_between_runs_and_age_is_recomputed(tmp_path) -> None:
+    cache = _cache(tmp_path)
+    cache.put("org/repo", 1, UPDATED_AT, _info())
+    cache.save()
+
+    cached = _cache(tmp_path).get("org/repo", 1, UPDATED_AT)
+
+    assert cached is not None
+    assert cached.review_status == "APPROVED"
+    assert cached.created_at == CREATED_AT
+    assert cached.age[0] > 0  # recomputed from created_at, not the stored (0, 0)
+
+
+def test_updated_pull_request_is_a_miss(tmp_path) -> None:
+    cache = _cache(tmp_path)
+    cache.put("org/repo", 1, UPDATED_AT, _info())
+
+    assert cache.get("org/repo", 1, UPDATED_AT + timedelta(minutes=1)) is None
+    assert cache.get("org/other-repo", 1, UPDATED_AT) is None
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path) -> None:
+    cache = _cache(tmp_path, max_entries=2)
+    cache.put("org/repo", 1, UPDATED_AT, _info("PR 1"))
+    cache.put("org/repo", 2, UPDATED_AT, _info("PR 2"))
+    cache.get("org/repo", 1, UPDATED_AT)  # PR 1 is now the most recently used
+    cache.put("org/repo", 3, UPDATED_AT, _info("PR 3"))
+
+    assert cache.get("org/repo", 1, UPDATED_AT) is not None
+    assert cache.get("org/repo", 2, UPDATED_AT) is None
+    assert cache.get("org/repo", 3, UPDATED_AT) is not None
+
+
+def test_expired_entry_is_a_miss_and_not_saved(tmp_path) -> None:
+    cache = _cache(tmp_path, ttl=timedelta(seconds=0.05))
+    cache.put("org/repo", 1, UPDATED_AT, _info())
+    time.sleep(0.1)
+
+    assert cache.get("org/repo", 1, UPDATED_AT) is None
+    cache.save()
+    assert _cache(tmp_path).get("org/repo", 1, UPDATED_AT) is None
+
+
+def _pull(number, updated_at):
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "state": "open",
+        "draft": False,
+        "user": {"login": "alice"},
+        "created_at": "2025-01-01T10:00:00Z",
+        "updated_at": updated_at,
+        "html_url": f"https://github.com/org/repo/pull/{number}",
+        "url": f"/repos/org/repo/pulls/{number}",
+        "additions": 1,
+        "deletions": 1,
+        "changed_files": 1,
+    }
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        server.route("GET", "/repos/org/repo", lambda request: FakeResponse(body={"name": "repo", "full_name": "org/repo", "url": "/repos/org/repo"}))
+        for number in (1, 2):
+            server.route("GET", f"/repos/org/repo/pulls/{number}/requested_reviewers", lambda request: FakeResponse(body={"users": [], "teams": []}))
+            server.route("GET", f"/repos/org/repo/pulls/{number}/reviews", lambda request: FakeResponse(body=[]))
+        yield server
+
+
+def test_only_changed_pull_requests_are_hydrated_on_the_next_run(github_server, tmp_path) -> None:
+    github_server.route("GET", "/repos/org/repo/pulls", lambda request: FakeResponse(body=[_pull(1, "2025-01-02T10:00:00Z"), _pull(2, "2025-01-02T10:00:00Z")]))
+    cache = _cache(tmp_path)
+    PullRequestFetcher(github_server.url, "token", pull_request_cache=cache).get_repository_info("org/repo", [])
+    cache.save()
+    assert len(github_server.requests_to("/repos/org/repo/pulls/1/reviews")) == 1
+
+    # PR 2 was updated since the last run
+    github_server.route("GET", "/repos/org/repo/pulls", lambda request: FakeResponse(body=[_pull(1, "2025-01-02T10:00:00Z"), _pull(2, "2025-01-03T10:00:00Z")]))
+    repository = PullRequestFetcher(github_server.url, "token", pull_request_cache=_cache(tmp_path)).get_repository_info("org/repo", [])
+
+    assert [pull.name for pull in repository.pulls] == ["PR 1", "PR 2"]
+    assert len(github_server.requests_to("/repos/org/repo/pulls/1/reviews")) == 1
+    assert len(github_server.requests_to("/repos/org/repo/pulls/2/reviews")) == 2
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.repository import AuthorFilter, DraftFilter, ProductivityScan
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+
+def _open_pull_request(number, author, draft):
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "url": f"/repos/org/repo/pulls/{number}",
+        "html_url": f"https://github.com/org/repo/pull/{number}",
+        "draft": draft,
+        "created_at": "2025-01-01T10:00:00Z",
+        "updated_at": "2025-01-02T10:00:00Z",
+        "user": {"login": author},
+        "additions": 1,
+        "deletions": 1,
+        "changed_files": 1,
+    }
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        server.route("GET", "/repos/org/repo", lambda request: FakeResponse(200, body={"id": 1, "full_name": "org/repo", "url": "/repos/org/repo"}))
+        server.route(
+            "GET",
+            "/repos/org/repo/pulls",
+            lambda request: FakeResponse(200, body=[_open_pull_request(1, "Copilot", draft=False), _open_pull_request(2, "Copilot", draft=True)]),
+        )
+        for number in (1, 2):
+            server.route(
+                "GET",
+                f"/repos/org/repo/pulls/{number}/requested_reviewers",
+                lambda request: FakeResponse(200, body={"users": [{"login": "alice"}], "teams": []}),
+            )
+            server.route("GET", f"/repos/org/repo/pulls/{number}/reviews", lambda request: FakeResponse(200, body=[]))
+        server.route("GET", "/search/issues", lambda request: FakeResponse(200, body=_search_result([])))
+        yield server
+
+
+def test_cheap_filters_run_first_and_expensive_lookups_are_not_repeated(github_server) -> None:
+    # the author filter comes first in the config, but the draft filter is evaluated before it
+    repository = PullRequestFetcher(github_server.url, "token").get_repository_info("org/repo", [AuthorFilter(["alice"]), DraftFilter(False)])
+
+    assert [(pull.name, pull.copilot_requester) for pull in repository.pulls] == [("PR 1", "alice")]
+    # the review requests of the Copilot PR are fetched once, for both the filter and the review status
+    assert len(github_server.requests_to("/repos/org/repo/pulls/1/requested_reviewers")) == 1
+    # the draft PR is dropped before any per pull request lookup
+    assert not github_server.requests_to("/repos/org/repo/pulls/2/requested_reviewers")
+    assert not github_server.requests_to("/repos/org/repo/pulls/2/reviews")
+
+
+def test_notifications_watching_the_same_repository_share_its_data(github_server) -> None:
+    fetcher = PullRequestFetcher(github_server.url, "token")
+
+    fetcher.get_repository_info("org/repo", [DraftFilter(False)])
+    repository = fetcher.get_repository_info("org/repo", [AuthorFilter(["alice"])])
+    fetcher.get_team_productivity_metrics(["org/repo"], ["alice"], 14)
+
+    assert [pull.name for pull in repository.pulls] == ["PR 1", "PR 2"]
+    assert len(github_server.requests_to("/repos/org/repo")) == 1
+    assert len(github_server.requests_to("/repos/org/repo/pulls/1/reviews")) == 1
+    assert len(github_server.requests_to("/repos/org/repo/pulls/1/requested_reviewers")) == 1
+
+    fetcher.reset_run_state()
+    fetcher.get_repository_info("org/repo", [DraftFilter(False)])
+    assert len(github_server.requests_to("/repos/org/repo/pulls/1/reviews")) == 2
+
+
+def _search_result(pulls, total_count=None):
+    # the search returns issues, a pull request's one links to the pull request and tells when it was merged
+    items = [
+        {**pull, "url": f"/repos/org/repo/issues/{pull['number']}", "pull_request": {"url": pull["url"], "merged_at": pull["merged_at"]}}
+        for pull in pulls
+    ]
+    return {"total_count": len(pulls) if total_count is None else total_count, "incomplete_results": False, "items": items}
+
+
+def _merged_pull_request(number, author, merged_at):
+    return {**_open_pull_request(number, author, draft=False), "state": "closed", "updated_at": merged_at, "merged_at": merged_at}
+
+
+def test_teams_watching_the_same_repository_share_one_scan_of_its_merged_pull_requests() -> None:
+    merged_at = (datetime.now(timezone.utc) - timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    merged = [_merged_pull_request(number, author, merged_at) for number, author in ((1, "alice"), (2, "bob"))]
+    with FakeHttpServer() as server:
+        server.route("GET", "/search/issues", lambda request: FakeResponse(200, body=_search_result(merged)))
+        for pull in merged:
+            server.route("GET", f"/repos/org/repo/pulls/{pull['number']}", lambda request, pull=pull: FakeResponse(200, body=pull))
+            server.route("GET", f"/repos/org/repo/pulls/{pull['number']}/reviews", lambda request: FakeResponse(200, body=[]))
+        fetcher = PullRequestFetcher(server.url, "token")
+        fetcher.share_productivity_scans({"org/repo": ProductivityScan(frozenset({"alice", "bob"}), 14)})
+
+        alice_team = fetcher.get_team_productivity_metrics(["org/repo"], ["alice"], 7)
+        bob_team = fetcher.get_team_productivity_metrics(["org/repo"], ["bob"], 14)
+        # not covered by the shared scan, scanned on its own
+        carol_team = fetcher.get_team_productivity_metrics(["org/repo"], ["carol"], 7)
+        fetcher.close()
+
+    assert (alice_team.total_merged_prs, bob_team.total_merged_prs, carol_team.total_merged_prs) == (1, 1, 0)
+    assert len(server.requests_to("/search/issues")) == 2
+    assert len(server.requests_to("/repos/org/repo/pulls/1/reviews")) == 1
+
+
+def test_rest_backend_searches_only_for_the_pull_requests_merged_in_the_window() -> None:
+    merged_at = (datetime.now(timezone.utc) - timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    merged = _merged_pull_request(1, "alice", merged_at)
+    with FakeHttpServer() as server:
+        server.route("GET", "/search/issues", lambda request: FakeResponse(200, body=_search_result([merged])))
+        server.route("GET", "/repos/org/repo/pulls/1", lambda request: FakeResponse(200, body=merged))
+        server.route("GET", "/repos/org/repo/pulls/1/reviews", lambda request: FakeResponse(200, body=[]))
+        fetcher = PullRequestFetcher(server.url, "token")
+        metrics = fetcher.get_team_productivity_metrics(["org/repo"], ["alice"], 7)
+        fetcher.close()
+
+    assert (metrics.total_merged_prs, metrics.total_lines_added) == (1, 1)
+    (search,) = server.requests_to("/search/issues")
+    assert "repo:org/repo is:pr is:merged merged:>=" in parse_qs(urlsplit(search.path).query)["q"][0]
+    # neither the repository nor its closed pull requests are listed
+    assert server.requests_to("/repos/org/repo") == server.requests_to("/repos/org/repo/pulls") == []
+
+
+def test_rest_backend_scans_the_closed_pull_requests_when_the_search_has_too_many_results() -> None:
+    merged_at = (datetime.now(timezone.utc) - timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    merged = _merged_pull_request(1, "alice", merged_at)
+    with FakeHttpServer() as server:
+        server.route("GET", "/search/issues", lambda request: FakeResponse(200, body=_search_result([merged], total_count=1500)))
+        server.route("GET", "/repos/org/repo", lambda request: FakeResponse(200, body={"id": 1, "full_name": "org/repo", "url": "/repos/org/repo"}))
+        server.route("GET", "/repos/org/repo/pulls", lambda request: FakeResponse(200, body=[merged]))
+        server.route("GET", "/repos/org/repo/pulls/1/reviews", lambda request: FakeResponse(200, body=[]))
+        fetcher = PullRequestFetcher(server.url, "token")
+        metrics = fetcher.get_team_productivity_metrics(["org/repo"], ["alice"], 7)
+        fetcher.close()
+
+    assert metrics.total_merged_prs == 1
+    assert len(server.requests_to("/repos/org/repo/pulls")) == 1
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from notifier.properties import ProductivityNotification, PullRequestNotification
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.repository import ListedRepository, RepositoryPattern
+from notifier.repository_discovery import RepositoryDiscovery
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+NOW = datetime.now(timezone.utc)
+
+
+def _listing(owner):
+    return [
+        ListedRepository(f"{owner}/service-a", archived=False, topics=["backend"], open_issues_count=2, pushed_at=NOW),
+        ListedRepository(f"{owner}/service-old", archived=True, topics=["backend"], open_issues_count=1, pushed_at=NOW - timedelta(days=400)),
+        ListedRepository(f"{owner}/service-quiet", archived=False, topics=[], open_issues_count=0, pushed_at=NOW - timedelta(days=3)),
+        ListedRepository(f"{owner}/web", archived=False, topics=["frontend", "backend"], open_issues_count=5, pushed_at=NOW - timedelta(days=30)),
+    ]
+
+
+def test_patterns() -> None:
+    assert RepositoryPattern.parse("org/repo") is None
+    assert RepositoryPattern.parse("org/*") == RepositoryPattern("org")
+    assert RepositoryPattern.parse("org/topic:Backend") == RepositoryPattern("org", topic="backend")
+    assert RepositoryPattern("org", "SERVICE-*").matches(_listing("org")[0])
+    assert not RepositoryPattern("org", "service-*").matches(_listing("org")[3])
+    for invalid in ("*/repo", "/service-*", "org/topic:"):
+        with pytest.raises(ValueError):
+            RepositoryPattern.parse(invalid)
+
+
+def test_patterns_are_expanded_from_one_listing_per_owner_kept_on_disk(tmp_path) -> None:
+    listed_owners = []
+
+    def list_repositories(owner):
+        listed_owners.append(owner)
+        return _listing(owner)
+
+    notifications = [
+        PullRequestNotification(slack_channel="backend", config={"repositories": ["org/service-*", "org/topic:backend", "other/explicit"], "filters": []}),
+        ProductivityNotification(slack_channel="team", config={"repositories": ["org/*"], "team_members": ["alice"], "time_window_days": 7}),
+    ]
+    discovery = RepositoryDiscovery(list_repositories, timedelta(hours=1), tmp_path / "repository_listings.json")
+
+    (pull_requests, productivity), failed = discovery.expand(notifications)
+
+    # archived ones are skipped, and those without open issues or PRs, or without pushes in the window of the productivity report
+    assert pull_requests.config["repositories"] == ["org/service-a", "org/web", "other/explicit"]
+    assert productivity.config["repositories"] == ["org/service-a", "org/service-quiet"]
+    assert listed_owners == ["org"]
+    assert failed == []
+
+    RepositoryDiscovery(list_repositories, timedelta(hours=1), tmp_path / "repository_listings.json").expand(notifications)
+    assert listed_owners == ["org"]
+    RepositoryDiscovery(list_repositories, timedelta(seconds=0), tmp_path / "repository_listings.json").expand(notifications)
+    assert listed_owners == ["org", "org"]
+
+
+def test_fetcher_lists_the_repositories_of_a_user_when_the_owner_is_no_organization() -> None:
+    repository = {
+        "id": 1,
+        "full_name": "alice/dotfiles",
+        "url": "/repos/alice/dotfiles",
+        "archived": False,
+        "topics": ["shell"],
+        "open_issues_count": 1,
+        "pushed_at": "2025-01-01T10:00:00Z",
+    }
+    with FakeHttpServer() as server:
+        server.route("GET", "/users/alice", lambda request: FakeResponse(200, body={"login": "alice", "url": "/users/alice"}))
+        server.route("GET", "/users/alice/repos", lambda request: FakeResponse(200, body=[repository]))
+        fetcher = PullRequestFetcher(server.url, "token")
+
+        listed = fetcher.list_repositories("alice")
+        fetcher.close()
+
+    assert listed == [ListedRepository("alice/dotfiles", False, ["shell"], 1, datetime(2025, 1, 1, 10, tzinfo=timezone.utc))]
+    assert [request.path.split("?")[0] for request in server.requests][0] == "/orgs/alice/repos"
+
+
+def test_failed_user_listing_is_reported_as_a_value_error() -> None:
+    with FakeHttpServer() as server:
+        server.route("GET", "/users/alice/repos", lambda request: FakeResponse(403, body={"message": "Forbidden"}))
+        fetcher = PullRequestFetcher(server.url, "token")
+
+        with pytest.raises(ValueError, match="Failed to retrieve data"):
+            fetcher.list_repositories("alice")
+        fetcher.close()
+
+
+def test_failed_listing_fails_only_the_notifications_using_the_owner() -> None:
+    listed_owners = []
+
+    def list_repositories(owner):
+        listed_owners.append(owner)
+        if owner == "broken":
+            raise ValueError("Failed to retrieve data from GitHub")
+        return _listing(owner)
+
+    notifications = [
+        PullRequestNotification(slack_channel="a", config={"repositories": ["broken/*"], "filters": []}),
+        PullRequestNotification(slack_channel="b", config={"repositories": ["org/web", "org/service-*"], "filters": []}),
+        PullRequestNotification(slack_channel="c", config={"repositories": ["org/web", "broken/topic:backend"], "filters": []}),
+    ]
+
+    expanded, failed = RepositoryDiscovery(list_repositories, timedelta(hours=1)).expand(notifications)
+
+    assert [(notification.slack_channel, notification.config["repositories"]) for notification in expanded] == [("b", ["org/web", "org/service-a"])]
+    assert [notification.slack_channel for notification, _ in failed] == ["a", "c"]
+    # a failed owner is not listed again by the other notifications of the run
+    assert listed_owners == ["broken", "org"]
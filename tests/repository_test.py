@@ -1,8 +1,18 @@
+from datetime import datetime, timedelta, timezone
 from unittest.mock import Mock
 
-from notifier.repository import AuthorFilter
+from notifier.repository import (
+    ApprovalFact,
+    AuthorFilter,
+    DraftFilter,
+    MergedPullRequestFact,
+    ProductivityWindows,
+    PullRequestDetails,
+    RepositoryProductivityFacts,
+    TitleFilter,
+)
 from notifier.repository import _get_review_status as get_review_status
-
+from notifier.repository import create_pull_request_info, summarize_team_productivity
 
 # ---------- AuthorFilter ----------
 
@@ -161,3 +171,90 @@ def test_empty_required_reviewers_falls_back_to_all_reviewers_waiting():
 def test_empty_required_reviewers_falls_back_to_all_reviewers_approved():
     reviews = make_reviews(("alice", "APPROVED"), ("bob", "APPROVED"))
     assert get_review_status(reviews, []) == "APPROVED"
+
+
+# ---------- summarize_team_productivity ----------
+
+SINCE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+IN_WINDOW = datetime(2025, 1, 5, tzinfo=timezone.utc)
+BEFORE_WINDOW = datetime(2024, 12, 20, tzinfo=timezone.utc)
+
+
+def _facts(repository_name, merged, approvals):
+    return RepositoryProductivityFacts(
+        repository_name=repository_name,
+        merged_pull_requests=[MergedPullRequestFact(repository_name, number, author, merged_at, 10, 2) for number, author, merged_at in merged],
+        approvals=[ApprovalFact(repository_name, number, reviewer, submitted_at) for number, reviewer, submitted_at in approvals],
+    )
+
+
+def test_summary_counts_only_team_prs_merged_in_window():
+    facts = _facts(
+        "org/repo",
+        merged=[(1, "alice", IN_WINDOW), (2, "outsider", IN_WINDOW), (3, "bob", BEFORE_WINDOW)],
+        approvals=[],
+    )
+    metrics = summarize_team_productivity(14, [facts], ["alice", "bob"], SINCE)
+    assert metrics.total_merged_prs == 1
+    assert (metrics.total_lines_added, metrics.total_lines_deleted) == (10, 2)
+    assert metrics.repository_breakdown[0].merged_prs_count == 1
+
+
+def test_summary_counts_team_approvals_on_counted_prs_only():
+    facts = _facts(
+        "org/repo",
+        merged=[(1, "alice", IN_WINDOW), (2, "outsider", IN_WINDOW)],
+        approvals=[(1, "bob", IN_WINDOW), (1, "outsider", IN_WINDOW), (2, "bob", IN_WINDOW), (1, "alice", BEFORE_WINDOW)],
+    )
+    metrics = summarize_team_productivity(14, [facts], ["alice", "bob"], SINCE)
+    assert metrics.reviewer_approvals == {"bob": 1}
+
+
+def test_summary_aggregates_repositories():
+    facts = [_facts("org/a", [(1, "alice", IN_WINDOW)], [(1, "bob", IN_WINDOW)]), _facts("org/b", [(1, "bob", IN_WINDOW)], [(1, "bob", IN_WINDOW)])]
+    metrics = summarize_team_productivity(7, facts, ["alice", "bob"], SINCE)
+    assert metrics.time_window_days == 7
+    assert metrics.total_merged_prs == 2
+    assert [repo.repository_name for repo in metrics.repository_breakdown] == ["org/a", "org/b"]
+    assert metrics.reviewer_approvals == {"bob": 2}
+
+
+def test_all_windows_and_previous_periods_come_from_one_scan():
+    now = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    windows = ProductivityWindows(7, other_windows_days=(30,), compare_to_previous_period=True)
+    days_ago = lambda days: now - timedelta(days=days)
+    facts = _facts(
+        "org/repo",
+        merged=[(1, "alice", days_ago(2)), (2, "alice", days_ago(10)), (3, "bob", days_ago(12)), (4, "bob", days_ago(45))],
+        approvals=[(1, "bob", days_ago(1)), (2, "bob", days_ago(9))],
+    )
+
+    metrics = windows.summarize([facts], ["alice", "bob"], now)
+
+    assert windows.scanned_days == 60
+    assert (metrics.time_window_days, metrics.total_merged_prs, metrics.reviewer_approvals) == (7, 1, {"bob": 1})
+    assert (metrics.previous_period.total_merged_prs, metrics.previous_period.reviewer_approvals) == (2, {"bob": 1})
+    [last_30_days] = metrics.other_windows
+    assert (last_30_days.time_window_days, last_30_days.total_merged_prs, last_30_days.previous_period.total_merged_prs) == (30, 3, 1)
+
+
+# ---------- filter costs and PullRequestDetails ----------
+
+def test_filters_reading_list_payload_are_cheap():
+    assert DraftFilter(False).cost == 0
+    assert TitleFilter("^feat").cost == 0
+    assert AuthorFilter(["test-author"]).cost > 0
+
+
+def test_details_fetched_by_filter_are_reused_for_pull_request_info():
+    pr = _make_pr("Copilot", requested_reviewers=["test-author"], reviews=[("test-author", "APPROVED")])
+    pr.created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    details = PullRequestDetails(pr)
+
+    assert AuthorFilter(["test-author"]).applies(pr, details) is True
+    info = create_pull_request_info(pr, details)
+
+    assert info.copilot_requester == "test-author"
+    assert info.review_status == "APPROVED"
+    pr.get_review_requests.assert_called_once()
+    pr.get_reviews.assert_called_once()
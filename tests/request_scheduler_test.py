@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest
+from requests import PreparedRequest, Response
+from requests.structures import CaseInsensitiveDict
+
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.request_scheduler import RateLimitScheduler, request_priority
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+REPOSITORY = {"id": 1, "name": "repo", "full_name": "org/repo", "url": "/repos/org/repo"}
+
+
+def _request(path="/repos/org/repo") -> PreparedRequest:
+    request = PreparedRequest()
+    request.prepare(method="GET", url=f"https://api.github.com{path}")
+    return request
+
+
+def _response(status=200, headers=None, body=b"{}") -> Response:
+    response = Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers or {})
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        server.route("GET", "/repos/org/repo/pulls", lambda request: FakeResponse(200, body=[]))
+        yield server
+
+
+def test_secondary_rate_limit_is_retried_after_retry_after(github_server) -> None:
+    responses = iter(
+        [
+            FakeResponse(
+                403, body={"message": "You have exceeded a secondary rate limit."}, headers={"Retry-After": "1", "X-RateLimit-Remaining": "4000"}
+            ),
+            FakeResponse(200, body=REPOSITORY),
+        ]
+    )
+    github_server.route("GET", "/repos/org/repo", lambda request: next(responses))
+
+    start = time.monotonic()
+    repository = PullRequestFetcher(github_server.url, "token").get_repository_info("org/repo", [])
+
+    assert repository.name == "org/repo"
+    assert len(github_server.requests_to("/repos/org/repo")) == 2
+    assert time.monotonic() - start >= 1
+
+
+def test_requests_wait_for_reset_of_exhausted_quota(github_server) -> None:
+    reset_at = int(time.time()) + 2
+    request_times = []
+
+    def repository_endpoint(request):
+        request_times.append(time.time())
+        return FakeResponse(
+            200, body=REPOSITORY, headers={"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset_at)}
+        )
+
+    def pulls_endpoint(request):
+        request_times.append(time.time())
+        return FakeResponse(200, body=[])
+
+    github_server.route("GET", "/repos/org/repo", repository_endpoint)
+    github_server.route("GET", "/repos/org/repo/pulls", pulls_endpoint)
+
+    PullRequestFetcher(github_server.url, "token").get_repository_info("org/repo", [])
+
+    repository_request, pulls_request = request_times
+    assert pulls_request >= reset_at > repository_request
+
+
+def test_permission_denied_is_not_treated_as_rate_limit(github_server) -> None:
+    github_server.route("GET", "/repos/org/repo", lambda request: FakeResponse(403, body={"message": "Resource not accessible by integration"}))
+
+    with pytest.raises(ValueError):
+        PullRequestFetcher(github_server.url, "token").get_repository_info("org/repo", [])
+    assert len(github_server.requests_to("/repos/org/repo")) == 1
+
+
+class _CountingSend:
+    def __init__(self, response_headers=None, latency=0.05):
+        self.running = 0
+        self.max_running = 0
+        self.__lock = threading.Lock()
+        self.__response_headers = response_headers or {}
+        self.__latency = latency
+
+    def __call__(self, request):
+        with self.__lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.__latency)
+        with self.__lock:
+            self.running -= 1
+        return _response(headers=self.__response_headers)
+
+
+def _send_concurrently(scheduler, send, count):
+    threads = [threading.Thread(target=scheduler.handle, args=(_request(), send)) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrency_follows_remaining_quota() -> None:
+    scheduler = RateLimitScheduler(max_concurrency=8)
+    plenty = _CountingSend({"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "4000", "X-RateLimit-Reset": str(int(time.time()) + 3600)})
+    _send_concurrently(scheduler, plenty, 16)
+    assert plenty.max_running == 8
+
+    # 5 requests left out of 5000, spread over one request at a time
+    almost_exhausted = _CountingSend({"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "5", "X-RateLimit-Reset": str(int(time.time()) + 3600)})
+    scheduler.handle(_request(), almost_exhausted)
+    _send_concurrently(scheduler, almost_exhausted, 8)
+    assert almost_exhausted.max_running == 1
+
+
+def test_secondary_rate_limit_lowers_concurrency_until_requests_succeed() -> None:
+    scheduler = RateLimitScheduler(max_concurrency=8)
+    responses = iter([_response(429, {"Retry-After": "0"}), _response(200)])
+
+    scheduler.handle(_request(), lambda request: next(responses))
+
+    assert scheduler.concurrency == 4
+    assert scheduler.throttled == 1
+    _send_concurrently(scheduler, _CountingSend(latency=0), 40)
+    assert scheduler.concurrency > 4
+
+
+def test_waiting_requests_are_sent_by_priority() -> None:
+    scheduler = RateLimitScheduler(max_concurrency=1)
+    first_request_sent = threading.Event()
+    release_first_request = threading.Event()
+    order = []
+
+    def blocking_send(request):
+        first_request_sent.set()
+        release_first_request.wait()
+        return _response()
+
+    def send_with_priority(name, priority):
+        with request_priority(priority):
+            scheduler.handle(_request(), lambda request: order.append(name) or _response())
+
+    blocking = threading.Thread(target=scheduler.handle, args=(_request(), blocking_send))
+    blocking.start()
+    first_request_sent.wait()
+    waiting = [threading.Thread(target=send_with_priority, args=(name, priority)) for name, priority in [("low", 0), ("high", 10), ("medium", 5)]]
+    for thread in waiting:
+        thread.start()
+        time.sleep(0.05)  # queued in this order
+    release_first_request.set()
+    for thread in [blocking, *waiting]:
+        thread.join()
+
+    assert order == ["high", "medium", "low"]
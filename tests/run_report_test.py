@@ -0,0 +1,90 @@
+import json
+import time
+
+import pytest
+
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.run_report import RunReport, reported_notification
+from notifier.slack_client import MethodLimit, SlackClient, SlackDispatcher
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+RATE_LIMIT_RESET = str(int(time.time()) + 3600)
+
+
+def _rate_limit(remaining):
+    return {"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset": RATE_LIMIT_RESET, "X-RateLimit-Resource": "core"}
+
+
+def _open_pull_request(number):
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "url": f"/repos/org/repo/pulls/{number}",
+        "html_url": f"https://github.com/org/repo/pull/{number}",
+        "draft": False,
+        "created_at": "2025-01-01T10:00:00Z",
+        "updated_at": "2025-01-01T10:00:00Z",
+        "user": {"login": "alice"},
+        "additions": 1,
+        "deletions": 1,
+        "changed_files": 1,
+    }
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        remaining = iter(range(4999, 0, -1))
+        server.route(
+            "GET", "/repos/org/repo", lambda request: FakeResponse(200, body={"id": 1, "full_name": "org/repo", "url": "/repos/org/repo"}, headers=_rate_limit(next(remaining)))
+        )
+        server.route("GET", "/repos/org/repo/pulls", lambda request: FakeResponse(200, body=[_open_pull_request(1)], headers=_rate_limit(next(remaining))))
+        server.route("GET", "/repos/org/repo/pulls/1/requested_reviewers", lambda request: FakeResponse(200, body={"users": [], "teams": []}, headers=_rate_limit(next(remaining))))
+        server.route("GET", "/repos/org/repo/pulls/1/reviews", lambda request: FakeResponse(200, body=[], headers=_rate_limit(next(remaining))))
+        yield server
+
+
+def test_github_requests_are_counted_per_endpoint_repository_and_notification(github_server) -> None:
+    report = RunReport()
+    fetcher = PullRequestFetcher(github_server.url, "token", run_report=report)
+
+    with reported_notification("pull_requests:team"):
+        fetcher.get_repository_info("org/repo", [])
+    fetcher.close()
+
+    github = report.to_dict()["github"]
+    assert github["by_endpoint"]["GET /repos/{repo}/pulls/{number}/reviews"]["calls"] == 1
+    assert github["by_repository"]["org/repo"]["calls"] == len(github_server.requests)
+    assert github["by_notification"] == {"pull_requests:team": github["total"]}
+    assert github["total"]["bytes_received"] > 0
+    assert github["rate_limits"]["core"]["used"] == len(github_server.requests) - 1
+
+
+def test_slack_calls_and_retries_are_counted_per_channel(tmp_path) -> None:
+    responses = iter(
+        [
+            FakeResponse(429, body={"ok": False, "error": "ratelimited"}, headers={"Retry-After": "1"}),
+            FakeResponse(200, body={"ok": True, "channel": "C1", "ts": "1.0"}),
+        ]
+    )
+    report = RunReport()
+    with FakeHttpServer() as slack_server:
+        slack_server.route("POST", "/api/chat.postMessage", lambda request: next(responses))
+        dispatcher = SlackDispatcher(
+            SlackClient("xoxb-token", base_url=f"{slack_server.url}/api/"),
+            method_limits={"chat.postMessage": MethodLimit(interval_seconds=0, per_channel=True)},
+            run_report=report,
+        )
+        with reported_notification("pull_requests:team"):
+            dispatcher.send_message_from_blocks("team", [{"type": "section", "text": {"type": "mrkdwn", "text": "hello"}}])
+        assert dispatcher.close() == []
+
+    report.write_json(tmp_path / "report.json")
+    report.write_prometheus(tmp_path / "metrics.prom")
+
+    slack = json.loads((tmp_path / "report.json").read_text())["slack"]
+    assert (slack["by_channel"]["team"]["calls"], slack["by_channel"]["team"]["retries"]) == (1, 1)
+    assert slack["by_notification"]["pull_requests:team"]["calls"] == 1
+    metrics = (tmp_path / "metrics.prom").read_text().splitlines()
+    assert 'notifier_slack_calls_by_method_total{method="chat.postMessage"} 1' in metrics
+    assert 'notifier_slack_retries_total{channel="team"} 1' in metrics
@@ -0,0 +1,88 @@
+import pytest
+
+from notifier.http_cache import CachedResponse
+from notifier.properties import ProductivityNotification, PullRequestNotification
+from notifier.repository import AuthorFilter, DraftFilter
+from notifier.run_report import RunReport
+from notifier.sharding import (
+    ShardedFetcher,
+    ShardFetchError,
+    WorkerConfig,
+    shard_http_cache,
+    shard_of,
+)
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+
+def _open_pull_request(number, author):
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "url": f"/repos/org/repo/pulls/{number}",
+        "html_url": f"https://github.com/org/repo/pull/{number}",
+        "draft": False,
+        "created_at": "2025-01-01T10:00:00Z",
+        "updated_at": "2025-01-01T10:00:00Z",
+        "merged_at": None,
+        "user": {"login": author},
+        "additions": 1,
+        "deletions": 1,
+        "changed_files": 1,
+    }
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        server.route("GET", "/repos/org/repo", lambda request: FakeResponse(200, body={"id": 1, "full_name": "org/repo", "url": "/repos/org/repo"}))
+        server.route("GET", "/repos/org/repo/pulls", lambda request: FakeResponse(200, body=[_open_pull_request(1, "alice"), _open_pull_request(2, "bob")]))
+        server.route("GET", "/search/issues", lambda request: FakeResponse(200, body={"total_count": 0, "incomplete_results": False, "items": []}))
+        for number in (1, 2):
+            server.route("GET", f"/repos/org/repo/pulls/{number}/requested_reviewers", lambda request: FakeResponse(200, body={"users": [], "teams": []}))
+            server.route("GET", f"/repos/org/repo/pulls/{number}/reviews", lambda request: FakeResponse(200, body=[]))
+        yield server
+
+
+def test_repositories_stay_in_their_shard() -> None:
+    names = [f"org/repo-{index}" for index in range(100)]
+
+    assert [shard_of(name, 4) for name in names] == [shard_of(name.upper(), 4) for name in names]
+    assert {shard_of(name, 4) for name in names} == {0, 1, 2, 3}
+
+
+def test_shards_are_merged_and_failures_stay_with_their_repository(github_server) -> None:
+    notifications = [
+        PullRequestNotification(slack_channel="all", config={"repositories": ["org/repo", "org/missing"], "filters": [DraftFilter(False)]}),
+        PullRequestNotification(slack_channel="alice", config={"repositories": ["org/repo"], "filters": [AuthorFilter(["alice"])]}),
+        ProductivityNotification(slack_channel="team", config={"repositories": ["org/repo"], "team_members": ["alice"], "time_window_days": 7}),
+    ]
+    report = RunReport()
+    fetcher = ShardedFetcher(WorkerConfig(github_server.url, "token"), shard_count=2)
+
+    fetcher.fetch(notifications, report)
+
+    assert [pr.author for pr in fetcher.get_repository_info("org/repo", [DraftFilter(False)]).pulls] == ["alice", "bob"]
+    assert [pr.author for pr in fetcher.get_repository_info("org/repo", [AuthorFilter(["alice"])]).pulls] == ["alice"]
+    with pytest.raises(ShardFetchError, match="UnknownObjectException"):
+        fetcher.get_repository_info("org/missing", [DraftFilter(False)])
+    assert fetcher.get_team_productivity_metrics(["org/repo"], ["alice"], 7).total_merged_prs == 0
+    # the workers' GitHub requests end up in the report of the run
+    github = report.to_dict()["github"]
+    assert github["total"]["calls"] == len(github_server.requests)
+    assert github["by_notification"]["pull_requests:all"]["calls"] > 0
+
+
+def test_shards_do_not_evict_each_others_http_cache_entries(tmp_path) -> None:
+    shard_caches = [shard_http_cache(tmp_path, 1, index, 2) for index in range(2)]
+    response = CachedResponse(url="https://api.github.com/x", status=200, headers={"etag": "abc"}, body=b"x" * 100_000)
+
+    # each shard nearly fills its half of the 1 MB budget
+    for index, cache in enumerate(shard_caches):
+        for entry in range(3):
+            cache.put(f"shard{index}-{entry}", response)
+    # and a new shard process of the next run starts with the entries of its shard only
+    shard_caches[0] = shard_http_cache(tmp_path, 1, 0, 2)
+    shard_caches[0].put("shard0-3", response)
+
+    assert all(shard_caches[1].get(f"shard1-{entry}") is not None for entry in range(3))
+    assert shard_caches[0].get("shard0-3") is not None
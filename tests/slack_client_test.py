@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from notifier.slack_client import MethodLimit, SlackClient, SlackDispatcher
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+NO_LIMITS = {"chat.postMessage": MethodLimit(interval_seconds=0, per_channel=True)}
+SLACK_LATENCY = 0.2
+
+
+def _message(text):
+    return [{"type": "section", "text": {"type": "mrkdwn", "text": text}}]
+
+
+def _posted(requests):
+    return [(request.json()["channel"], request.json()["blocks"][0]["text"]["text"]) for request in requests]
+
+
+@pytest.fixture
+def slack_server():
+    with FakeHttpServer() as server:
+        yield server
+
+
+def _client(slack_server):
+    return SlackClient("xoxb-token", base_url=f"{slack_server.url}/api/")
+
+
+def test_rate_limited_message_is_retried_after_retry_after(slack_server) -> None:
+    responses = iter(
+        [
+            FakeResponse(429, body={"ok": False, "error": "ratelimited"}, headers={"Retry-After": "1"}),
+            FakeResponse(200, body={"ok": True, "channel": "C1", "ts": "1.0"}),
+        ]
+    )
+    slack_server.route("POST", "/api/chat.postMessage", lambda request: next(responses))
+    dispatcher = SlackDispatcher(_client(slack_server), method_limits=NO_LIMITS)
+
+    dispatcher.send_message_from_blocks("team", _message("hello"))
+    failures = dispatcher.close()
+
+    assert failures == []
+    assert _posted(slack_server.requests) == [("team", "hello"), ("team", "hello")]
+    stats = dispatcher.stats()["team"]
+    assert (stats.calls, stats.retries) == (1, 1)
+    assert stats.throttled_seconds == 1
+    assert stats.max_latency_seconds >= 1
+
+
+def test_channels_are_served_in_parallel_in_order(slack_server) -> None:
+    def post_message(request):
+        time.sleep(SLACK_LATENCY)
+        return FakeResponse(200, body={"ok": True})
+
+    slack_server.route("POST", "/api/chat.postMessage", post_message)
+    dispatcher = SlackDispatcher(_client(slack_server), method_limits=NO_LIMITS)
+
+    start = time.monotonic()
+    for index in range(3):
+        for channel in ("channel-a", "channel-b", "channel-c"):
+            dispatcher.send_message_from_blocks(channel, _message(f"{channel} {index}"))
+    failures = dispatcher.close()
+    elapsed = time.monotonic() - start
+
+    assert failures == []
+    for channel in ("channel-a", "channel-b", "channel-c"):
+        posted_to_channel = [text for posted_channel, text in _posted(slack_server.requests) if posted_channel == channel]
+        assert posted_to_channel == [f"{channel} {index}" for index in range(3)]
+    # three messages per channel, the channels overlap
+    assert elapsed < 6 * SLACK_LATENCY
+
+
+def test_messages_to_a_channel_are_spaced_by_method_limit(slack_server) -> None:
+    post_times = []
+
+    def post_message(request):
+        post_times.append(time.monotonic())
+        return FakeResponse(200, body={"ok": True})
+
+    slack_server.route("POST", "/api/chat.postMessage", post_message)
+    dispatcher = SlackDispatcher(_client(slack_server), method_limits={"chat.postMessage": MethodLimit(interval_seconds=0.3, per_channel=True)})
+
+    for index in range(3):
+        dispatcher.send_message_from_blocks("team", _message(str(index)))
+    dispatcher.close()
+
+    assert all(later - earlier >= 0.25 for earlier, later in zip(post_times, post_times[1:]))
+
+
+def test_failed_message_is_reported_and_channel_goes_on(slack_server) -> None:
+    lock = threading.Lock()
+    calls = []
+
+    def post_message(request):
+        with lock:
+            calls.append(request)
+            first = len(calls) == 1
+        return FakeResponse(200, body={"ok": False, "error": "invalid_blocks"} if first else {"ok": True})
+
+    slack_server.route("POST", "/api/chat.postMessage", post_message)
+    dispatcher = SlackDispatcher(_client(slack_server), method_limits=NO_LIMITS)
+
+    dispatcher.send_message_from_blocks("team", _message("broken"))
+    dispatcher.send_message_from_blocks("team", _message("fine"))
+    failures = dispatcher.close()
+
+    assert [(channel, type(error)) for channel, error in failures] == [("team", ValueError)]
+    assert _posted(slack_server.requests) == [("team", "broken"), ("team", "fine")]
+    # the dispatcher can be used again after close
+    dispatcher.send_message_from_blocks("team", _message("again"))
+    assert dispatcher.close() == []
@@ -1,7 +1,12 @@
+import json
 from datetime import datetime, timezone
 
 from notifier.repository import PullRequestInfo, RepositoryInfo
-from notifier.summary_formatter import SummaryMessageFormatter
+from notifier.summary_formatter import (
+    MAX_BLOCKS_PER_MESSAGE,
+    MAX_MESSAGE_LENGTH,
+    SummaryMessageFormatter,
+)
 
 formatter = SummaryMessageFormatter()
 
@@ -15,6 +20,7 @@ def _make_pr(
     deletions: int = 5,
     changed_files: int = 2,
     copilot_requester: str | None = None,
+    url: str = "https://github.com/org/repo/pull/1",
 ) -> PullRequestInfo:
     return PullRequestInfo(
         name=name,
@@ -22,7 +28,7 @@ def _make_pr(
         created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
         age=age,
         review_status=review_status,
-        url="https://github.com/org/repo/pull/1",
+        url=url,
         additions=additions,
         deletions=deletions,
         changed_files=changed_files,
@@ -155,3 +161,49 @@ def test_empty_pulls_returns_no_messages() -> None:
     repo = RepositoryInfo(name="org/repo", pulls=[])
     messages = formatter.get_messages_for_repo(repo)
     assert messages == []
+
+
+# Packing several pull requests per message
+packing_formatter = SummaryMessageFormatter(pack_messages=True)
+
+
+def _pr_names(messages: list) -> list[str]:
+    return [block["elements"][0]["elements"][0]["elements"][0]["text"] for message in messages for block in message if block["type"] == "rich_text"]
+
+
+def test_packing_keeps_messages_within_block_and_size_limits() -> None:
+    repo = RepositoryInfo(name="org/repo", pulls=[_make_pr(name=f"PR {i}") for i in range(5000)])
+    messages = packing_formatter.get_messages_for_repo(repo)
+
+    assert len(messages) == 101  # 5000 PR blocks + the header, 50 blocks per message
+    assert all(len(message) <= MAX_BLOCKS_PER_MESSAGE for message in messages)
+    assert all(len(json.dumps(message)) <= MAX_MESSAGE_LENGTH for message in messages)
+    assert messages[0][0]["type"] == "header"
+    assert all(block["type"] != "header" for message in messages[1:] for block in message)
+    assert _pr_names(messages) == [f"PR {i}" for i in range(5000)]
+
+
+def test_packing_splits_on_size_before_block_count() -> None:
+    repo = RepositoryInfo(name="org/repo", pulls=[_make_pr(name=f"PR {i} " + "x" * 2000) for i in range(3000)])
+    messages = packing_formatter.get_messages_for_repo(repo)
+
+    assert all(len(json.dumps(message)) <= MAX_MESSAGE_LENGTH for message in messages)
+    assert all(len(message) < MAX_BLOCKS_PER_MESSAGE for message in messages)
+    assert _pr_names(messages) == [f"PR {i} " + "x" * 2000 for i in range(3000)]
+
+
+def test_packing_small_repository_sends_one_message() -> None:
+    repo = RepositoryInfo(name="org/repo", pulls=[_make_pr(name="PR 1"), _make_pr(name="PR 2")])
+    messages = packing_formatter.get_messages_for_repo(repo)
+
+    assert len(messages) == 1
+    assert [block["type"] for block in messages[0]] == ["header", "rich_text", "rich_text"]
+
+
+def test_messages_are_keyed_by_the_header_and_their_first_pull_request() -> None:
+    pulls = [_make_pr(name=f"PR {i}", url=f"https://github.com/org/repo/pull/{i}") for i in range(120)]
+    repo = RepositoryInfo(name="org/repo", pulls=pulls)
+
+    assert [message.key for message in formatter.get_keyed_messages_for_repo(repo)] == ["header", *(pull.url for pull in pulls[1:])]
+    # the packed messages start with the header, PR 49 and PR 99
+    assert [message.key for message in packing_formatter.get_keyed_messages_for_repo(repo)] == ["header", pulls[49].url, pulls[99].url]
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.repository import DraftFilter
+from notifier.tracing import (
+    InMemorySpanExporter,
+    OtlpJsonFileExporter,
+    configure_tracing,
+    shutdown_tracing,
+    span,
+)
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+
+def _open_pull_request(number):
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "url": f"/repos/org/repo/pulls/{number}",
+        "html_url": f"https://github.com/org/repo/pull/{number}",
+        "draft": False,
+        "created_at": "2025-01-01T10:00:00Z",
+        "updated_at": "2025-01-01T10:00:00Z",
+        "user": {"login": "alice"},
+        "additions": 1,
+        "deletions": 1,
+        "changed_files": 1,
+    }
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        server.route("GET", "/repos/org/repo", lambda request: FakeResponse(200, body={"id": 1, "full_name": "org/repo", "url": "/repos/org/repo"}))
+        server.route("GET", "/repos/org/repo/pulls", lambda request: FakeResponse(200, body=[_open_pull_request(1)]))
+        server.route("GET", "/repos/org/repo/pulls/1/requested_reviewers", lambda request: FakeResponse(200, body={"users": [], "teams": []}))
+        server.route("GET", "/repos/org/repo/pulls/1/reviews", lambda request: FakeResponse(200, body=[]))
+        yield server
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemorySpanExporter()
+    configure_tracing(exporter)
+    yield exporter
+    shutdown_tracing()
+
+
+def test_disabled_tracing_returns_shared_no_op_span() -> None:
+    assert span("get_repository_info", repository="org/repo") is span("get_reviews", pull_request=1)
+
+
+def test_spans_of_pool_tasks_nest_under_the_repository_span(github_server, exporter) -> None:
+    fetcher = PullRequestFetcher(github_server.url, "token")
+    fetcher.get_repository_info("org/repo", [DraftFilter(False)])
+    fetcher.close()
+    shutdown_tracing()
+
+    spans = {finished.name: finished for finished in exporter.spans}
+    root = spans["get_repository_info"]
+    assert root.parent_span_id is None
+    assert root.attributes["repository"] == "org/repo"
+    assert spans["filter DraftFilter"].parent_span_id == root.span_id
+    info = spans["create_pull_request_info"]
+    assert (info.parent_span_id, info.trace_id) == (root.span_id, root.trace_id)
+    assert info.attributes["thread.name"] != root.attributes["thread.name"]
+    assert spans["get_reviews"].parent_span_id == info.span_id
+    assert spans["get_review_status"].parent_span_id == info.span_id
+
+
+def test_otlp_json_file_exporter_writes_a_line_per_batch(tmp_path) -> None:
+    configure_tracing(OtlpJsonFileExporter(tmp_path / "trace.jsonl"))
+    try:
+        with span("notification", notification="pull_requests:team"):
+            with pytest.raises(ValueError), span("slack chat.postMessage", channel="team"):
+                raise ValueError("channel_not_found")
+    finally:
+        shutdown_tracing()
+
+    lines = (tmp_path / "trace.jsonl").read_text().splitlines()
+    assert len(lines) == 1
+    child, parent = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert child["parentSpanId"] == parent["spanId"]
+    assert child["status"] == {"code": 2, "message": "ValueError: channel_not_found"}
+    assert {"key": "channel", "value": {"stringValue": "team"}} in child["attributes"]
+    assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
@@ -0,0 +1,91 @@
+import hashlib
+import hmac
+from pathlib import Path
+
+import pytest
+import requests
+
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.pull_request_index import PullRequestIndex
+from notifier.webhook_receiver import WebhookReceiver
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+SECRET = "webhook-secret"
+EVENTS_DIR = Path(__file__).resolve().parent / "test_resources" / "webhooks"
+
+
+def _open_pull_request(number):
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "url": f"/repos/org/repo/pulls/{number}",
+        "html_url": f"https://github.com/org/repo/pull/{number}",
+        "draft": False,
+        "created_at": f"2025-01-0{number}T10:00:00Z",
+        "updated_at": f"2025-01-0{number}T10:00:00Z",
+        "user": {"login": "alice"},
+        "additions": 1,
+        "deletions": 1,
+        "changed_files": 1,
+    }
+
+
+@pytest.fixture
+def github_server():
+    with FakeHttpServer() as server:
+        server.route("GET", "/repos/org/repo", lambda request: FakeResponse(200, body={"id": 1, "full_name": "org/repo", "url": "/repos/org/repo"}))
+        server.route("GET", "/repos/org/repo/pulls", lambda request: FakeResponse(200, body=[_open_pull_request(2), _open_pull_request(1)]))
+        for number in (1, 2):
+            server.route("GET", f"/repos/org/repo/pulls/{number}/requested_reviewers", lambda request: FakeResponse(200, body={"users": [], "teams": []}))
+            server.route("GET", f"/repos/org/repo/pulls/{number}/reviews", lambda request: FakeResponse(200, body=[]))
+        yield server
+
+
+@pytest.fixture
+def receiver():
+    receiver = WebhookReceiver(PullRequestIndex(), SECRET, host="127.0.0.1", port=0)
+    receiver.start()
+    yield receiver
+    receiver.close()
+
+
+def _post_event(receiver, event_name, file_name, secret=SECRET):
+    body = (EVENTS_DIR / file_name).read_bytes()
+    signature = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    headers = {"X-GitHub-Event": event_name, "X-Hub-Signature-256": signature, "Content-Type": "application/json"}
+    return requests.post(f"http://127.0.0.1:{receiver.port}/", data=body, headers=headers, timeout=5).status_code
+
+
+def test_warm_index_answers_without_github_requests(github_server, receiver) -> None:
+    fetcher = PullRequestFetcher(github_server.url, "token", pull_request_index=receiver.index)
+    assert [pull.name for pull in fetcher.get_repository_info("org/repo", []).pulls] == ["PR 2", "PR 1"]
+    github_server.requests.clear()
+
+    assert _post_event(receiver, "pull_request", "pull_request_opened.json") == 202
+    assert _post_event(receiver, "pull_request_review", "pull_request_review_submitted.json") == 202
+    assert _post_event(receiver, "pull_request", "pull_request_closed.json") == 202
+    repository = fetcher.get_repository_info("org/repo", [])
+
+    assert [(pull.name, pull.review_status, pull.additions) for pull in repository.pulls] == [("PR 3", "APPROVED", 12), ("PR 2", "WAITING", 1)]
+    assert github_server.requests == []
+
+
+def test_event_with_invalid_signature_is_rejected(github_server, receiver) -> None:
+    fetcher = PullRequestFetcher(github_server.url, "token", pull_request_index=receiver.index)
+    fetcher.get_repository_info("org/repo", [])
+
+    assert _post_event(receiver, "pull_request", "pull_request_opened.json", secret="wrong") == 401
+    assert [pull.name for pull in fetcher.get_repository_info("org/repo", []).pulls] == ["PR 2", "PR 1"]
+
+
+def test_missed_events_make_the_repository_load_again(github_server, receiver) -> None:
+    fetcher = PullRequestFetcher(github_server.url, "token", pull_request_index=receiver.index)
+    fetcher.get_repository_info("org/repo", [])
+
+    # an edit of an open pull request the index does not know
+    assert _post_event(receiver, "pull_request", "pull_request_edited_unknown.json") == 202
+    github_server.requests.clear()
+    fetcher.get_repository_info("org/repo", [])
+
+    assert github_server.requests_to("/repos/org/repo/pulls")
+    assert (receiver.index.hits, receiver.index.loads) == (0, 2)
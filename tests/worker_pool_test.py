@@ -0,0 +1,68 @@
+import time
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+
+from notifier.pull_request_fetcher import PullRequestFetcher
+from notifier.worker_pool import WorkerPool
+from tests.fake_http_server import FakeHttpServer, FakeResponse
+
+REVIEW_LATENCY = 0.5
+CALLER = ContextVar("caller", default="none")
+
+
+def test_tasks_run_in_caller_context_and_are_timed() -> None:
+    pool = WorkerPool(max_workers=2)
+    CALLER.set("notification-1")
+
+    results = [future.result() for future in [pool.submit("lookup", CALLER.get) for _ in range(4)]]
+    pool.submit("sleep", time.sleep, 0.05).result()
+    timings = pool.timings()
+    pool.close()
+
+    assert results == ["notification-1"] * 4
+    assert timings["lookup"].count == 4
+    assert timings["sleep"].count == 1
+    assert timings["sleep"].max_run_seconds >= 0.05
+
+
+def _closed_pull_request(number, merged_at):
+    return {
+        "number": number,
+        "title": f"PR {number}",
+        "url": f"/repos/org/repo/pulls/{number}",
+        "state": "closed",
+        "updated_at": merged_at,
+        "merged_at": merged_at,
+        "user": {"login": "alice"},
+        "additions": 10,
+        "deletions": 1,
+    }
+
+
+def _reviews_endpoint(request):
+    time.sleep(REVIEW_LATENCY)
+    return FakeResponse(200, body=[{"id": 1, "state": "APPROVED", "submitted_at": "2099-01-01T00:00:00Z", "user": {"login": "bob"}}])
+
+
+def test_reviews_of_merged_pull_requests_are_fetched_in_parallel() -> None:
+    merged_at = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    with FakeHttpServer() as github_server:
+        pulls = [_closed_pull_request(number, merged_at) for number in range(1, 6)]
+        items = [{**pull, "url": f"/repos/org/repo/issues/{pull['number']}", "pull_request": {"merged_at": merged_at}} for pull in pulls]
+        github_server.route("GET", "/search/issues", lambda request: FakeResponse(200, body={"total_count": 5, "incomplete_results": False, "items": items}))
+        for pull in pulls:
+            github_server.route("GET", f"/repos/org/repo/pulls/{pull['number']}", lambda request, pull=pull: FakeResponse(200, body=pull))
+            github_server.route("GET", f"/repos/org/repo/pulls/{pull['number']}/reviews", _reviews_endpoint)
+
+        fetcher = PullRequestFetcher(github_server.url, "token")
+        start = time.monotonic()
+        facts = fetcher.get_repository_productivity_facts("org/repo", ["alice"], datetime.now(timezone.utc) - timedelta(days=7))
+        elapsed = time.monotonic() - start
+        timings = fetcher.worker_pool.timings()
+        fetcher.close()
+
+    assert [pr.number for pr in facts.merged_pull_requests] == [1, 2, 3, 4, 5]
+    assert [approval.number for approval in facts.approvals] == [1, 2, 3, 4, 5]
+    assert timings["merged_pull_request"].count == 5
+    # the five review requests overlap instead of taking 5 * REVIEW_LATENCY
+    assert elapsed < 3 * REVIEW_LATENCY